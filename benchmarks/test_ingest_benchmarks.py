@@ -0,0 +1,78 @@
+import itertools
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from daimonkms import bench
+from daimonkms.chunking import ChunkingEngine
+
+
+# Knowledge base sizes, e.g. DAIMON_BENCH_FILES=100,10000,1000000
+SIZES = [int(size) for size in os.environ.get("DAIMON_BENCH_FILES", "100,1000").split(",")]
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda files: f"{files}files")
+def kb_root(request, tmp_path_factory):
+    """A generated knowledge base, shared by every stage benchmark of one size."""
+    root = tmp_path_factory.mktemp("bench") / "kb"
+    bench.generate_kb(root, request.param)
+    return root
+
+
+@pytest.fixture(scope="module")
+def paths(kb_root):
+    return bench.scan_files(kb_root)
+
+
+@pytest.fixture(scope="module")
+def documents(paths):
+    return bench.parse_files(paths)
+
+
+@pytest.fixture(scope="module")
+def chunked(documents):
+    return bench.chunk_documents(documents, ChunkingEngine())
+
+
+@pytest.fixture(scope="module")
+def embedder():
+    return bench.DeterministicEmbeddingFunction()
+
+
+@pytest.fixture(scope="module")
+def embeddings(chunked, embedder):
+    return embedder([text for file_chunks in chunked[1] for text in file_chunks])
+
+
+def test_scan(benchmark, kb_root):
+    benchmark(bench.scan_files, kb_root)
+
+
+def test_parse(benchmark, paths):
+    benchmark(bench.parse_files, paths)
+
+
+def test_chunk(benchmark, documents):
+    benchmark(bench.chunk_documents, documents, ChunkingEngine())
+
+
+def test_embed(benchmark, chunked, embedder):
+    benchmark(embedder, [text for file_chunks in chunked[1] for text in file_chunks])
+
+
+def test_store(benchmark, kb_root, paths, documents, chunked, embedder, embeddings, tmp_path):
+    spans, chunks = chunked
+    rounds = itertools.count()
+
+    def setup():
+        # A new directory per round: an open client can't have its database deleted
+        chroma, writer = bench.open_database(tmp_path / f"db-{next(rounds)}", embedder)
+        return (chroma, writer), {}
+
+    def store(chroma, writer):
+        bench.store_chunks(chroma, writer, kb_root, paths, documents, spans, chunks, embeddings)
+        bench.finish_store(chroma, writer)
+
+    benchmark.pedantic(store, setup=setup, rounds=3)
@@ -7,3 +7,18 @@ a command-line interface for managing your personal knowledge base.
 """
 
 __version__ = "0.1.0"
+
+
+def open_session(config_path=None, db_path=None, collection="knowledge_base"):
+    """
+    Open a Session for searching and updating a knowledge base from Python.
+
+    See daimonkms.session.Session; imported on first use so that importing
+    the package stays cheap.
+    """
+    from . import session
+    return session.open_session(config_path, db_path=db_path, collection=collection)
+
+
+# Short alias: daimonkms.open(config_path)
+open = open_session
@@ -0,0 +1,146 @@
+import fcntl
+import json
+import os
+import re
+from pathlib import Path
+
+
+ALIASES_FILENAME = "collection_aliases.json"
+
+GENERATION_SEPARATOR = "__g"
+
+
+def generation_name(collection_name, generation):
+    """Return the physical collection name of a generation."""
+    return f"{collection_name}{GENERATION_SEPARATOR}{generation}"
+
+
+def parse_generation(collection_name, physical_name):
+    """
+    Return the generation number of a physical collection.
+
+    Returns:
+        The generation, or None if physical_name is not a generation of
+        collection_name
+    """
+    match = re.fullmatch(re.escape(collection_name + GENERATION_SEPARATOR) + r'(\d+)', physical_name)
+    return int(match.group(1)) if match else None
+
+
+class CollectionAliases:
+    """
+    Pointers from collection names to the physical collection serving them.
+
+    Rebuilds write into a new generation (e.g. knowledge_base__g3) and then
+    repoint the alias, so readers switch from one complete index to the
+    next. The file is replaced atomically and reloaded whenever it changes
+    on disk, so readers in other processes follow the switch too.
+
+    The file also holds a revision counter per physical collection, bumped
+    after writes, so caches can tell when a collection's content changed.
+    Updates hold an exclusive lock on a sidecar .lock file, so writers in
+    different processes don't lose each other's changes.
+    """
+
+    def __init__(self, aliases_path):
+        """Initialize aliases stored at aliases_path."""
+        self.aliases_path = Path(aliases_path)
+        self.lock_path = self.aliases_path.with_name(self.aliases_path.name + '.lock')
+        self._aliases = {}
+        self._revisions = {}
+        self._loaded_version = None
+
+    def _reload(self):
+        """Re-read the aliases file if it changed since the last read."""
+        try:
+            stat = self.aliases_path.stat()
+            # os.replace gives every version a new inode
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            self._aliases = {}
+            self._revisions = {}
+            self._loaded_version = None
+            return
+        if version == self._loaded_version:
+            return
+        try:
+            with open(self.aliases_path, 'r') as f:
+                data = json.load(f)
+            self._aliases = data.get('aliases', {})
+            self._revisions = data.get('revisions', {})
+            self._loaded_version = version
+        except (OSError, ValueError):
+            # Keep the previous mapping if the file can't be read
+            pass
+
+    def resolve(self, collection_name):
+        """Return the physical collection for a name (itself if not aliased)."""
+        self._reload()
+        return self._aliases.get(collection_name, collection_name)
+
+    def items(self):
+        """Return (alias, physical collection) pairs."""
+        self._reload()
+        return list(self._aliases.items())
+
+    def revision(self, physical_name):
+        """Return the write revision of a physical collection."""
+        self._reload()
+        return self._revisions.get(physical_name, 0)
+
+    def _write(self, aliases, revisions):
+        """Replace the file atomically with new contents."""
+        self.aliases_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.aliases_path.with_name(self.aliases_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'aliases': aliases, 'revisions': revisions}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.aliases_path)
+        self._aliases = aliases
+        self._revisions = revisions
+        stat = self.aliases_path.stat()
+        self._loaded_version = (stat.st_ino, stat.st_mtime_ns)
+
+    def _update(self, change):
+        """
+        Apply change(aliases, revisions) to the current contents and write them.
+
+        The file is re-read under the lock, so the change applies on top of
+        whatever other processes wrote.
+        """
+        self.aliases_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Inode numbers can be reused, so don't trust the cached version here
+            self._loaded_version = None
+            self._reload()
+            aliases = dict(self._aliases)
+            revisions = dict(self._revisions)
+            change(aliases, revisions)
+            self._write(aliases, revisions)
+
+    def set(self, collection_name, physical_name):
+        """Point collection_name at physical_name, atomically on disk."""
+        def point(aliases, revisions):
+            aliases[collection_name] = physical_name
+        self._update(point)
+
+    def bump_revisions(self, physical_names):
+        """Record that physical collections' content changed, in one write."""
+        def bump(aliases, revisions):
+            for physical_name in physical_names:
+                revisions[physical_name] = revisions.get(physical_name, 0) + 1
+        self._update(bump)
+
+    def bump_revision(self, physical_name):
+        """Record that a physical collection's content changed."""
+        self.bump_revisions([physical_name])
+
+    def forget_revision(self, physical_name):
+        """Drop the revision counter of a physical collection that was deleted."""
+        def forget(aliases, revisions):
+            revisions.pop(physical_name, None)
+        self._reload()
+        if physical_name in self._revisions:
+            self._update(forget)
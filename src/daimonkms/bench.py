@@ -0,0 +1,354 @@
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+from chromadb import EmbeddingFunction
+
+from . import __version__
+from .chroma_manager import ChromaManager
+from .chunking import ChunkingEngine
+from .lexical import LexicalIndex, LEXICAL_DIRNAME
+from .parser import OrgParser
+from .scanner import KnowledgeBaseScanner
+
+
+# Bumped whenever generated content changes, so cached knowledge bases are rebuilt
+GENERATOR_VERSION = 1
+
+# Written at the root of a generated knowledge base
+MARKER_FILENAME = ".bench.json"
+
+# Stages timed by run_benchmark, in pipeline order
+STAGES = ('scan', 'parse', 'chunk', 'embed', 'store')
+
+# Notes per directory; knowledge bases are nested two levels deep below that
+FILES_PER_DIRECTORY = 100
+
+DOMAINS = {
+    'mathematics': "set group ring field proof lemma theorem topology manifold integral series "
+                   "limit vector matrix eigenvalue prime modular category functor measure",
+    'physics': "energy momentum field particle quantum entropy wave spin relativity mass force "
+               "photon lattice symmetry gauge boson fermion thermodynamics",
+    'programming': "function closure compiler parser thread lock cache index query pipeline "
+                   "queue socket process memory allocation iterator generator type module",
+    'cooking': "dough flour yeast knead oven bake ferment broth stock simmer roast braise spice "
+               "garlic onion butter sourdough starter crumb",
+    'history': "empire treaty dynasty revolution archive trade border republic war council "
+               "parliament charter colony reform chronicle manuscript",
+    'philosophy': "ethics virtue reason argument premise ontology epistemology knowledge mind "
+                  "consciousness language meaning truth duty freedom",
+    'biology': "cell protein gene enzyme membrane organism evolution species tissue neuron "
+               "receptor pathway mitochondria ecology population",
+    'music': "harmony chord scale rhythm melody counterpoint tempo cadence interval fugue "
+             "sonata timbre orchestra motif modulation",
+}
+FORMS = ('note', 'reference', 'journal', 'project', 'literature')
+GRANULARITIES = ('atomic', 'topic', 'overview')
+COMMON_WORDS = ("the of and to in is that for it as with was on be by this are from at or an "
+                "which but not have more also can one these between how when where each").split()
+
+
+class DeterministicEmbeddingFunction(EmbeddingFunction):
+    """
+    Local stand-in embedder for benchmarks: hashed bag of words.
+
+    Each lower-cased word adds +1 or -1 to one of `dimensions` buckets
+    chosen by its CRC-32, and vectors are L2-normalized. It needs no model
+    download, gives the same vectors on every machine and run, and texts
+    sharing words still land near each other.
+    """
+
+    def __init__(self, dimensions=384):
+        """Initialize embedder producing vectors of the given size."""
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in text.lower().split():
+                digest = zlib.crc32(word.encode('utf-8'))
+                vectors[row, digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list(vectors / norms)
+
+    @staticmethod
+    def name():
+        return "daimon-bench-hash"
+
+    def get_config(self):
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config):
+        return DeterministicEmbeddingFunction(config.get("dimensions", 384))
+
+
+def note_path(index):
+    """Return the path of the index-th generated note, relative to the root."""
+    return Path(f"{index // (FILES_PER_DIRECTORY * 100):04d}",
+                f"{index // FILES_PER_DIRECTORY % 100:02d}",
+                f"note-{index:07d}.org")
+
+
+def _sentence(rng, words):
+    """Return one sentence mixing domain and common words."""
+    length = rng.randint(6, 18)
+    text = " ".join(rng.choice(words) if rng.random() < 0.45 else rng.choice(COMMON_WORDS)
+                    for _ in range(length))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng, words):
+    """Return a paragraph of a few sentences, wrapped like an org buffer."""
+    text = " ".join(_sentence(rng, words) for _ in range(rng.randint(2, 7)))
+    lines = []
+    while len(text) > 78:
+        cut = text.rfind(" ", 0, 78)
+        lines.append(text[:cut])
+        text = text[cut + 1:]
+    lines.append(text)
+    return "\n".join(lines)
+
+
+def _timestamp(rng):
+    """Return an org inactive timestamp."""
+    day = rng.randint(0, 5 * 365)
+    return time.strftime("[%Y-%m-%d %a %H:%M]",
+                         time.gmtime(1577836800 + day * 86400 + rng.randint(0, 86399)))
+
+
+def generate_note(index, seed=0):
+    """
+    Return the text of one synthetic org note.
+
+    Notes have a file-level property drawer with an ID, a title, filetags
+    following the domain:form:granularity convention (sometimes with extra
+    tags), and headings up to three levels deep with optional property
+    drawers, lists and source blocks. Granularity sets the length: atomic
+    notes are a paragraph or two, overviews a dozen sections.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    domain = rng.choice(list(DOMAINS))
+    words = DOMAINS[domain].split()
+    form = rng.choice(FORMS)
+    granularity = rng.choices(GRANULARITIES, weights=(5, 4, 1))[0]
+    filetags = [domain, form, granularity] + rng.sample(words, rng.choice((0, 0, 1, 2)))
+
+    lines = [":PROPERTIES:", f":ID: {rng.getrandbits(128):032x}", ":END:",
+             f"#+TITLE: {' '.join(rng.sample(words, 3)).title()} {index}",
+             f"#+filetags: :{':'.join(filetags)}:", ""]
+    sections = {'atomic': (0, 1), 'topic': (2, 5), 'overview': (6, 12)}[granularity]
+    if sections[0] == 0:
+        lines.append(_paragraph(rng, words))
+    for _ in range(rng.randint(max(1, sections[0]), sections[1])):
+        level = rng.choices((1, 2, 3), weights=(5, 3, 1))[0]
+        if lines[-1]:
+            lines.append("")
+        lines.append(f"{'*' * level} {' '.join(rng.sample(words, rng.randint(1, 3))).capitalize()}")
+        if rng.random() < 0.3:
+            lines.extend([":PROPERTIES:", f":CREATED: {_timestamp(rng)}", ":END:"])
+        lines.append(_paragraph(rng, words))
+        if rng.random() < 0.25:
+            lines.append("")
+            lines.extend(f"- {_sentence(rng, words)}" for _ in range(rng.randint(2, 5)))
+        if domain == 'programming' and rng.random() < 0.4:
+            lines.extend(["", "#+BEGIN_SRC python",
+                          f"def {rng.choice(words)}_{index}(items):",
+                          f"    return [item for item in items if item.{rng.choice(words)}]",
+                          "#+END_SRC"])
+    return "\n".join(lines) + "\n"
+
+
+def generate_kb(root, files, seed=0):
+    """
+    Write a synthetic knowledge base of `files` notes under root.
+
+    A marker file records what was generated; if root already holds the
+    same notes they are kept as they are, so large knowledge bases are only
+    written once.
+
+    Returns:
+        True if notes were written, False if an existing one was reused
+
+    Raises:
+        ValueError: If files is less than 1
+    """
+    if files < 1:
+        raise ValueError(f"A knowledge base needs at least one note, not {files}")
+    root = Path(root)
+    marker = {'generator': GENERATOR_VERSION, 'files': files, 'seed': seed}
+    marker_path = root / MARKER_FILENAME
+    try:
+        if json.loads(marker_path.read_text()) == marker:
+            return False
+    except (OSError, ValueError):
+        pass
+
+    if root.exists():
+        shutil.rmtree(root)
+    for index in range(files):
+        path = root / note_path(index)
+        if index % FILES_PER_DIRECTORY == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(generate_note(index, seed), encoding='utf-8')
+    marker_path.write_text(json.dumps(marker))
+    return True
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MiB, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def scan_files(kb_root):
+    """Scan stage: list the knowledge base's org files."""
+    return list(KnowledgeBaseScanner(kb_root).iter_org_files())
+
+
+def parse_files(paths):
+    """Parse stage: parse every file."""
+    return [OrgParser(path).parse() for path in paths]
+
+
+def chunk_documents(documents, chunker):
+    """
+    Chunk stage: split every document.
+
+    Returns:
+        Tuple of (spans, chunks), each a list with one list per document
+    """
+    spans = [list(chunker.iter_spans(document.body)) if document.body.strip() else []
+             for document in documents]
+    chunks = [[document.body[begin:end] for begin, end in file_spans]
+              for document, file_spans in zip(documents, spans)]
+    return spans, chunks
+
+
+def open_database(db_path, embedding_function, batch_size=256):
+    """
+    Create an empty database for the store stage.
+
+    Returns:
+        Tuple of (ChromaManager, BulkWriter for its knowledge_base collection)
+    """
+    shutil.rmtree(db_path, ignore_errors=True)
+    chroma = ChromaManager(db_path, embedding_function=embedding_function,
+                           lexical_index=LexicalIndex(Path(db_path) / LEXICAL_DIRNAME))
+    chroma.clear_and_create_collection("knowledge_base")
+    return chroma, chroma.bulk_writer("knowledge_base", batch_size=batch_size)
+
+
+def store_chunks(chroma, writer, kb_root, paths, documents, spans, chunks, embeddings):
+    """Store stage: queue parsed, chunked and embedded files on writer."""
+    position = 0
+    for path, document, file_spans, file_chunks in zip(paths, documents, spans, chunks):
+        key = Path(path).relative_to(kb_root).as_posix()
+        ids, metadatas = chroma.chunk_records(file_chunks, Path(path).stem, document.headers, key,
+                                              file_spans)
+        writer.add_records(ids, file_chunks, metadatas, embeddings[position:position + len(file_chunks)])
+        position += len(file_chunks)
+
+
+def finish_store(chroma, writer):
+    """Store stage: write what is still buffered and compile the lexical index."""
+    writer.flush()
+    chroma.compile_lexical(writer.collection_name)
+
+
+def run_benchmark(kb_root, db_path, chunk_size=1000, chunk_overlap=200, batch_size=256,
+                  files_per_batch=256, embedding_function=None):
+    """
+    Index a knowledge base into a fresh database, timing each stage on its own.
+
+    Unlike `daimon index`, stages don't overlap: files are processed in
+    batches of files_per_batch, and each batch is parsed, then chunked,
+    then embedded, then stored, so every stage's time is its own cost.
+    Storing includes compiling the lexical index. Embeddings come from
+    embedding_function (default: DeterministicEmbeddingFunction).
+
+    Returns:
+        Dict with files, chunks, bytes, total_seconds, peak_rss_mb and
+        stages, mapping each stage name to its seconds, items and
+        items_per_second
+    """
+    kb_root = Path(kb_root)
+    embedding_function = embedding_function or DeterministicEmbeddingFunction()
+    chunker = ChunkingEngine(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chroma, writer = open_database(db_path, embedding_function, batch_size)
+
+    seconds = dict.fromkeys(STAGES, 0.0)
+    items = dict.fromkeys(STAGES, 0)
+    total_bytes = 0
+    started = time.perf_counter()
+
+    start = time.perf_counter()
+    paths = scan_files(kb_root)
+    seconds['scan'] = time.perf_counter() - start
+    items['scan'] = len(paths)
+
+    for offset in range(0, len(paths), files_per_batch):
+        batch = paths[offset:offset + files_per_batch]
+
+        start = time.perf_counter()
+        documents = parse_files(batch)
+        seconds['parse'] += time.perf_counter() - start
+        items['parse'] += len(batch)
+        total_bytes += sum(len(document.body) for document in documents)
+
+        start = time.perf_counter()
+        spans, chunks = chunk_documents(documents, chunker)
+        seconds['chunk'] += time.perf_counter() - start
+        items['chunk'] += sum(len(file_chunks) for file_chunks in chunks)
+
+        start = time.perf_counter()
+        texts = [text for file_chunks in chunks for text in file_chunks]
+        embeddings = embedding_function(texts) if texts else []
+        seconds['embed'] += time.perf_counter() - start
+        items['embed'] += len(texts)
+
+        start = time.perf_counter()
+        store_chunks(chroma, writer, kb_root, batch, documents, spans, chunks, embeddings)
+        seconds['store'] += time.perf_counter() - start
+        items['store'] += len(texts)
+
+    start = time.perf_counter()
+    finish_store(chroma, writer)
+    seconds['store'] += time.perf_counter() - start
+
+    return {
+        "files": len(paths),
+        "chunks": items['chunk'],
+        "bytes": total_bytes,
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {stage: {"seconds": round(seconds[stage], 4), "items": items[stage],
+                           "items_per_second": round(items[stage] / seconds[stage], 1)
+                           if seconds[stage] else None}
+                   for stage in STAGES},
+    }
+
+
+def environment():
+    """Describe the machine and versions a benchmark ran with."""
+    import chromadb
+    return {
+        "daimonkms": __version__,
+        "chromadb": chromadb.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
@@ -1,29 +1,187 @@
 import chromadb
+import contextlib
+import copy
+import hashlib
 from pathlib import Path
 
+from .aliases import ALIASES_FILENAME, CollectionAliases, generation_name, parse_generation
+from .embedding_cache import EmbeddingCache
+from .query_cache import normalize_query
+from .tags import combine_where, tag_metadata, tag_where
+
 
 class ChromaManager:
     """Manager for ChromaDB vector database operations."""
     
-    def __init__(self, db_path):
-        """Initialize ChromaManager with database path."""
+    def __init__(self, db_path, embedding_function=None, embedding_cache_dir=None,
+                 embedding_cache_max_entries=200000, document_store=None, query_cache=None,
+                 lexical_index=None):
+        """
+        Initialize ChromaManager with database path.
+        
+        If embedding_function is None, ChromaDB's default embedding
+        function is used for every collection. If embedding_cache_dir is
+        given, embeddings are looked up in (and added to) a persistent
+        EmbeddingCache there before the embedding function is called.
+        
+        With a document_store (a DocumentStore), chunks that have a
+        source_path and offsets are stored without their text; query
+        results rebuild it from the stored file bodies.
+        
+        With a query_cache (a QueryCache), query results are cached until
+        the collection is written to or rebuilt.
+        
+        With a lexical_index (a LexicalIndex), every chunk written is also
+        indexed for BM25 search, enabling the lexical and hybrid query modes.
+        """
         self.db_path = Path(db_path)
+        # Distinguishes this database's entries in a query cache shared with others
+        self.database_key = str(self.db_path.resolve())
+        self.document_store = document_store
+        self.query_cache = query_cache
+        self.lexical_index = lexical_index
+        self.embedding_function = embedding_function
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_max_entries = embedding_cache_max_entries
+        self._embedding_cache = None
+        self._default_embedding_function = None
+        # Collection handles by physical name, to avoid a get_collection round trip per call
+        self._collections = {}
+        # Collections written inside deferred_revisions, or None outside it
+        self._touched = None
+        self.aliases = CollectionAliases(self.db_path / ALIASES_FILENAME)
         # Create ChromaDB client with persistent storage
         self.client = chromadb.PersistentClient(path=str(self.db_path))
     
+    def _collection_kwargs(self):
+        """Keyword arguments shared by every get/create collection call."""
+        if self.embedding_function is None:
+            return {}
+        return {"embedding_function": self.embedding_function}
+    
+    def _get_embedding_function(self):
+        """Return the embedding function collections use."""
+        if self.embedding_function is not None:
+            return self.embedding_function
+        if self._default_embedding_function is None:
+            from chromadb.utils import embedding_functions
+            self._default_embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._default_embedding_function
+    
+    @property
+    def embedding_cache(self):
+        """The EmbeddingCache in use, or None if caching is disabled."""
+        if self._embedding_cache is None and self.embedding_cache_dir is not None:
+            embedding_function = self._get_embedding_function()
+            name = embedding_function.name() if hasattr(embedding_function, 'name') else ''
+            model_name = getattr(embedding_function, 'model_name', None) or type(embedding_function).__name__
+            self._embedding_cache = EmbeddingCache(self.embedding_cache_dir, f"{name}-{model_name}",
+                                                   max_entries=self.embedding_cache_max_entries)
+        return self._embedding_cache
+    
+    def embed(self, texts):
+        """
+        Compute embeddings for texts with the collections' embedding function.
+        
+        With an embedding cache, only texts not already cached are embedded.
+        """
+        texts = list(texts)
+        cache = self.embedding_cache
+        if cache is None:
+            return self._get_embedding_function()(texts)
+        
+        embeddings = cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._get_embedding_function()([texts[i] for i in missing])
+            cache.put_many([texts[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return embeddings
+    
+    def embed_queries(self, queries):
+        """
+        Compute embeddings for query texts, bypassing the embedding cache.
+        
+        The cache is for chunk text: repeated queries are answered by the
+        query cache, and caching one-off queries would only evict chunks.
+        """
+        return self._get_embedding_function()(list(queries))
+    
+    def reopen(self):
+        """
+        Reopen the database client and drop cached collection handles.
+        
+        A long-lived client keeps serving the vectors it loaded and doesn't
+        see ones written by other processes; reopening picks them up.
+        """
+        self.client.clear_system_cache()
+        self._collections = {}
+        self.client = chromadb.PersistentClient(path=str(self.db_path))
+    
+    def close(self):
+        """
+        Close the caches and the lexical index.
+        
+        Writes the statistics and recency the caches batch in memory, and
+        waits for background lexical compiles to finish.
+        """
+        if self.query_cache is not None:
+            self.query_cache.close()
+        if self._embedding_cache is not None:
+            self._embedding_cache.close()
+            self._embedding_cache = None
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+    
+    def warm_up(self, collection_name):
+        """Load the embedding model and a collection's indexes ahead of the first query."""
+        embedding = self._get_embedding_function()(["warm up"])
+        physical_name = self.aliases.resolve(collection_name)
+        try:
+            self.get_collection(physical_name).query(query_embeddings=embedding, n_results=1)
+        except (ValueError, Exception):
+            # Nothing indexed yet
+            pass
+        if self.lexical_index is not None:
+            self.lexical_index.search(physical_name, "warm up", 1)
+    
+    def get_collection(self, collection_name):
+        """
+        Return an existing collection, using the cached handle if there is one.
+        
+        Aliased names resolve to the generation currently serving them.
+        
+        Raises:
+            Exception: If the collection doesn't exist
+        """
+        collection_name = self.aliases.resolve(collection_name)
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self.client.get_collection(collection_name, **self._collection_kwargs())
+            self._collections[collection_name] = collection
+        return collection
+    
     def create_collection(self, collection_name):
         """Create a new collection in the database."""
         try:
             # Try to get existing collection first
-            collection = self.client.get_collection(collection_name)
-            return collection
+            return self.get_collection(collection_name)
         except (ValueError, Exception):
             # Collection doesn't exist, create it
-            collection = self.client.create_collection(collection_name)
+            collection_name = self.aliases.resolve(collection_name)
+            collection = self.client.create_collection(collection_name, **self._collection_kwargs())
+            self._collections[collection_name] = collection
             return collection
     
     def clear_and_create_collection(self, collection_name):
         """Delete existing collection and create a new one."""
+        collection_name = self.aliases.resolve(collection_name)
+        self._collections.pop(collection_name, None)
+        if self.document_store is not None:
+            self.document_store.clear(collection_name)
+        if self.lexical_index is not None:
+            self.lexical_index.drop(collection_name)
         try:
             # Try to delete existing collection
             self.client.delete_collection(collection_name)
@@ -32,7 +190,159 @@ class ChromaManager:
             pass
         
         # Create new collection
-        return self.client.create_collection(collection_name)
+        collection = self.client.create_collection(collection_name, **self._collection_kwargs())
+        self._collections[collection_name] = collection
+        self.touch(collection_name)
+        return collection
+    
+    def touch(self, collection_name):
+        """
+        Record that a collection's content changed, invalidating cached queries.
+        
+        Inside deferred_revisions the revision is bumped when the block ends.
+        """
+        physical_name = self.aliases.resolve(collection_name)
+        if self._touched is not None:
+            self._touched.add(physical_name)
+        else:
+            self.aliases.bump_revision(physical_name)
+    
+    @contextlib.contextmanager
+    def deferred_revisions(self):
+        """
+        Bump each written collection's revision once, as the block ends.
+        
+        Used around index runs and watch batches, so the aliases file is
+        rewritten once instead of after every file. Until then, caches and
+        other processes keep seeing the previous revision.
+        """
+        if self._touched is not None:
+            yield
+            return
+        self._touched = set()
+        try:
+            yield
+        finally:
+            touched, self._touched = self._touched, None
+            if touched:
+                self.aliases.bump_revisions(sorted(touched))
+    
+    def index_lexical(self, collection_name, ids, documents, metadatas=None):
+        """Stage written chunks in the lexical index, if there is one."""
+        if self.lexical_index is not None and ids:
+            self.lexical_index.add(self.aliases.resolve(collection_name), ids, documents, metadatas)
+    
+    def compile_lexical(self, collection_name, background=False):
+        """
+        Compile staged lexical index changes for a collection.
+        
+        With background=True the compile runs in a daemon thread and
+        searches keep using the previous version until it is done.
+        
+        Returns:
+            Number of chunks in the compiled index, or None if nothing changed
+            or the compile runs in the background
+        """
+        if self.lexical_index is None:
+            return None
+        physical_name = self.aliases.resolve(collection_name)
+        if not self.lexical_index.is_dirty(physical_name):
+            return None
+        if background:
+            self.lexical_index.compile_in_background(physical_name)
+            return None
+        return self.lexical_index.compile(physical_name)
+    
+    def _drop_collection(self, physical_name):
+        """Delete a physical collection, its stored documents and its revision."""
+        self._collections.pop(physical_name, None)
+        if self._touched is not None:
+            self._touched.discard(physical_name)
+        self.aliases.forget_revision(physical_name)
+        if self.document_store is not None:
+            self.document_store.clear(physical_name)
+        if self.lexical_index is not None:
+            self.lexical_index.drop(physical_name)
+        try:
+            self.client.delete_collection(physical_name)
+        except (ValueError, Exception):
+            pass
+    
+    def generations(self, collection_name):
+        """Return the generation numbers of collection_name that exist, sorted."""
+        generations = []
+        for collection in self.client.list_collections():
+            generation = parse_generation(collection_name, collection.name)
+            if generation is not None:
+                generations.append(generation)
+        return sorted(generations)
+    
+    def begin_rebuild(self, collection_name):
+        """
+        Create an empty shadow collection to rebuild collection_name into.
+        
+        Readers keep using the current generation until commit_rebuild.
+        
+        Returns:
+            The physical name of the shadow collection
+        """
+        current = parse_generation(collection_name, self.aliases.resolve(collection_name)) or 0
+        shadow = generation_name(collection_name, max([current] + self.generations(collection_name)) + 1)
+        self._drop_collection(shadow)
+        collection = self.client.create_collection(shadow, **self._collection_kwargs())
+        self._collections[shadow] = collection
+        return shadow
+    
+    def commit_rebuild(self, collection_name, shadow):
+        """
+        Atomically switch collection_name to a rebuilt shadow collection.
+        
+        The previous generation, and any shadows left over from abandoned
+        rebuilds, are deleted afterwards.
+        
+        Returns:
+            List of the physical collections that were deleted
+        """
+        previous = self.aliases.resolve(collection_name)
+        self.compile_lexical(shadow)
+        self.aliases.set(collection_name, shadow)
+        
+        stale = [collection.name for collection in self.client.list_collections()
+                 if collection.name != shadow and (
+                     collection.name == previous
+                     or parse_generation(collection_name, collection.name) is not None)]
+        for name in stale:
+            self._drop_collection(name)
+        return stale
+    
+    def abort_rebuild(self, shadow):
+        """Discard a shadow collection that will not be committed."""
+        self._drop_collection(shadow)
+    
+    def store_document(self, collection_name, source_path, body):
+        """Keep a file's parsed body in the document store, if there is one."""
+        if self.document_store is not None:
+            self.document_store.put(self.aliases.resolve(collection_name), source_path, body)
+    
+    def remove_document(self, collection_name, source_path):
+        """Drop a file's body from the document store, if there is one."""
+        if self.document_store is not None:
+            self.document_store.remove(self.aliases.resolve(collection_name), source_path)
+    
+    def stored_documents(self, documents, metadatas):
+        """
+        Return the documents to write to Chroma for chunk records.
+        
+        With a document store, chunks it can rebuild are written as None.
+        """
+        if self.document_store is None:
+            return documents
+        return [None if "chunk_start" in metadata and "source_path" in metadata else document
+                for document, metadata in zip(documents, metadatas)]
+    
+    def bulk_writer(self, collection_name, batch_size=256):
+        """Return a BulkWriter that batches chunk writes into a collection."""
+        return BulkWriter(self, collection_name, batch_size=batch_size)
     
     def store_chunks(self, collection_name, chunks):
         """Store text chunks in the specified collection."""
@@ -47,16 +357,76 @@ class ChromaManager:
             documents=documents,
             ids=ids
         )
+        self.index_lexical(collection_name, ids, documents)
+        self.touch(collection_name)
         
         return len(chunks)
     
-    def store_chunks_with_metadata(self, collection_name, chunks, source_file, headers):
-        """Store text chunks with metadata about source file."""
+    def store_chunks_with_metadata(self, collection_name, chunks, source_file, headers,
+                                   source_path=None, embeddings=None, spans=None):
+        """
+        Store text chunks with metadata about source file.
+        
+        source_path is the file's path relative to the knowledge base root;
+        it is recorded so the file's chunks can be deleted on re-index.
+        If embeddings are given they are stored as-is instead of being
+        computed by the collection. spans are the chunks' (start, end)
+        offsets in the document body, see chunk_records.
+        """
         collection = self.create_collection(collection_name)
         
-        # Prepare documents and unique IDs that include source file
         documents = chunks
-        ids = [f"{source_file}_chunk_{i}" for i in range(len(chunks))]
+        ids, metadatas = self.chunk_records(chunks, source_file, headers, source_path, spans)
+        if embeddings is None and self.embedding_cache is not None:
+            embeddings = self.embed(chunks)
+        
+        # Add documents to collection with metadata
+        collection.add(
+            documents=self.stored_documents(documents, metadatas),
+            ids=ids,
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
+        self.index_lexical(collection_name, ids, documents, metadatas)
+        self.touch(collection_name)
+        
+        return len(chunks)
+    
+    @staticmethod
+    def chunk_id(source_path, chunk, occurrence=1):
+        """
+        Return the stable ID of a chunk.
+        
+        IDs combine the path relative to the knowledge base root with a hash
+        of the chunk text, so they don't collide between files with the same
+        name and don't shift when text is inserted earlier in the file.
+        Repeated identical chunks in one file get an occurrence suffix.
+        """
+        digest = hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:16]
+        chunk_id = f"{source_path}#{digest}"
+        return chunk_id if occurrence == 1 else f"{chunk_id}-{occurrence}"
+    
+    @classmethod
+    def chunk_records(cls, chunks, source_file, headers, source_path=None, spans=None):
+        """
+        Build the IDs and metadata stored with a file's chunks.
+        
+        Without a source_path, IDs fall back to the file stem and chunk
+        position. Filetags are also stored as filterable keys (see
+        tag_metadata). With spans, each chunk's (start, end) offsets in the
+        document body are stored as chunk_start and chunk_end.
+        
+        Returns:
+            Tuple of (ids, metadatas) lists, one entry per chunk
+        """
+        if source_path is not None:
+            occurrences = {}
+            ids = []
+            for chunk in chunks:
+                occurrences[chunk] = occurrences.get(chunk, 0) + 1
+                ids.append(cls.chunk_id(source_path, chunk, occurrences[chunk]))
+        else:
+            ids = [f"{source_file}_chunk_{i}" for i in range(len(chunks))]
         
         # Prepare metadata for each chunk
         metadatas = []
@@ -64,30 +434,429 @@ class ChromaManager:
             metadata = {
                 "source_file": source_file,
                 "chunk_index": i,
-                "title": headers.get('title', ''),
+                "title": headers.get('title') or '',
                 "filetags": ','.join(headers.get('filetags', [])),
-                "id": headers.get('id', '')
+                "id": headers.get('id') or '',
+                **tag_metadata(headers.get('filetags', []))
             }
+            if source_path is not None:
+                metadata["source_path"] = source_path
+            if spans is not None:
+                metadata["chunk_start"], metadata["chunk_end"] = spans[i]
             metadatas.append(metadata)
         
-        # Add documents to collection with metadata
-        collection.add(
-            documents=documents,
-            ids=ids,
-            metadatas=metadatas
+        return ids, metadatas
+    
+    def apply_file_diff(self, collection_name, source_path, ids, metadatas, defer_updates=False):
+        """
+        Reconcile a file's stored chunks with its new chunk IDs.
+        
+        Chunks whose IDs vanished are deleted and surviving chunks get their
+        metadata (e.g. chunk_index) updated without re-embedding. With
+        defer_updates=True surviving chunks whose metadata changed are
+        returned with the new ones instead, for a caller that writes them
+        later together with the file's new body.
+        
+        Returns:
+            Tuple of (positions, kept_count, deleted_count) where positions
+            indexes the chunks that still have to be written
+        """
+        collection = self.create_collection(collection_name)
+        existing = collection.get(where={"source_path": source_path}, include=["metadatas"])
+        existing_metadatas = dict(zip(existing["ids"], existing["metadatas"]))
+        
+        id_set = set(ids)
+        stale_ids = [chunk_id for chunk_id in existing_metadatas if chunk_id not in id_set]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(self.aliases.resolve(collection_name), ids=stale_ids)
+        
+        new_positions = []
+        update_ids = []
+        update_metadatas = []
+        for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+            if chunk_id not in existing_metadatas:
+                new_positions.append(i)
+            elif existing_metadatas[chunk_id] != metadata:
+                if defer_updates:
+                    new_positions.append(i)
+                else:
+                    update_ids.append(chunk_id)
+                    update_metadatas.append(metadata)
+        kept = sum(1 for chunk_id in ids if chunk_id in existing_metadatas)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+            if self.lexical_index is not None:
+                # Filetag edits change the tag postings of unchanged chunks
+                self.lexical_index.update_tags(self.aliases.resolve(collection_name), update_ids,
+                                               update_metadatas)
+        if stale_ids or update_ids:
+            self.touch(collection_name)
+        
+        return new_positions, kept, len(stale_ids)
+    
+    def sync_file_chunks(self, collection_name, chunks, source_file, headers, source_path,
+                         embeddings=None, spans=None):
+        """
+        Bring a file's stored chunks in line with its current chunks.
+        
+        Only chunks with new content are embedded and written; vanished ones
+        are deleted, so write volume is proportional to the size of the edit.
+        
+        Returns:
+            Tuple of (added, kept, deleted) chunk counts
+        """
+        ids, metadatas = self.chunk_records(chunks, source_file, headers, source_path, spans)
+        new_positions, kept, deleted = self.apply_file_diff(collection_name, source_path, ids, metadatas)
+        
+        if new_positions:
+            new_chunks = [chunks[i] for i in new_positions]
+            new_metadatas = [metadatas[i] for i in new_positions]
+            documents = self.stored_documents(new_chunks, new_metadatas)
+            if embeddings is not None:
+                new_embeddings = [embeddings[i] for i in new_positions]
+            elif self.embedding_cache is not None or documents is not new_chunks:
+                new_embeddings = self.embed(new_chunks)
+            else:
+                new_embeddings = None
+            self.create_collection(collection_name).upsert(
+                ids=[ids[i] for i in new_positions],
+                documents=documents,
+                metadatas=new_metadatas,
+                embeddings=new_embeddings
+            )
+            self.index_lexical(collection_name, [ids[i] for i in new_positions], new_chunks, new_metadatas)
+            self.touch(collection_name)
+        
+        return len(new_positions), kept, deleted
+    
+    def delete_file_chunks(self, collection_name, source_path):
+        """Delete all chunks that were stored for a given source path."""
+        collection = self.create_collection(collection_name)
+        collection.delete(where={"source_path": source_path})
+        if self.lexical_index is not None:
+            self.lexical_index.remove(self.aliases.resolve(collection_name), source_path=source_path)
+        self.touch(collection_name)
+        self.remove_document(collection_name, source_path)
+    
+    def _fill_documents(self, collection_name, results):
+        """Rebuild chunk text the document store holds for query results."""
+        if self.document_store is None or not results.get("documents"):
+            return results
+        collection_name = self.aliases.resolve(collection_name)
+        for documents, metadatas in zip(results["documents"], results["metadatas"]):
+            for i, (document, metadata) in enumerate(zip(documents, metadatas)):
+                if document is None and metadata:
+                    documents[i] = self.document_store.chunk_text(collection_name, metadata) or ''
+        return results
+    
+    def _vector_query(self, physical_name, query_text, n_results, where, tags=None):
+        """Nearest-neighbour search in a physical collection."""
+        results = self.get_collection(physical_name).query(
+            query_embeddings=self.embed_queries([query_text]),
+            n_results=n_results,
+            where=combine_where(where, tag_where(tags or []))
         )
+        return self._fill_documents(physical_name, results)
+    
+    def _records(self, physical_name, ids, where=None):
+        """
+        Fetch documents and metadata of chunks by ID.
         
-        return len(chunks)
+        Returns:
+            Dict of chunk ID to (document, metadata), limited to chunks
+            matching where
+        """
+        if not ids:
+            return {}
+        stored = self.get_collection(physical_name).get(ids=ids, where=where,
+                                                        include=["documents", "metadatas"])
+        stored = self._fill_documents(physical_name, {"documents": [stored["documents"]],
+                                                      "metadatas": [stored["metadatas"]],
+                                                      "ids": [stored["ids"]]})
+        return {chunk_id: (document, metadata) for chunk_id, document, metadata
+                in zip(stored["ids"][0], stored["documents"][0], stored["metadatas"][0])}
+    
+    def _lexical_hits(self, physical_name, query_text, n_results, where, tags=None):
+        """
+        Return the BM25 ranking as (chunk_id, score) pairs.
+        
+        Tag filters are applied inside the index. With a where filter,
+        extra candidates are ranked so that up to n_results of them survive
+        filtering.
+        """
+        if self.lexical_index is None:
+            return []
+        depth = n_results if where is None else max(n_results * 4, 50)
+        hits = self.lexical_index.search(physical_name, query_text, depth, tags=tags)
+        if where is not None:
+            allowed = self._records(physical_name, [chunk_id for chunk_id, _ in hits], where)
+            hits = [hit for hit in hits if hit[0] in allowed]
+        return hits[:n_results]
+    
+    def _lexical_query(self, physical_name, query_text, n_results, where, tags=None):
+        """BM25 search, shaped like a vector query result with scores."""
+        hits = self._lexical_hits(physical_name, query_text, n_results, where, tags)
+        records = self._records(physical_name, [chunk_id for chunk_id, _ in hits])
+        hits = [hit for hit in hits if hit[0] in records]
+        return {
+            "ids": [[chunk_id for chunk_id, _ in hits]],
+            "documents": [[records[chunk_id][0] for chunk_id, _ in hits]],
+            "metadatas": [[records[chunk_id][1] for chunk_id, _ in hits]],
+            "distances": [[None] * len(hits)],
+            "scores": [[score for _, score in hits]],
+        }
     
-    def query_collection(self, collection_name, query_text, n_results=5):
-        """Query a collection for similar content."""
+    def _hybrid_query(self, physical_name, query_text, n_results, where, tags=None, rrf_k=60):
+        """
+        Fuse vector and BM25 rankings with reciprocal rank fusion.
+        
+        Each chunk scores the sum of 1 / (rrf_k + rank) over the rankings
+        it appears in.
+        """
+        depth = max(n_results * 4, 20)
+        vector = self._vector_query(physical_name, query_text, depth, where, tags)
+        lexical = self._lexical_hits(physical_name, query_text, depth, where, tags)
+        
+        scores = {}
+        records = {}
+        distances = {}
+        if vector["ids"]:
+            for rank, (chunk_id, document, metadata, distance) in enumerate(zip(
+                    vector["ids"][0], vector["documents"][0], vector["metadatas"][0],
+                    vector["distances"][0]), 1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+                records[chunk_id] = (document, metadata)
+                distances[chunk_id] = distance
+        for rank, (chunk_id, _) in enumerate(lexical, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+        
+        ranked = sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:n_results]
+        records.update(self._records(physical_name, [chunk_id for chunk_id in ranked
+                                                     if chunk_id not in records]))
+        ranked = [chunk_id for chunk_id in ranked if chunk_id in records]
+        return {
+            "ids": [ranked],
+            "documents": [[records[chunk_id][0] for chunk_id in ranked]],
+            "metadatas": [[records[chunk_id][1] for chunk_id in ranked]],
+            "distances": [[distances.get(chunk_id) for chunk_id in ranked]],
+            "scores": [[scores[chunk_id] for chunk_id in ranked]],
+        }
+    
+    def query_collection(self, collection_name, query_text, n_results=5, where=None, mode='vector',
+                         tags=None):
+        """
+        Query a collection for similar content.
+        
+        where is an optional ChromaDB metadata filter and tags an optional
+        list of normalized tag filters (see normalize_tag), all of which
+        results must match. mode 'vector' runs a
+        nearest-neighbour search, 'lexical' ranks by BM25 and 'hybrid' fuses
+        both rankings; the latter two also return a "scores" field.
+        
+        Raises:
+            ValueError: If mode is unknown
+        """
+        queries = {'vector': self._vector_query, 'lexical': self._lexical_query,
+                   'hybrid': self._hybrid_query}
+        if mode not in queries:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {tuple(queries)}")
+        
+        for attempt in range(2):
+            physical_name = self.aliases.resolve(collection_name)
+            cache_key = None
+            if self.query_cache is not None:
+                revision = self.aliases.revision(physical_name)
+                if mode != 'vector' and self.lexical_index is not None:
+                    # Lexical results change when a background compile is published
+                    revision = [revision, self.lexical_index.version(physical_name)]
+                cache_key = self.query_cache.key(physical_name, revision,
+                                                 query_text, n_results,
+                                                 combine_where(where, tag_where(tags or [])), mode,
+                                                 database=self.database_key)
+                cached = self.query_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            try:
+                results = queries[mode](physical_name, query_text, n_results, where, tags)
+                if cache_key is not None:
+                    self.query_cache.put(cache_key, results)
+                return results
+            except (ValueError, Exception):
+                # A rebuild may have switched generations mid-query: retry once
+                self._collections.pop(physical_name, None)
+                if attempt == 0 and self.aliases.resolve(collection_name) != physical_name:
+                    continue
+                # Collection doesn't exist or other error
+                return {"documents": [], "metadatas": [], "distances": [], "ids": []}
+    
+    def query_collection_many(self, collection_name, queries, n_results=5, where=None, tags=None,
+                              mode='vector'):
+        """
+        Query a collection for many queries at once.
+        
+        where, tags and mode are as in query_collection. Vector queries not
+        answered by the query cache are embedded in one batch and searched
+        in one call; lexical and hybrid queries run one by one.
+        
+        Returns:
+            List with one result per query, shaped like query_collection's
+        
+        Raises:
+            ValueError: If mode is unknown
+        """
+        queries = list(queries)
+        if mode != 'vector':
+            return [self.query_collection(collection_name, query_text, n_results, where, mode, tags)
+                    for query_text in queries]
+        where = combine_where(where, tag_where(tags or []))
+        empty = {"documents": [], "metadatas": [], "distances": [], "ids": []}
+        for attempt in range(2):
+            physical_name = self.aliases.resolve(collection_name)
+            results = [None] * len(queries)
+            keys = [None] * len(queries)
+            if self.query_cache is not None:
+                revision = self.aliases.revision(physical_name)
+                for i, query_text in enumerate(queries):
+                    keys[i] = self.query_cache.key(physical_name, revision, query_text, n_results, where,
+                                                   database=self.database_key)
+                    results[i] = self.query_cache.get(keys[i])
+            
+            # Queries equal after normalization (as the cache sees them) are
+            # embedded and searched once, using the first one's text
+            pending = {}
+            for i, result in enumerate(results):
+                if result is None:
+                    pending.setdefault(normalize_query(queries[i]), []).append(i)
+            if not pending:
+                return results
+            
+            try:
+                collection = self.get_collection(physical_name)
+                texts = [queries[indices[0]] for indices in pending.values()]
+                batch = collection.query(
+                    query_embeddings=self.embed_queries(texts),
+                    n_results=n_results,
+                    where=where
+                )
+            except (ValueError, Exception):
+                self._collections.pop(physical_name, None)
+                if attempt == 0 and self.aliases.resolve(collection_name) != physical_name:
+                    continue
+                return [result if result is not None else dict(empty) for result in results]
+            
+            for position, indices in enumerate(pending.values()):
+                result = {field: [batch[field][position]] if batch.get(field) is not None else None
+                          for field in ("ids", "documents", "metadatas", "distances")}
+                result = self._fill_documents(physical_name, result)
+                if self.query_cache is not None:
+                    self.query_cache.put(keys[indices[0]], result)
+                # Each query gets its own copy, as from the cache
+                results[indices[0]] = result
+                for i in indices[1:]:
+                    results[i] = copy.deepcopy(result)
+            return results
+
+class BulkWriter:
+    """
+    Buffer chunks from many files and write them to a collection in batches.
+    
+    Chunks are upserted once batch_size of them have accumulated (capped at
+    the client's maximum batch size) and on flush(), so a knowledge base of
+    many small notes costs a few large writes and embedding calls instead of
+    one per file. Use as a context manager to flush on exit.
+    """
+    
+    def __init__(self, chroma, collection_name, batch_size=256):
+        """Initialize writer for a collection."""
+        self.chroma = chroma
+        self.collection_name = collection_name
         try:
-            collection = self.client.get_collection(collection_name)
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results
+            max_batch_size = chroma.client.get_max_batch_size()
+        except Exception:
+            max_batch_size = batch_size
+        self.batch_size = max(1, min(batch_size, max_batch_size))
+        self.flush_count = 0
+        # Records keyed by ID, so a repeated ID replaces the pending one like an upsert
+        self._records = {}
+        self._callbacks = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+    
+    def add(self, chunks, source_file, headers, source_path=None, embeddings=None, on_flushed=None,
+            spans=None):
+        """
+        Queue a file's chunks for writing.
+        
+        on_flushed, if given, is called once the chunks have been written.
+        Embeddings missing at flush time are computed in one batch.
+        
+        Returns:
+            Number of chunks queued
+        """
+        ids, metadatas = self.chroma.chunk_records(chunks, source_file, headers, source_path, spans)
+        return self.add_records(ids, chunks, metadatas, embeddings, on_flushed)
+    
+    def add_records(self, ids, documents, metadatas, embeddings=None, on_flushed=None):
+        """
+        Queue prepared chunk records for writing.
+        
+        Returns:
+            Number of records queued
+        """
+        for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+            embedding = embeddings[i] if embeddings is not None else None
+            self._records.pop(chunk_id, None)
+            self._records[chunk_id] = (document, metadata, embedding)
+        if on_flushed is not None:
+            self._callbacks.append(on_flushed)
+        
+        if len(self._records) >= self.batch_size:
+            self.flush()
+        return len(ids)
+    
+    def flush(self):
+        """Write all buffered chunks."""
+        if not self._records:
+            for callback in self._callbacks:
+                callback()
+            self._callbacks = []
+            return
+        
+        records, callbacks = self._records, self._callbacks
+        self._records, self._callbacks = {}, []
+        
+        ids = list(records)
+        documents = [record[0] for record in records.values()]
+        metadatas = [record[1] for record in records.values()]
+        
+        # Embed everything that arrived without embeddings in one call
+        missing = [i for i, record in enumerate(records.values()) if record[2] is None]
+        embeddings = [record[2] for record in records.values()]
+        if missing:
+            computed = self.chroma.embed([documents[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        
+        stored = self.chroma.stored_documents(documents, metadatas)
+        collection = self.chroma.create_collection(self.collection_name)
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            collection.upsert(
+                ids=ids[start:end],
+                documents=stored[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end]
             )
-            return results
-        except (ValueError, Exception):
-            # Collection doesn't exist or other error
-            return {"documents": [], "metadatas": [], "distances": [], "ids": []}
+        self.chroma.index_lexical(self.collection_name, ids, documents, metadatas)
+        self.chroma.touch(self.collection_name)
+        self.flush_count += 1
+        
+        for callback in callbacks:
+            callback()
@@ -1,34 +1,278 @@
+import re
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Boundary strengths for structured chunking: higher is a better place to cut
+SENTENCE, PARAGRAPH, HEADING = 1, 2, 3
+
+# One pass finds every boundary: org headings, blank lines, sentence ends
+_BOUNDARY_PATTERN = re.compile(r'\n(?=\*+ )|\n[ \t]*\n|[.!?](?=\s)')
+_HEADING_START = re.compile(r'\*+ ')
+
+# Pure-Python token approximation: words (long ones split like word pieces)
+# and punctuation marks
+_TOKEN_PATTERN = re.compile(r'\w{1,8}|[^\w\s]')
+
+# Tokenizer of the default embedding model, once ChromaDB has downloaded it
+DEFAULT_TOKENIZER_PATH = (Path.home() / ".cache" / "chroma" / "onnx_models" /
+                          "all-MiniLM-L6-v2" / "onnx" / "tokenizer.json")
+
+CHUNKING_MODES = ('fixed', 'structured', 'tokens')
+
+
 class ChunkingEngine:
     """Engine for splitting content into chunks for vector embedding."""
-    
-    def __init__(self, chunk_size=1000, chunk_overlap=200):
-        """Initialize chunking engine with size and overlap parameters."""
+
+    TOKEN_CACHE_SIZE = 32
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, mode='fixed', tokenizer_path=None):
+        """
+        Initialize chunking engine with size and overlap parameters.
+
+        mode 'fixed' cuts at fixed character offsets with chunk_overlap
+        characters of overlap. mode 'structured' cuts at org headings,
+        paragraph breaks or sentence ends, and only overlaps when a single
+        unit longer than chunk_size has to be split. mode 'tokens' measures
+        chunk_size and chunk_overlap in tokens of the tokenizer at
+        tokenizer_path (default: the embedding model's, if downloaded),
+        falling back to a word-based approximation.
+        """
+        if mode not in CHUNKING_MODES:
+            raise ValueError(f"Unknown chunking mode '{mode}', expected one of {CHUNKING_MODES}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-    
+        self.mode = mode
+        self.tokenizer_path = tokenizer_path
+        self._tokenizer = None
+        self._token_cache = OrderedDict()
+
+    def __getstate__(self):
+        # The tokenizer is reloaded lazily in worker processes
+        state = self.__dict__.copy()
+        state['_tokenizer'] = None
+        state['_token_cache'] = OrderedDict()
+        return state
+
+    @property
+    def tokenizer(self):
+        """
+        The tokenizers.Tokenizer used in 'tokens' mode, or False if the
+        pure-Python approximation is used.
+        """
+        if self._tokenizer is None:
+            path = Path(self.tokenizer_path) if self.tokenizer_path else DEFAULT_TOKENIZER_PATH
+            self._tokenizer = False
+            if path.exists():
+                try:
+                    from tokenizers import Tokenizer
+                    self._tokenizer = Tokenizer.from_file(str(path))
+                    self._tokenizer.no_truncation()
+                    self._tokenizer.no_padding()
+                except Exception:
+                    if self.tokenizer_path:
+                        raise
+        return self._tokenizer
+
+    @property
+    def token_budget(self):
+        """
+        Content tokens per chunk in 'tokens' mode: chunk_size less the
+        special tokens (such as [CLS] and [SEP]) the tokenizer adds around
+        each text when it is embedded.
+        """
+        tokenizer = self.tokenizer
+        special = tokenizer.num_special_tokens_to_add(False) if tokenizer is not False else 0
+        return max(1, self.chunk_size - special)
+
+    def token_offsets(self, content):
+        """
+        Tokenize content, caching the result for recently seen content.
+
+        Returns:
+            Tuple of (starts, ends) arrays of character offsets per token
+        """
+        cached = self._token_cache.get(content)
+        if cached is not None:
+            self._token_cache.move_to_end(content)
+            return cached
+
+        starts = array('I')
+        ends = array('I')
+        tokenizer = self.tokenizer
+        if tokenizer is not False:
+            for start, end in tokenizer.encode(content, add_special_tokens=False).offsets:
+                if end > start:
+                    starts.append(start)
+                    ends.append(end)
+        else:
+            for match in _TOKEN_PATTERN.finditer(content):
+                starts.append(match.start())
+                ends.append(match.end())
+
+        self._token_cache[content] = (starts, ends)
+        if len(self._token_cache) > self.TOKEN_CACHE_SIZE:
+            self._token_cache.popitem(last=False)
+        return starts, ends
+
+    def count_tokens(self, content):
+        """Return the number of tokens in content."""
+        return len(self.token_offsets(content)[0])
+
     def chunk_content(self, content):
         """Split content into chunks and return as list."""
+        return [content[start:end] for start, end in self.iter_spans(content)]
+
+    def iter_spans(self, content):
+        """
+        Yield chunk boundaries as (start, end) offsets into content.
+
+        Chunks are content[start:end]; spans let callers defer copying text
+        until it is actually needed.
+        """
+        if self.mode == 'structured':
+            yield from self._structured_spans(content)
+            return
+        if self.mode == 'tokens':
+            yield from self._token_spans(content)
+            return
+
         if len(content) <= self.chunk_size:
-            return [content]
-        
-        chunks = []
+            yield 0, len(content)
+            return
+
         start = 0
-        
+
         while start < len(content):
             # Calculate end position for this chunk
             end = start + self.chunk_size
-            
-            # Extract the chunk
-            chunk = content[start:end]
-            chunks.append(chunk)
-            
+            yield start, min(end, len(content))
+
             # If this is the last chunk, we're done
             if end >= len(content):
                 break
-            
+
             # Move start position forward, accounting for overlap
             # Ensure we always make progress to avoid infinite loops
             step = max(1, self.chunk_size - self.chunk_overlap)
             start = start + step
-        
-        return chunks
+
+    @staticmethod
+    def boundary_index(content):
+        """
+        Find chunk boundaries in one linear pass.
+
+        A heading is kept together with what follows it, so there is no
+        boundary inside or right after a heading line.
+
+        Returns:
+            Tuple of (positions, strengths) lists; each position is the
+            offset where a new unit starts
+        """
+        positions = []
+        strengths = []
+        heading_end = -1
+        if _HEADING_START.match(content):
+            heading_end = content.find('\n')
+            if heading_end == -1:
+                heading_end = len(content)
+        for match in _BOUNDARY_PATTERN.finditer(content):
+            text = match.group()
+            position = match.end()
+            if text[0] in '.!?':
+                strength = SENTENCE
+            elif text == '\n' or _HEADING_START.match(content, position):
+                # The unit starting here is a heading line
+                strength = HEADING
+            else:
+                strength = PARAGRAPH
+
+            if match.start() > heading_end:
+                positions.append(position)
+                strengths.append(strength)
+            if strength == HEADING and match.start() >= heading_end:
+                heading_end = content.find('\n', position)
+                if heading_end == -1:
+                    heading_end = len(content)
+        return positions, strengths
+
+    def _structured_spans(self, content):
+        """
+        Yield (start, end) spans that snap to structural boundaries.
+
+        Each chunk is packed up to chunk_size. Within the second half of that
+        window the strongest boundary wins (latest on ties), so chunks prefer
+        to end before a heading, then at a paragraph, then at a sentence.
+        Without any boundary in the window the text is cut at the last space
+        (or at chunk_size) and the next chunk overlaps by chunk_overlap.
+        """
+        positions, strengths = self.boundary_index(content)
+        length = len(content)
+        size = max(1, self.chunk_size)
+        cursor = 0
+        start = 0
+
+        while start < length:
+            limit = start + size
+            if limit >= length:
+                end = length
+            else:
+                while cursor < len(positions) and positions[cursor] <= start:
+                    cursor += 1
+
+                best = None
+                best_strength = 0
+                latest = None
+                half = start + size // 2
+                i = cursor
+                while i < len(positions) and positions[i] <= limit:
+                    latest = positions[i]
+                    if positions[i] >= half and strengths[i] >= best_strength:
+                        best = positions[i]
+                        best_strength = strengths[i]
+                    i += 1
+                end = best if best is not None else latest
+
+            if end is None:
+                # A single unit longer than chunk_size: cut (between words if
+                # possible) and overlap
+                space = content.rfind(' ', start + size // 2, limit)
+                end = space + 1 if space != -1 else limit
+                next_start = max(start + 1, end - self.chunk_overlap)
+                space = content.find(' ', next_start, end)
+                if space != -1 and space + 1 < end:
+                    next_start = space + 1
+            else:
+                next_start = end
+
+            # Trim surrounding whitespace from the emitted span
+            span_start, span_end = start, end
+            while span_start < span_end and content[span_start].isspace():
+                span_start += 1
+            while span_end > span_start and content[span_end - 1].isspace():
+                span_end -= 1
+            if span_start < span_end:
+                yield span_start, span_end
+
+            start = next_start
+
+    def _token_spans(self, content):
+        """
+        Yield (start, end) spans of exactly token_budget tokens.
+
+        Only the last span may be shorter; consecutive spans share
+        chunk_overlap tokens.
+        """
+        starts, ends = self.token_offsets(content)
+        count = len(starts)
+        size = self.token_budget
+        step = max(1, size - self.chunk_overlap)
+
+        first = 0
+        while first < count:
+            last = min(first + size, count)
+            yield starts[first], ends[last - 1]
+            if last >= count:
+                break
+            first += step
@@ -1,13 +1,22 @@
 import argparse
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import signal
 import sys
 from pathlib import Path
 
 from .config import Config
-from .config_loader import find_config_file
-from .scanner import KnowledgeBaseScanner
-from .parser import OrgParser
-from .chunking import ChunkingEngine
-from .chroma_manager import ChromaManager
+from .config_loader import find_config_file, default_cache_dir
+from .scanner import KnowledgeBaseScanner, SNAPSHOT_FILENAME
+from .tags import normalize_tag
+from .manifest import IndexManifest, MANIFEST_FILENAME
+from .factory import create_chroma_manager, create_chunker
+
+# chromadb, numpy and the indexing machinery are imported inside the
+# commands that use them, so `config`, `--help` and friends start quickly
 
 
 def get_config_path(args_config):
@@ -43,6 +52,30 @@ def get_config_path(args_config):
     sys.exit(1)
 
 
+def run_search(config, db_path, method, use_daemon=True, **params):
+    """
+    Run a ChromaManager search method, through `daimon serve` if possible.
+    
+    A daemon serving db_path answers from warm state; if none is running
+    (or use_daemon is False, or the daemon fails) the search runs in
+    this process instead.
+    """
+    if use_daemon:
+        from .server import DaemonClient, DaemonError
+        daemon = DaemonClient.connect(db_path)
+        if daemon is not None:
+            try:
+                with daemon:
+                    return daemon.call(method, **params)
+            except (OSError, ValueError, DaemonError):
+                pass
+    chroma = create_chroma_manager(config, db_path)
+    try:
+        return getattr(chroma, method)(**params)
+    finally:
+        chroma.close()
+
+
 def config_command(args_config, db_path_override=None):
     """Display current configuration settings."""
     output = []
@@ -64,8 +97,15 @@ def config_command(args_config, db_path_override=None):
         if db_path_override:
             output.append(f"    (overridden from command line)")
         
-        output.append(f"  Chunk Size: {config.chunk_size}")
-        output.append(f"  Chunk Overlap: {config.chunk_overlap}")
+        unit = "tokens" if config.get('chunking_mode') == 'tokens' else "characters"
+        output.append(f"  Chunk Size: {config.chunk_size} {unit}")
+        output.append(f"  Chunk Overlap: {config.chunk_overlap} {unit}")
+        output.append(f"  Chunking Mode: {config.get('chunking_mode', 'fixed')}")
+        cache_dir = config.get('embedding_cache_dir', str(default_cache_dir() / "embeddings"))
+        output.append(f"  Embedding Cache: {os.path.expanduser(str(cache_dir)) if cache_dir else 'disabled'}")
+        output.append(f"  Document Store: {'enabled' if config.get('document_store', False) else 'disabled'}")
+        query_cache_dir = config.get('query_cache_dir', str(default_cache_dir() / "queries"))
+        output.append(f"  Query Cache: {os.path.expanduser(str(query_cache_dir)) if query_cache_dir else 'memory only'}")
         
         # Check if paths exist
         kb_path = Path(config.knowledge_base_root)
@@ -96,11 +136,16 @@ def status_command(args_config, db_path_override=None):
         output.append(f"Using config: {config_path}")
         output.append("")
         
+        db_path = db_path_override if db_path_override else config.chroma_db_path
+        
         # Check knowledge base files
-        scanner = KnowledgeBaseScanner(config.knowledge_base_root)
+        scanner = KnowledgeBaseScanner(config.knowledge_base_root,
+                                       snapshot_path=Path(db_path) / SNAPSHOT_FILENAME)
         org_files = scanner.scan_org_files()
         output.append(f"Source Files:")
         output.append(f"  Org files found: {len(org_files)}")
+        output.append(f"  Directories listed: {scanner.last_scan_stats['listed']} "
+                      f"(unchanged since last scan: {scanner.last_scan_stats['reused']})")
         if org_files:
             output.append(f"  Files:")
             for org_file in sorted(org_files):
@@ -108,8 +153,7 @@ def status_command(args_config, db_path_override=None):
         output.append("")
         
         # Check ChromaDB status
-        db_path = db_path_override if db_path_override else config.chroma_db_path
-        chroma = ChromaManager(db_path)
+        chroma = create_chroma_manager(config, db_path)
         output.append("ChromaDB Status:")
         
         try:
@@ -118,9 +162,13 @@ def status_command(args_config, db_path_override=None):
             output.append(f"  Collections: {len(collections)}")
             
             if collections:
+                served_by = {physical: alias for alias, physical in chroma.aliases.items()}
                 for collection in collections:
                     count = collection.count()
-                    output.append(f"    - {collection.name}: {count} documents")
+                    if collection.name in served_by:
+                        output.append(f"    - {served_by[collection.name]} -> {collection.name}: {count} documents")
+                    else:
+                        output.append(f"    - {collection.name}: {count} documents")
             else:
                 output.append("    No collections found")
                 output.append("    Tip: Run 'daimon index' to create and populate collections")
@@ -128,6 +176,11 @@ def status_command(args_config, db_path_override=None):
         except Exception as e:
             output.append(f"  Database not accessible: {e}")
             output.append("  Tip: Run 'daimon index' to initialize the database")
+        
+        if chroma.query_cache is not None:
+            stats = chroma.query_cache.stats()
+            output.append(f"  Query cache: {stats['entries']} entries, "
+                          f"{stats['hits']} hits, {stats['misses']} misses")
             
     except Exception as e:
         output.append(f"Error checking status: {e}")
@@ -137,18 +190,33 @@ def status_command(args_config, db_path_override=None):
     return result
 
 
-def search_command(query, args_config, results=5, collection="knowledge_base", db_path_override=None):
-    """Search the knowledge base for relevant content."""
+def search_command(query, args_config, results=5, collection="knowledge_base", db_path_override=None,
+                   mode="vector", tags=None, use_daemon=True):
+    """
+    Search the knowledge base for relevant content.
+    
+    mode 'vector' (default) searches by embedding similarity, 'lexical' by
+    BM25 term matching and 'hybrid' fuses both rankings. tags restricts the
+    search to chunks whose filetags match every filter ('domain:x', 'form:y',
+    'granularity:z' or a bare tag). A running `daimon serve` answers the
+    query unless use_daemon is False.
+    """
     output = []
     
+    try:
+        tags = [normalize_tag(tag) for tag in tags or []]
+    except ValueError as e:
+        output.append(f"Error: {e}")
+        result = "\n".join(output)
+        print(result)
+        return result
+    
     try:
         # Load configuration
         config_path = get_config_path(args_config)
         config = Config(config_path)
         
-        # Initialize ChromaManager
         db_path = db_path_override if db_path_override else config.chroma_db_path
-        chroma = ChromaManager(db_path)
     except Exception as e:
         output.append(f"Error loading configuration: {e}")
         result = "\n".join(output)
@@ -158,10 +226,22 @@ def search_command(query, args_config, results=5, collection="knowledge_base", d
     output.append(f"Searching for: '{query}'")
     output.append(f"Collection: {collection}")
     output.append(f"Max results: {results}")
+    if mode != "vector":
+        output.append(f"Mode: {mode}")
+    if tags:
+        output.append(f"Tags: {', '.join(tags)}")
     output.append("-" * 60)
     
     # Query the collection
-    search_results = chroma.query_collection(collection, query, n_results=results)
+    try:
+        search_results = run_search(config, db_path, 'query_collection', use_daemon,
+                                    collection_name=collection, query_text=query,
+                                    n_results=results, mode=mode, tags=tags)
+    except Exception as e:
+        output.append(f"Error searching: {e}")
+        result = "\n".join(output)
+        print(result)
+        return result
     
     # Check if we got any results
     if not search_results["documents"] or not search_results["documents"][0]:
@@ -175,13 +255,21 @@ def search_command(query, args_config, results=5, collection="knowledge_base", d
     documents = search_results["documents"][0]
     distances = search_results.get("distances", [None] * len(documents))[0] if search_results.get("distances") else [None] * len(documents)
     ids = search_results.get("ids", [None] * len(documents))[0] if search_results.get("ids") else [None] * len(documents)
+    metadatas = search_results.get("metadatas")[0] if search_results.get("metadatas") else [None] * len(documents)
+    scores = search_results.get("scores")[0] if search_results.get("scores") else [None] * len(documents)
     
-    for i, (doc, distance, doc_id) in enumerate(zip(documents, distances, ids), 1):
+    for i, (doc, distance, doc_id, metadata, score) in enumerate(
+            zip(documents, distances, ids, metadatas, scores), 1):
         output.append(f"Result {i}:")
+        if score is not None:
+            output.append(f"  Score: {score:.4f}")
         if distance is not None:
             output.append(f"  Relevance: {1 - distance:.3f}" if distance <= 1 else f"  Distance: {distance:.3f}")
         if doc_id:
             output.append(f"  ID: {doc_id}")
+        if metadata and "chunk_start" in metadata:
+            output.append(f"  Source: {metadata.get('source_path', metadata.get('source_file'))} "
+                          f"(chars {metadata['chunk_start']}-{metadata['chunk_end']})")
         
         # Truncate very long content for readability
         content = doc.strip()
@@ -200,80 +288,455 @@ def search_command(query, args_config, results=5, collection="knowledge_base", d
     return result
 
 
-def index_command(args_config, db_path_override=None):
-    """Index org files into ChromaDB."""
+def search_batch_command(batch_file, args_config, results=5, collection="knowledge_base",
+                         db_path_override=None, mode="vector", tags=None, use_daemon=True):
+    """
+    Run many searches in one batch and return results as JSON Lines.
+    
+    Queries are read one per line from batch_file, or from stdin if it is
+    '-'; blank lines are skipped. Each output line is a JSON object with the
+    query and its results, in input order. mode and tags apply to every
+    query as in search_command, which also describes use_daemon.
+    """
     output = []
     
     try:
-        # Load configuration
-        config_path = get_config_path(args_config)
+        tags = [normalize_tag(tag) for tag in tags or []]
+        # Keep stdout pure JSON Lines
+        with contextlib.redirect_stdout(sys.stderr):
+            config_path = get_config_path(args_config)
         config = Config(config_path)
-        output.append(f"Loading config from {config_path}")
-        
-        # Initialize components
-        scanner = KnowledgeBaseScanner(config.knowledge_base_root)
-        chunker = ChunkingEngine(chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap)
-        
-        # Use override if provided, otherwise use config
         db_path = db_path_override if db_path_override else config.chroma_db_path
-        chroma = ChromaManager(db_path)
+        
+        if batch_file == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = Path(batch_file).read_text(encoding='utf-8').splitlines()
     except Exception as e:
-        output.append(f"Error loading configuration: {e}")
+        output.append(json.dumps({"error": f"Error loading batch search: {e}"}))
         result = "\n".join(output)
         print(result)
         return result
     
-    # Find all org files
-    org_files = scanner.scan_org_files()
-    output.append(f"Found {len(org_files)} org files to process")
-    
-    if not org_files:
-        output.append("No org files found. Check your knowledge_base_root path in config.")
+    queries = [line.strip() for line in lines if line.strip()]
+    try:
+        batch_results = run_search(config, db_path, 'query_collection_many', use_daemon,
+                                   collection_name=collection, queries=queries,
+                                   n_results=results, mode=mode, tags=tags)
+    except Exception as e:
+        output.append(json.dumps({"error": f"Error searching: {e}"}))
         result = "\n".join(output)
         print(result)
         return result
     
-    # Create collection for this indexing run (this will clear existing data)
+    from .server import result_matches
+    
+    for query, search_results in zip(queries, batch_results):
+        matches = result_matches(search_results)
+        output.append(json.dumps({"query": query, "results": matches}))
+    
+    result = "\n".join(output)
+    print(result)
+    return result
+
+
+def index_command(args_config, db_path_override=None, full=False, workers=1,
+                  embed_workers=1, queue_size=64, batch_size=None, jsonl=False, progress=None):
+    """
+    Index org files into ChromaDB.
+    
+    By default only new or changed files (according to the index manifest)
+    are re-indexed and chunks of removed files are deleted. With full=True,
+    or when no manifest exists yet, the collection is rebuilt from scratch
+    into a new generation, which replaces the live one only once complete,
+    so searches keep being served during the rebuild.
+    
+    Files flow through a scan -> parse -> chunk -> embed -> store pipeline
+    of bounded queues. Files are parsed and chunked in batches on `workers`
+    processes when workers > 1, and `embed_workers` threads compute
+    embeddings. Chunks from many files
+    are written in batches of `batch_size` (default: config batch_size or 256).
+    
+    Output is printed as indexing goes, with jsonl=True as one JSON object
+    per line: "message" events and a "file" event with stage timings for
+    every file indexed. A live progress line is drawn on stderr when
+    progress is True (default: when stderr is a terminal). Only the
+    messages that aren't about a single file are kept for the returned
+    summary.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .indexer import create_index_pipeline, iter_index_jobs
+    from .progress import IndexOutput, ProgressLine
+    
+    output = IndexOutput(jsonl=jsonl)
+    
+    try:
+        # Load configuration
+        with contextlib.redirect_stdout(sys.stderr) if jsonl else contextlib.nullcontext():
+            config_path = get_config_path(args_config)
+        config = Config(config_path)
+        output.message(f"Loading config from {config_path}")
+        
+        # Use override if provided, otherwise use config
+        db_path = db_path_override if db_path_override else config.chroma_db_path
+        
+        # Initialize components
+        scanner = KnowledgeBaseScanner(config.knowledge_base_root,
+                                       snapshot_path=Path(db_path) / SNAPSHOT_FILENAME)
+        chunker = create_chunker(config)
+        chroma = create_chroma_manager(config, db_path)
+        manifest = IndexManifest(Path(db_path) / MANIFEST_FILENAME)
+    except Exception as e:
+        output.message(f"Error loading configuration: {e}")
+        return output.transcript()
+    
+    if not Path(config.knowledge_base_root).is_dir():
+        output.message("No org files found. Check your knowledge_base_root path in config.")
+        return output.transcript()
+    
     collection_name = "knowledge_base"
-    output.append(f"Creating/clearing collection: {collection_name}")
-    chroma.clear_and_create_collection(collection_name)
+    shadow = None
+    org_files = scanner.iter_org_files()
+    first_file = next(org_files, None)
+    
+    if first_file is None and (full or not manifest.entries):
+        # Nothing to build a new generation from: leave the collection as it is
+        output.message("Found 0 org files to process")
+        output.message("No org files found. Check your knowledge_base_root path in config.")
+        return output.transcript()
+    if first_file is not None:
+        org_files = itertools.chain([first_file], org_files)
     
-    total_chunks = 0
+    if full or not manifest.entries:
+        # Rebuild from scratch into a shadow generation; the live one keeps serving
+        output.message(f"Creating/clearing collection: {collection_name}")
+        shadow = chroma.begin_rebuild(collection_name)
+        output.message(f"  Building new generation {shadow}")
+        manifest.clear()
+        incremental = False
+    else:
+        output.message(f"Updating collection: {collection_name}")
+        incremental = True
     
-    # Process each file
-    for i, org_file in enumerate(org_files, 1):
-        output.append(f"Processing {i}/{len(org_files)}: {org_file.name}")
+    # Revisions are bumped once, when the run is done
+    with chroma.deferred_revisions():
+        total_chunks = 0
+        changed_count = 0
+        seen_keys = set()
+        writer = chroma.bulk_writer(shadow or collection_name,
+                                    batch_size=batch_size or config.get('batch_size', 256))
+        parse_executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        progress_line = None
         
         try:
-            # Parse the org file
-            parser = OrgParser(org_file)
-            headers = parser.parse_headers()
-            content = parser.parse_content()
-            
-            # Skip files with no content
-            if not content.strip():
-                output.append(f"  Skipping {org_file.name} - no content")
-                continue
+            pipeline = create_index_pipeline(
+                chroma, chunker, manifest, config.knowledge_base_root, writer,
+                incremental=incremental, parse_executor=parse_executor, parse_workers=max(1, workers),
+                embed_workers=embed_workers, queue_size=queue_size)
+            jobs = iter_index_jobs(org_files, config.knowledge_base_root, seen_keys)
+            if progress is None:
+                progress = sys.stderr.isatty()
+            if progress:
+                progress_line = output.progress = ProgressLine(pipeline)
+                progress_line.start()
             
-            # Chunk the content
-            chunks = chunker.chunk_content(content)
+            # Only new or changed files come out of the pipeline, as they finish
+            for job in pipeline.run(jobs):
+                changed_count += 1
+                name = job.path.name
+                lines = [f"Processing {changed_count}: {name}"]
+                
+                if job.error is not None:
+                    status = "error"
+                    lines.append(f"  Error processing {name}: {job.error}")
+                elif not job.chunks and not job.deleted:
+                    status = "skipped"
+                    lines.append(f"  Skipping {name} - no content")
+                elif incremental:
+                    status = "updated"
+                    lines.append(f"  Stored {job.stored} chunks from {name} "
+                                 f"({job.kept} unchanged, {job.deleted} removed)")
+                else:
+                    status = "indexed"
+                    lines.append(f"  Stored {job.stored} chunks from {name}")
+                total_chunks += job.stored
+                if progress_line is not None:
+                    progress_line.add_chunks(job.stored)
+                output.event("file", "\n".join(lines), path=job.key, status=status, chunks=job.stored,
+                             kept=job.kept, deleted=job.deleted, error=job.error,
+                             timings_ms={stage: round(seconds * 1000, 3)
+                                         for stage, seconds in job.timings.items()})
+        except BaseException:
+            # An unfinished rebuild must never replace the live generation
+            if shadow is not None:
+                chroma.abort_rebuild(shadow)
+            raise
+        finally:
+            if progress_line is not None:
+                progress_line.stop()
+                output.progress = None
+            if parse_executor is not None:
+                parse_executor.shutdown()
+        
+        # Write whatever is still buffered, then publish the lexical index
+        try:
+            writer.flush()
+            if shadow is None:
+                chroma.compile_lexical(collection_name)
+        except Exception as e:
+            output.message(f"  Error writing final batch: {e}")
+            if shadow is not None:
+                chroma.abort_rebuild(shadow)
+                output.message(f"  Rebuild abandoned; {collection_name} still serves the previous index")
+                return output.transcript()
+        
+        if shadow is not None:
+            dropped = chroma.commit_rebuild(collection_name, shadow)
+            output.message(f"Switched {collection_name} to {shadow}"
+                           + (f" (removed {', '.join(dropped)})" if dropped else ""))
+        
+        output.message(f"Found {len(seen_keys)} org files to process")
+        if not seen_keys and not manifest.entries:
+            output.message("No org files found. Check your knowledge_base_root path in config.")
+        
+        # Drop chunks of files that no longer exist
+        removed = [key for key in manifest.entries if key not in seen_keys]
+        for key in removed:
+            try:
+                chroma.delete_file_chunks(collection_name, key)
+                manifest.remove(key)
+                output.event("removed", f"Removed chunks for deleted file {key}", path=key)
+            except Exception as e:
+                output.message(f"  Error removing chunks for {key}: {e}")
+        
+        manifest.save()
+    
+    if incremental:
+        output.message(f"Changes: {changed_count} new or changed, {len(removed)} removed, "
+                       f"{len(seen_keys) - changed_count} unchanged")
+    for line in pipeline.report():
+        output.message(line)
+    output.message(f"  writes: {writer.flush_count} batches of up to {writer.batch_size} chunks")
+    
+    output.event("done", f"\nIndexing complete! Stored {total_chunks} total chunks in collection "
+                         f"'{collection_name}'", keep=True, collection=collection_name,
+                 files=len(seen_keys), changed=changed_count, removed=len(removed),
+                 chunks=total_chunks, seconds=round(pipeline.wall_seconds, 3))
+    
+    return output.transcript()
+
+
+def watch_command(args_config, db_path_override=None, debounce=0.5, interval=1.0, force_polling=False):
+    """Watch the knowledge base and re-index org files as they change."""
+    from .indexer import update_paths
+    from .watcher import create_watcher, debounced_batches, PollingWatcher
+    
+    # Bring the index up to date before watching for further changes
+    index_command(args_config, db_path_override)
+    
+    try:
+        config_path = get_config_path(args_config)
+        config = Config(config_path)
+        db_path = db_path_override if db_path_override else config.chroma_db_path
+        
+        scanner = KnowledgeBaseScanner(config.knowledge_base_root,
+                                       snapshot_path=Path(db_path) / SNAPSHOT_FILENAME)
+        chunker = create_chunker(config)
+        chroma = create_chroma_manager(config, db_path)
+        manifest = IndexManifest(Path(db_path) / MANIFEST_FILENAME)
+        watcher = create_watcher(config.knowledge_base_root, interval=interval,
+                                 force_polling=force_polling, scanner=scanner)
+    except Exception as e:
+        print(f"Error starting watcher: {e}")
+        return
+    
+    collection_name = "knowledge_base"
+    root = Path(config.knowledge_base_root)
+    mode = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    print(f"Watching {root} ({mode}) - press Ctrl+C to stop")
+    
+    try:
+        for paths in debounced_batches(watcher, debounce=debounce):
+            if root in paths:
+                # Events were lost, so check every file plus everything indexed
+                paths = set(scanner.iter_org_files())
+                paths.update(root / key for key in manifest.entries)
             
-            # Store chunks in ChromaDB with file-specific metadata
-            stored_count = chroma.store_chunks_with_metadata(
-                collection_name, 
-                chunks, 
-                org_file.stem,  # filename without extension
-                headers
-            )
-            total_chunks += stored_count
+            for message in update_paths(chroma, chunker, manifest, root, collection_name, paths):
+                print(message, flush=True)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+        # Let the last batch's lexical compile finish before exiting
+        chroma.close()
+
+
+def stop_on_sigterm():
+    """Turn SIGTERM into KeyboardInterrupt, so servers stopped by a service manager shut down cleanly."""
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)
+
+
+def serve_command(args_config, db_path_override=None, collection="knowledge_base"):
+    """
+    Serve searches from a warm daemon on a local Unix socket.
+    
+    The database client, collection handles and embedding model stay
+    loaded between searches; `search` uses the daemon while it runs.
+    """
+    from .server import SearchServer, SearchService, socket_path
+    
+    try:
+        config_path = get_config_path(args_config)
+        config = Config(config_path)
+        db_path = db_path_override if db_path_override else config.chroma_db_path
+        
+        chroma = create_chroma_manager(config, db_path, background_compile=True)
+        server = SearchServer(socket_path(db_path), SearchService(chroma))
+    except Exception as e:
+        print(f"Error starting server: {e}")
+        return
+    
+    stop_on_sigterm()
+    try:
+        chroma.warm_up(collection)
+        print(f"Serving {db_path} on {server.path} - press Ctrl+C to stop", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped serving")
+    finally:
+        server.server_close()
+        chroma.close()
+
+
+def api_command(args_config, db_path_override=None, host="127.0.0.1", port=8765, threads=8,
+                collection="knowledge_base"):
+    """
+    Serve the HTTP/JSON API for concurrent clients.
+    
+    Searches run on a pool of `threads` threads from warm state, as in
+    serve_command; POST /index reindexes with this config in a subprocess.
+    """
+    import asyncio
+    from .http_api import SearchAPI
+    from .server import SearchService
+    
+    try:
+        config_path = get_config_path(args_config)
+        config = Config(config_path)
+        db_path = db_path_override if db_path_override else config.chroma_db_path
+        
+        chroma = create_chroma_manager(config, db_path, background_compile=True)
+        reindex_args = [sys.executable, "-m", "daimonkms.cli", "--config", str(config_path),
+                        "--db-path", str(db_path), "index"]
+        api = SearchAPI(SearchService(chroma), reindex_args=reindex_args, max_workers=threads)
+    except Exception as e:
+        print(f"Error starting API: {e}")
+        return
+    
+    stop_on_sigterm()
+    try:
+        chroma.warm_up(collection)
+        print(f"Serving {db_path} on http://{host}:{port} - press Ctrl+C to stop", flush=True)
+        asyncio.run(api.serve(host, port))
+    except KeyboardInterrupt:
+        print("Stopped serving")
+    except OSError as e:
+        print(f"Error starting API: {e}")
+    finally:
+        api.close()
+        chroma.close()
+
+
+def api_load_command(queries_file, host="127.0.0.1", port=8765, clients=50, duration=10.0, results=5,
+                     mode="vector"):
+    """
+    Measure sustained throughput of a running API with concurrent clients.
+    
+    Queries are read one per line from queries_file; the measurements are
+    returned as JSON.
+    """
+    import asyncio
+    from .http_api import load_test
+    
+    try:
+        queries = [line.strip() for line in Path(queries_file).read_text(encoding='utf-8').splitlines()
+                   if line.strip()]
+        if not queries:
+            raise ValueError(f"No queries in {queries_file}")
+        stats = asyncio.run(load_test(host, port, queries, clients=clients, duration=duration,
+                                      n_results=results, mode=mode))
+        result = json.dumps(stats)
+    except Exception as e:
+        result = json.dumps({"error": f"Error running load test: {e}"})
+    
+    print(result)
+    return result
+
+
+def bench_command(sizes, output_path="bench-results.json", work_dir=None, seed=0, keep=False,
+                  chunk_size=1000, chunk_overlap=200, batch_size=256):
+    """
+    Benchmark ingestion on synthetic knowledge bases of the given sizes.
+    
+    For each size a knowledge base of that many notes is generated (and
+    reused on later runs when work_dir is given), then indexed into a fresh
+    database with every stage timed separately; see bench.run_benchmark.
+    Results are written as JSON to output_path so runs can be compared across
+    versions. Generated files are deleted afterwards unless keep is True or
+    they are in work_dir.
+    """
+    import tempfile
+    import time
+    from . import bench
+    
+    output = []
+    
+    base = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix="daimon-bench-"))
+    runs = []
+    try:
+        for files in sizes:
+            kb_root = base / f"kb-{files}-seed{seed}"
+            start = time.perf_counter()
+            generated = bench.generate_kb(kb_root, files, seed=seed)
+            generate_seconds = time.perf_counter() - start
+            output.append(f"{files} files: {'generated' if generated else 'reused'} "
+                          f"{kb_root} ({generate_seconds:.1f}s)")
             
-            output.append(f"  Stored {stored_count} chunks from {org_file.name}")
+            db_path = base / f"db-{files}"
+            run = bench.run_benchmark(kb_root, db_path, chunk_size=chunk_size,
+                                      chunk_overlap=chunk_overlap, batch_size=batch_size)
+            run["generate_seconds"] = round(generate_seconds, 4)
+            runs.append(run)
+            if not keep:
+                shutil.rmtree(db_path, ignore_errors=True)
             
-        except Exception as e:
-            output.append(f"  Error processing {org_file.name}: {e}")
-            continue
+            for stage, timing in run["stages"].items():
+                rate = timing["items_per_second"]
+                output.append(f"  {stage:<6} {timing['seconds']:>10.3f}s  {timing['items']:>9} items"
+                              + (f"  {rate:>12.1f}/s" if rate is not None else ""))
+            output.append(f"  total  {run['total_seconds']:>10.3f}s  {run['chunks']} chunks, "
+                          f"peak RSS {run['peak_rss_mb']} MiB")
+    except Exception as e:
+        output.append(f"Error running benchmark: {e}")
+    finally:
+        if not keep and not work_dir:
+            shutil.rmtree(base, ignore_errors=True)
     
-    output.append(f"\nIndexing complete! Stored {total_chunks} total chunks in collection '{collection_name}'")
+    if runs:
+        results = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "environment": bench.environment(),
+            "settings": {"seed": seed, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                         "batch_size": batch_size,
+                         "embedding_function": bench.DeterministicEmbeddingFunction.name()},
+            "runs": runs,
+        }
+        Path(output_path).write_text(json.dumps(results, indent=2) + "\n", encoding='utf-8')
+        output.append(f"Results written to {output_path}")
     
     result = "\n".join(output)
     print(result)
@@ -295,14 +758,92 @@ def main():
     
     # Add index subcommand
     index_parser = subparsers.add_parser('index', help='Index org files into ChromaDB')
+    index_parser.add_argument('--full', action='store_true',
+                             help='Rebuild the whole collection instead of indexing only changed files')
+    index_parser.add_argument('--workers', type=int, default=1,
+                             help='Processes used to parse and chunk files (default: 1)')
+    index_parser.add_argument('--embed-workers', type=int, default=1,
+                             help='Threads used to compute embeddings (default: 1)')
+    index_parser.add_argument('--queue-size', type=int, default=64,
+                             help='Files buffered between pipeline stages (default: 64)')
+    index_parser.add_argument('--batch-size', type=int,
+                             help='Chunks written per batch (default: config batch_size or 256)')
+    index_parser.add_argument('--jsonl', action='store_true',
+                             help='Print one JSON object per line: messages and a timed event per file')
+    index_parser.add_argument('--no-progress', dest='progress', action='store_false', default=None,
+                             help='Never show the live progress line (shown on stderr when it is a terminal)')
+    
+    # Add watch subcommand
+    watch_parser = subparsers.add_parser('watch', help='Watch the knowledge base and re-index on change')
+    watch_parser.add_argument('--debounce', type=float, default=0.5,
+                             help='Seconds of quiet before re-indexing a burst of changes (default: 0.5)')
+    watch_parser.add_argument('--interval', type=float, default=1.0,
+                             help='Rescan interval in seconds when polling (default: 1.0)')
+    watch_parser.add_argument('--polling', action='store_true',
+                             help='Poll for changes instead of using inotify')
+    
+    # Add serve subcommand
+    serve_parser = subparsers.add_parser('serve', help='Keep a warm search daemon running on a Unix socket')
+    serve_parser.add_argument('--collection', default='knowledge_base',
+                             help='Collection to load ahead of the first search (default: knowledge_base)')
+    
+    # Add api subcommands
+    api_parser = subparsers.add_parser('api', help='Serve a local HTTP/JSON API for concurrent clients')
+    api_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    api_parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    api_parser.add_argument('--threads', type=int, default=8,
+                           help='Threads running searches (default: 8)')
+    api_parser.add_argument('--collection', default='knowledge_base',
+                           help='Collection to load ahead of the first search (default: knowledge_base)')
+    
+    api_load_parser = subparsers.add_parser('api-load', help='Measure throughput of a running API')
+    api_load_parser.add_argument('queries', help='File with one query per line')
+    api_load_parser.add_argument('--host', default='127.0.0.1', help='API address (default: 127.0.0.1)')
+    api_load_parser.add_argument('--port', type=int, default=8765, help='API port (default: 8765)')
+    api_load_parser.add_argument('--clients', type=int, default=50,
+                                help='Concurrent clients (default: 50)')
+    api_load_parser.add_argument('--duration', type=float, default=10.0,
+                                help='Seconds to run for (default: 10)')
+    api_load_parser.add_argument('--results', type=int, default=5,
+                                help='Results per search (default: 5)')
+    api_load_parser.add_argument('--mode', choices=['vector', 'lexical', 'hybrid'], default='vector',
+                                help='Search mode (default: vector)')
+    
+    # Add bench subcommand
+    bench_parser = subparsers.add_parser('bench', help='Benchmark indexing on synthetic knowledge bases')
+    bench_parser.add_argument('--files', type=int, nargs='+', default=[100, 1000], metavar='N',
+                             help='Knowledge base sizes to benchmark, in notes (default: 100 1000)')
+    bench_parser.add_argument('--output', default='bench-results.json',
+                             help='JSON results file (default: bench-results.json)')
+    bench_parser.add_argument('--work-dir',
+                             help='Keep generated knowledge bases here and reuse them on later runs')
+    bench_parser.add_argument('--seed', type=int, default=0, help='Seed for generated notes (default: 0)')
+    bench_parser.add_argument('--keep', action='store_true',
+                             help='Keep generated knowledge bases and databases')
+    bench_parser.add_argument('--chunk-size', type=int, default=1000,
+                             help='Chunk size in characters (default: 1000)')
+    bench_parser.add_argument('--chunk-overlap', type=int, default=200,
+                             help='Chunk overlap in characters (default: 200)')
+    bench_parser.add_argument('--batch-size', type=int, default=256,
+                             help='Chunks written per batch (default: 256)')
     
     # Add search subcommand
     search_parser = subparsers.add_parser('search', help='Search the knowledge base')
-    search_parser.add_argument('query', help='Search query text')
+    search_parser.add_argument('query', nargs='?', help='Search query text')
+    search_parser.add_argument('--mode', choices=['vector', 'lexical', 'hybrid'], default='vector',
+                              help='Vector similarity, BM25 term matching, or both fused (default: vector)')
+    search_parser.add_argument('--tag', action='append', metavar='TAG',
+                              help="Only search chunks tagged TAG; 'domain:x', 'form:x' or "
+                                   "'granularity:x' match a filetag axis (repeatable)")
+    search_parser.add_argument('--batch', metavar='FILE',
+                              help="Read queries one per line from FILE ('-' for stdin) "
+                                   "and print JSON Lines results")
     search_parser.add_argument('--results', type=int, default=5,
                               help='Number of results to return (default: 5)')
     search_parser.add_argument('--collection', default='knowledge_base',
                               help='Collection to search (default: knowledge_base)')
+    search_parser.add_argument('--no-daemon', action='store_true',
+                              help='Search in this process even if `daimon serve` is running')
     
     # Parse arguments
     args = parser.parse_args()
@@ -313,9 +854,29 @@ def main():
     elif args.command == 'status':
         status_command(args.config, args.db_path)
     elif args.command == 'index':
-        index_command(args.config, args.db_path)
+        index_command(args.config, args.db_path, args.full, args.workers,
+                      args.embed_workers, args.queue_size, args.batch_size, args.jsonl, args.progress)
+    elif args.command == 'watch':
+        watch_command(args.config, args.db_path, args.debounce, args.interval, args.polling)
+    elif args.command == 'serve':
+        serve_command(args.config, args.db_path, args.collection)
+    elif args.command == 'api':
+        api_command(args.config, args.db_path, args.host, args.port, args.threads, args.collection)
+    elif args.command == 'api-load':
+        api_load_command(args.queries, args.host, args.port, args.clients, args.duration, args.results,
+                         args.mode)
+    elif args.command == 'bench':
+        bench_command(args.files, args.output, args.work_dir, args.seed, args.keep, args.chunk_size,
+                      args.chunk_overlap, args.batch_size)
     elif args.command == 'search':
-        search_command(args.query, args.config, args.results, args.collection, args.db_path)
+        if args.batch:
+            search_batch_command(args.batch, args.config, args.results, args.collection, args.db_path,
+                                 args.mode, args.tag, not args.no_daemon)
+        elif args.query is None:
+            search_parser.error("a query or --batch FILE is required")
+        else:
+            search_command(args.query, args.config, args.results, args.collection, args.db_path,
+                           args.mode, args.tag, not args.no_daemon)
     else:
         parser.print_help()
 
@@ -37,6 +37,10 @@ class Config:
             else:
                 self._config[key] = value
     
+    def get(self, name, default=None):
+        """Return an optional config value, or default if it isn't set."""
+        return self._config.get(name, default)
+    
     def __getattr__(self, name):
         """Access config values as attributes."""
         if name in self._config:
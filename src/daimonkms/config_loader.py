@@ -1,4 +1,6 @@
 import os
+import stat
+import tempfile
 from pathlib import Path
 
 
@@ -31,3 +33,52 @@ def find_config_file():
     
     # No config file found
     return None
+
+
+def default_cache_dir():
+    """
+    Return the XDG-compliant cache directory for daimonkms.
+    
+    Uses $XDG_CACHE_HOME/daimonkms, defaulting to ~/.cache/daimonkms.
+    The directory is not created.
+    """
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    if xdg_cache_home:
+        return Path(xdg_cache_home) / "daimonkms"
+    return Path.home() / ".cache" / "daimonkms"
+
+
+def default_runtime_dir():
+    """
+    Return the XDG-compliant runtime directory for daimonkms sockets.
+    
+    Uses $XDG_RUNTIME_DIR/daimonkms, defaulting to a per-user directory in
+    the system temp directory. Socket paths are length-limited, so this is
+    kept short. The directory is not created.
+    """
+    xdg_runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if xdg_runtime_dir:
+        return Path(xdg_runtime_dir) / "daimonkms"
+    return Path(tempfile.gettempdir()) / f"daimonkms-{os.getuid()}"
+
+
+def check_private_dir(path):
+    """
+    Make sure path is a directory that only the current user can use.
+    
+    The runtime directory's fallback sits in the shared temp directory,
+    where another user could create it first, or plant a symlink there.
+    
+    Raises:
+        FileNotFoundError: If path does not exist
+        PermissionError: If path is a symlink or not a directory, belongs
+            to another user or doesn't have mode 0700
+    """
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    mode = stat.S_IMODE(info.st_mode)
+    if mode != 0o700:
+        raise PermissionError(f"{path} has mode {mode:04o}, expected 0700")
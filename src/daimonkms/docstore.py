@@ -0,0 +1,145 @@
+import hashlib
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+
+DOCSTORE_FILENAME = "documents.sqlite"
+
+
+class DocumentStore:
+    """
+    Compressed store of parsed document bodies.
+
+    Each body is stored once, zlib-compressed and keyed by its content hash;
+    a files table maps (collection, source_path) to the hash. Chunks then
+    only need their (start, end) offsets into the body, so overlapping
+    chunk text is not stored twice.
+    """
+
+    BODY_CACHE_SIZE = 64
+
+    def __init__(self, path, compression_level=6):
+        """Open (or create) the store at path."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        # Recently decompressed bodies by content hash
+        self._bodies = OrderedDict()
+
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                body BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                collection TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (collection, source_path)
+            );
+            CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def body_hash(body):
+        """Return the content hash a body is stored under."""
+        return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    def _collect_garbage(self, digests):
+        """Drop the bodies with these hashes that no file refers to any more."""
+        self._db.executemany(
+            "DELETE FROM bodies WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM files WHERE hash = ?)",
+            [(digest, digest) for digest in set(digests)])
+
+    def put(self, collection_name, source_path, body):
+        """
+        Store the body of a file, replacing its previous body.
+
+        Returns:
+            The body's content hash
+        """
+        digest = self.body_hash(body)
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM files WHERE collection = ? AND source_path = ?",
+                                   (collection_name, source_path)).fetchone()
+            if row and row[0] == digest:
+                return digest
+
+            self._db.execute("INSERT OR IGNORE INTO bodies (hash, body) VALUES (?, ?)",
+                             (digest, zlib.compress(body.encode('utf-8'), self.compression_level)))
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (collection, source_path, hash) VALUES (?, ?, ?)",
+                (collection_name, source_path, digest))
+            if row:
+                self._collect_garbage([row[0]])
+            self._db.commit()
+        return digest
+
+    def get(self, collection_name, source_path):
+        """Return the stored body of a file, or None if there is none."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT files.hash, bodies.body FROM files JOIN bodies ON bodies.hash = files.hash "
+                "WHERE files.collection = ? AND files.source_path = ?",
+                (collection_name, source_path)).fetchone()
+            if row is None:
+                return None
+
+            digest, compressed = row
+            body = self._bodies.get(digest)
+            if body is None:
+                body = zlib.decompress(compressed).decode('utf-8')
+                self._bodies[digest] = body
+                if len(self._bodies) > self.BODY_CACHE_SIZE:
+                    self._bodies.popitem(last=False)
+            else:
+                self._bodies.move_to_end(digest)
+            return body
+
+    def chunk_text(self, collection_name, metadata):
+        """
+        Rebuild a chunk's text from its source_path and chunk offsets.
+
+        Returns:
+            The text, or None if the metadata has no offsets or the body is
+            not stored
+        """
+        if "chunk_start" not in metadata or "source_path" not in metadata:
+            return None
+        body = self.get(collection_name, metadata["source_path"])
+        if body is None:
+            return None
+        return body[metadata["chunk_start"]:metadata["chunk_end"]]
+
+    def remove(self, collection_name, source_path):
+        """Forget the body of a file."""
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM files WHERE collection = ? AND source_path = ?",
+                                   (collection_name, source_path)).fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM files WHERE collection = ? AND source_path = ?",
+                             (collection_name, source_path))
+            self._collect_garbage([row[0]])
+            self._db.commit()
+
+    def clear(self, collection_name):
+        """Forget every body stored for a collection."""
+        with self._lock:
+            digests = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT hash FROM files WHERE collection = ?", (collection_name,))]
+            self._db.execute("DELETE FROM files WHERE collection = ?", (collection_name,))
+            self._collect_garbage(digests)
+            self._db.commit()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
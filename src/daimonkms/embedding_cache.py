@@ -0,0 +1,256 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings.
+
+    Entries are keyed by a hash of the embedding model name and the chunk
+    text. A SQLite index maps each key to a row of a memory-mapped file
+    holding the key next to its float32 vector, and tracks recency; once
+    more than max_entries are stored, the least recently used entries are
+    evicted and their rows reused. Reads check the key stored in the row,
+    so a row another process reused in the meantime reads as a miss.
+
+    Recency is recorded in memory and written to the index in batches (and
+    before every put_many, so eviction sees it), rather than on every lookup.
+
+    Each model gets its own subdirectory of cache_dir, since models differ
+    in embedding dimension.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # Hits remembered before their recency is written to the index
+    RECENCY_BATCH = 1000
+    # Layout of the entries file; older caches are cleared on open
+    FORMAT = 2
+
+    def __init__(self, cache_dir, model_name, max_entries=200000):
+        """Open (or create) the cache for a model."""
+        self.model_name = model_name
+        self.max_entries = max_entries
+        safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', model_name) or 'model'
+        self.cache_dir = Path(cache_dir) / safe_name
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.cache_dir / "entries.bin"
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._matrix = None
+        # Keys hit since recency was last written, in order of use
+        self._used = {}
+
+        self._db = sqlite3.connect(str(self.cache_dir / "index.sqlite"),
+                                   check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._db.commit()
+        if self._meta('format') != self.FORMAT:
+            self._reset()
+
+    def _reset(self):
+        """Drop the entries of a cache written in an older layout."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if self._meta('format') != self.FORMAT:
+                self._db.execute("DELETE FROM entries")
+                self._db.execute("DELETE FROM free_slots")
+                self._db.execute("DELETE FROM meta")
+                self._set_meta('format', self.FORMAT)
+                (self.cache_dir / "vectors.f32").unlink(missing_ok=True)
+            self._db.commit()
+        except Exception:
+            self._db.rollback()
+            raise
+
+    def _key(self, text):
+        """Return the cache key for a chunk of text."""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _meta(self, name, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _open_matrix(self, min_rows):
+        """Map the entries file, growing it to hold at least min_rows rows."""
+        # Each row is the raw SHA-256 key followed by the vector
+        row = np.dtype([('key', np.uint8, (32,)), ('vector', np.float32, (self._meta('dim'),))])
+        capacity = self.vectors_path.stat().st_size // row.itemsize if self.vectors_path.exists() else 0
+
+        if capacity < min_rows:
+            capacity = max(self.INITIAL_CAPACITY, capacity)
+            while capacity < min_rows:
+                capacity *= 2
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(capacity * row.itemsize)
+            self._matrix = None
+
+        if self._matrix is None or self._matrix.shape[0] < min_rows:
+            # Another process may have grown the file since it was mapped
+            self._matrix = np.memmap(self.vectors_path, dtype=row, mode='r+', shape=(capacity,))
+        return self._matrix
+
+    def _read(self, matrix, slot, key):
+        """Return the vector in a slot, or None if the slot no longer holds key."""
+        expected = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        if not np.array_equal(matrix['key'][slot], expected):
+            return None
+        vector = np.array(matrix['vector'][slot])
+        # The row may have been reused while the vector was copied
+        if not np.array_equal(matrix['key'][slot], expected):
+            return None
+        return vector
+
+    def _flush_recency(self):
+        """Write the recency of the keys hit since the last flush to the index."""
+        if not self._used:
+            return
+        clock = self._meta('clock', 0) + 1
+        self._set_meta('clock', clock)
+        self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                             [(clock, key) for key in self._used])
+        self._used = {}
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, texts):
+        """
+        Look up embeddings for texts.
+
+        Returns:
+            List with a float32 array for each hit and None for each miss
+        """
+        keys = [self._key(text) for text in texts]
+        results = [None] * len(texts)
+
+        with self._lock:
+            rows = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows.update(self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch))
+
+            if rows:
+                matrix = self._open_matrix(max(rows.values()) + 1)
+                for i, key in enumerate(keys):
+                    slot = rows.get(key)
+                    if slot is not None:
+                        results[i] = self._read(matrix, slot, key)
+                        if results[i] is not None:
+                            self._used[key] = None
+
+                if len(self._used) >= self.RECENCY_BATCH:
+                    self._flush_recency()
+                    self._db.commit()
+
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(texts) - hits
+
+        return results
+
+    def put_many(self, texts, embeddings):
+        """Store embeddings for texts, evicting old entries if over capacity."""
+        if not texts:
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        unique = {}
+        for text, vector in zip(texts, vectors):
+            unique[self._key(text)] = vector
+
+        with self._lock:
+            # Take the write lock up front so slot allocation is consistent
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._meta('dim')
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self._set_meta('dim', dim)
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache ({dim})")
+
+                existing = set()
+                keys = list(unique)
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    existing.update(row[0] for row in self._db.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", batch))
+                new_keys = [key for key in keys if key not in existing]
+
+                # Allocate rows: reuse freed slots first, then extend the matrix
+                free = [row[0] for row in self._db.execute(
+                    "SELECT slot FROM free_slots ORDER BY slot LIMIT ?", (len(new_keys),))]
+                self._db.executemany("DELETE FROM free_slots WHERE slot = ?", [(slot,) for slot in free])
+                next_slot = self._meta('next_slot', 0)
+                slots = free + list(range(next_slot, next_slot + len(new_keys) - len(free)))
+                self._set_meta('next_slot', max([next_slot] + [slot + 1 for slot in slots]))
+
+                if slots:
+                    # Write vectors before the index rows that point at them.
+                    # A reused row is invalidated first, so a reader still
+                    # holding its old slot never pairs the old key with the
+                    # new vector
+                    matrix = self._open_matrix(max(slots) + 1)
+                    for key, slot in zip(new_keys, slots):
+                        matrix['key'][slot] = 0
+                        matrix['vector'][slot] = unique[key]
+                        matrix['key'][slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                    matrix.flush()
+
+                # Eviction must see this process's pending recency
+                self._flush_recency()
+                clock = self._meta('clock', 0) + 1
+                self._set_meta('clock', clock)
+                self._db.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, clock) for key, slot in zip(new_keys, slots)])
+
+                self._evict()
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries."""
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        victims = self._db.execute(
+            "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)",
+                             [(slot,) for _, slot in victims])
+
+    def close(self):
+        """Write pending recency and close the index database."""
+        with self._lock:
+            self._flush_recency()
+            self._db.commit()
+            self._matrix = None
+            self._db.close()
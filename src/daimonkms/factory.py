@@ -0,0 +1,57 @@
+import os
+from pathlib import Path
+
+from .chunking import ChunkingEngine
+from .config_loader import default_cache_dir
+
+
+def create_chroma_manager(config, db_path, background_compile=False):
+    """
+    Create a ChromaManager set up from optional config settings.
+
+    The embedding cache lives outside the database (embedding_cache_dir,
+    default ~/.cache/daimonkms/embeddings) so rebuilds and new --db-path
+    locations reuse it; set embedding_cache_dir to null to disable it.
+
+    With document_store enabled, file bodies are kept once in a compressed
+    store in the database directory instead of as per-chunk text.
+
+    Query results are cached in memory (query_cache_size entries) and on
+    disk in query_cache_dir (default ~/.cache/daimonkms/queries; null keeps
+    the cache in memory only). Written chunks are also indexed for BM25
+    search in the database directory; long-lived servers pass
+    background_compile=True so searches never wait for it to compile.
+    """
+    from .chroma_manager import ChromaManager
+    from .docstore import DocumentStore, DOCSTORE_FILENAME
+    from .query_cache import QueryCache
+    from .lexical import LexicalIndex, LEXICAL_DIRNAME
+
+    cache_dir = config.get('embedding_cache_dir', str(default_cache_dir() / "embeddings"))
+    if cache_dir:
+        cache_dir = os.path.expanduser(str(cache_dir))
+    document_store = None
+    if config.get('document_store', False):
+        document_store = DocumentStore(Path(db_path) / DOCSTORE_FILENAME)
+    query_cache_dir = config.get('query_cache_dir', str(default_cache_dir() / "queries"))
+    query_cache = QueryCache(
+        max_entries=config.get('query_cache_size', 256),
+        cache_dir=os.path.expanduser(str(query_cache_dir)) if query_cache_dir else None
+    )
+    return ChromaManager(
+        db_path,
+        embedding_cache_dir=cache_dir or None,
+        embedding_cache_max_entries=config.get('embedding_cache_max_entries', 200000),
+        document_store=document_store,
+        query_cache=query_cache,
+        lexical_index=LexicalIndex(Path(db_path) / LEXICAL_DIRNAME,
+                                   background_compile=background_compile)
+    )
+
+
+def create_chunker(config):
+    """Create a ChunkingEngine from config (chunking_mode defaults to 'fixed')."""
+    tokenizer_path = config.get('tokenizer_path')
+    return ChunkingEngine(chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap,
+                          mode=config.get('chunking_mode', 'fixed'),
+                          tokenizer_path=os.path.expanduser(tokenizer_path) if tokenizer_path else None)
@@ -0,0 +1,402 @@
+import asyncio
+import collections
+import ipaddress
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from .server import DEFAULT_COLLECTION, result_matches
+from .tags import normalize_tag
+
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+
+# Lines of reindex output kept for /status
+INDEX_OUTPUT_LINES = 20
+
+# Addresses that listen on every interface, and so name no host to allow
+WILDCARD_HOSTS = ('', '0.0.0.0', '::')
+
+
+def host_name(value):
+    """Return the lowercase host of a Host header or Origin, without scheme or port."""
+    value = value.strip().lower()
+    if '://' in value:
+        value = value.split('://', 1)[1]
+    value = value.split('/', 1)[0]
+    if value.startswith('['):
+        return value[1:].split(']', 1)[0]
+    # A single colon separates a port; more make a bare IPv6 address
+    return value.rsplit(':', 1)[0] if value.count(':') == 1 else value
+
+
+def is_loopback_name(name):
+    """Whether a host name or address refers to this machine's loopback interface."""
+    if name == 'localhost' or name.endswith('.localhost'):
+        return True
+    try:
+        return ipaddress.ip_address(name).is_loopback
+    except ValueError:
+        return False
+
+
+class ApiError(Exception):
+    """A request the API answers with an HTTP error status."""
+
+    def __init__(self, status, message):
+        """Initialize error with an HTTPStatus and message."""
+        super().__init__(message)
+        self.status = status
+
+
+class SearchAPI:
+    """
+    Local HTTP/JSON API over a SearchService, for many concurrent clients.
+
+    Endpoints:
+        GET  /status        Collections, query cache, reindex and API state
+        POST /search        {"query", "n_results", "collection", "mode", "tags", "where"}
+        POST /search/batch  {"queries": [...], plus the /search options}
+        POST /index         {"full": false}; starts a reindex, 409 if one runs
+
+    Requests must name a loopback host (or the address the API listens on)
+    in Host, and Origin if sent, and POST bodies must be sent as
+    application/json, so web pages can't reach the API from a browser
+    through DNS rebinding or cross-site form posts.
+
+    Connections are handled on one asyncio event loop; the blocking search
+    calls run on a thread pool of max_workers threads. Identical requests
+    arriving while one is in flight share its result instead of running
+    again. Reindexing runs reindex_args (a `daimon index` command line) in
+    a subprocess; the service picks up its writes on the next query.
+    """
+
+    def __init__(self, service, reindex_args=None, max_workers=8):
+        """Initialize API around a SearchService."""
+        self.service = service
+        self.reindex_args = reindex_args
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="daimon-api")
+        # In-flight service calls by request key
+        self._inflight = {}
+        self._index_task = None
+        self.index_state = {"running": False, "full": None, "started": None, "finished": None,
+                            "returncode": None, "output": []}
+        self.counters = {"requests": 0, "service_calls": 0, "coalesced": 0}
+        # Non-loopback hosts requests may name, see start()
+        self.allowed_hosts = set()
+
+    async def call(self, method, **params):
+        """
+        Call a SearchService method on the thread pool.
+
+        Raises:
+            ApiError: If the service reports an error
+        """
+        key = json.dumps([method, params], sort_keys=True)
+        future = self._inflight.get(key)
+        if future is None:
+            self.counters["service_calls"] += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self.service.handle, {"method": method, "params": params})
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._inflight.pop(key, None))
+        else:
+            self.counters["coalesced"] += 1
+
+        # A client hanging up mustn't cancel a call others are waiting for
+        response = await asyncio.shield(future)
+        if "error" in response:
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, response["error"])
+        return response["result"]
+
+    @staticmethod
+    def _search_options(body):
+        """
+        Validate the options shared by /search and /search/batch.
+
+        Raises:
+            ApiError: If an option is invalid
+        """
+        n_results = body.get("n_results", 5)
+        if not isinstance(n_results, int) or isinstance(n_results, bool) or not 1 <= n_results <= 1000:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "n_results must be an integer from 1 to 1000")
+        mode = body.get("mode", "vector")
+        if mode not in SEARCH_MODES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"mode must be one of {SEARCH_MODES}")
+        where = body.get("where")
+        if where is not None and not isinstance(where, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "where must be an object")
+        try:
+            tags = [normalize_tag(tag) for tag in body.get("tags") or []]
+        except (ValueError, AttributeError) as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid tags: {e}")
+        return {"collection_name": body.get("collection", DEFAULT_COLLECTION),
+                "n_results": n_results, "mode": mode, "where": where, "tags": tags}
+
+    async def search(self, body):
+        """Answer POST /search."""
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "query must be a non-empty string")
+        options = self._search_options(body)
+        results = await self.call("query_collection", query_text=query, **options)
+        return {"query": query, "collection": options["collection_name"], "mode": options["mode"],
+                "results": result_matches(results)}
+
+    async def search_batch(self, body):
+        """Answer POST /search/batch."""
+        queries = body.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "queries must be a list of strings")
+        options = self._search_options(body)
+        mode = options.pop("mode")
+        if mode == "vector":
+            # Embedded and searched as one batch
+            batch = await self.call("query_collection_many", queries=queries, **options)
+        else:
+            batch = await asyncio.gather(*(self.call("query_collection", query_text=query, mode=mode,
+                                                     **options) for query in queries))
+        return {"collection": options["collection_name"], "mode": mode,
+                "results": [{"query": query, "results": result_matches(results)}
+                            for query, results in zip(queries, batch)]}
+
+    async def status(self, body=None):
+        """Answer GET /status."""
+        status = await self.call("status")
+        status["index"] = self.index_state
+        status["api"] = dict(self.counters, workers=self.max_workers, in_flight=len(self._inflight))
+        return status
+
+    async def reindex(self, body):
+        """Answer POST /index by starting a reindex subprocess."""
+        if self.reindex_args is None:
+            raise ApiError(HTTPStatus.NOT_IMPLEMENTED, "Reindexing is not available")
+        if self.index_state["running"]:
+            raise ApiError(HTTPStatus.CONFLICT, "A reindex is already running")
+        full = bool(body.get("full", False))
+        self.index_state.update(running=True, full=full, started=time.time(), finished=None,
+                                returncode=None, output=[])
+        self._index_task = asyncio.create_task(self._run_reindex(full))
+        return {"started": True, "full": full}
+
+    async def _run_reindex(self, full):
+        """Run the reindex subprocess, recording its outcome in index_state."""
+        args = list(self.reindex_args) + (["--full"] if full else [])
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            # Only the tail is kept, however long the run
+            lines = collections.deque(maxlen=INDEX_OUTPUT_LINES)
+            async for line in process.stdout:
+                lines.append(line.decode('utf-8', errors='replace').rstrip('\n'))
+            await process.wait()
+            self.index_state.update(returncode=process.returncode, output=list(lines))
+        except Exception as e:
+            self.index_state.update(returncode=-1, output=[f"Error starting reindex: {e}"])
+        finally:
+            self.index_state.update(running=False, finished=time.time())
+
+    def _allowed_host(self, value):
+        """Whether a Host or Origin value names this API."""
+        name = host_name(value)
+        return is_loopback_name(name) or name in self.allowed_hosts
+
+    def _check_headers(self, method, headers):
+        """
+        Refuse requests a browser could have been tricked into sending.
+
+        Raises:
+            ApiError: If Host or Origin names another host, or a POST body
+                isn't declared as JSON
+        """
+        if not self._allowed_host(headers.get('host', '')):
+            raise ApiError(HTTPStatus.FORBIDDEN, "Host must name this machine's loopback interface")
+        if 'origin' in headers and not self._allowed_host(headers['origin']):
+            raise ApiError(HTTPStatus.FORBIDDEN, "Cross-origin requests are not allowed")
+        if method == "POST":
+            content_type = headers.get('content-type', '').split(';', 1)[0].strip().lower()
+            if content_type != 'application/json':
+                raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Content-Type must be application/json")
+
+    async def dispatch(self, method, path, body, headers=None):
+        """
+        Route a request to its handler.
+
+        headers are the request headers with lowercase names; requests
+        failing the Host, Origin or Content-Type checks are refused. A
+        handler failing unexpectedly answers 500 with the error.
+
+        Returns:
+            Tuple of (HTTPStatus, JSON-serializable payload)
+        """
+        routes = {
+            "/status": ("GET", self.status, HTTPStatus.OK),
+            "/search": ("POST", self.search, HTTPStatus.OK),
+            "/search/batch": ("POST", self.search_batch, HTTPStatus.OK),
+            "/index": ("POST", self.reindex, HTTPStatus.ACCEPTED),
+        }
+        self.counters["requests"] += 1
+        try:
+            self._check_headers(method, headers or {})
+            route = routes.get(path.split('?', 1)[0])
+            if route is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"No endpoint {path}")
+            expected_method, handler, status = route
+            if method != expected_method:
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{path} expects {expected_method}")
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+            if not isinstance(payload, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            return status, await handler(payload)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive if asked."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"},
+                                        keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.dispatch(method, path, body, headers)
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        """Write one JSON response."""
+        data = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n")
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + data)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """
+        Start listening and return the asyncio server.
+
+        Requests may name host in their Host header as well as loopback
+        names, unless host is a wildcard address.
+        """
+        if host not in WILDCARD_HOSTS:
+            self.allowed_hosts.add(host_name(host))
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Listen until cancelled."""
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Stop the thread pool once running calls finish."""
+        self._executor.shutdown(wait=True)
+
+
+async def _request(reader, writer, host, method, path, payload=None):
+    """Send one keep-alive request and read the response."""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1')
+                 + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def load_test(host, port, queries, clients=50, duration=10.0, n_results=5, mode="vector"):
+    """
+    Measure sustained /search throughput with concurrent keep-alive clients.
+
+    Each client cycles through queries until duration seconds have
+    passed, starting at evenly spread offsets so clients don't send the
+    same query at the same time.
+
+    Returns:
+        Dict with clients, requests, errors, seconds, requests_per_second
+        and p50/p95/p99 latency in milliseconds
+    """
+    latencies = []
+    errors = 0
+
+    async def client(offset):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                status, _ = await _request(reader, writer, host, "POST", "/search",
+                                           {"query": queries[i % len(queries)], "n_results": n_results,
+                                            "mode": mode})
+                latencies.append(time.perf_counter() - started)
+                if status != HTTPStatus.OK:
+                    errors += 1
+                i += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(number * len(queries) // clients) for number in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 2)
+
+    return {"clients": clients, "requests": len(latencies), "errors": errors, "seconds": round(elapsed, 2),
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": percentile(0.5), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
@@ -0,0 +1,334 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .parser import OrgParser
+from .chunking import ChunkingEngine
+from .manifest import IndexManifest
+from .pipeline import Pipeline, Stage
+
+
+def _parse_and_span(org_file, chunker):
+    """
+    Parse one file and find its chunk spans, capturing errors instead of raising.
+
+    Returns:
+        Tuple of (document, spans, error) where error is None on success
+    """
+    try:
+        document = OrgParser(org_file).parse()
+        spans = list(chunker.iter_spans(document.body)) if document.body.strip() else []
+        return document, spans, None
+    except Exception as e:
+        return None, [], str(e)
+
+
+def _parse_and_span_batch(args):
+    """Process-pool entry point: parse and find chunk spans for one batch of files."""
+    org_files, chunker = args
+    return [_parse_and_span(org_file, chunker) for org_file in org_files]
+
+
+def _with_chunks(results):
+    """Turn (document, spans, error) results into (document, chunks, error)."""
+    for document, spans, error in results:
+        chunks = [document.body[start:end] for start, end in spans] if document else []
+        yield document, chunks, error
+
+
+def parse_and_chunk_many(paths, chunker=None, workers=None, batch_size=None):
+    """
+    Parse and chunk many org files, optionally across processes.
+
+    Files are shipped to a ProcessPoolExecutor in batches to amortize IPC;
+    only chunk offsets come back, the chunk text is cut in this process.
+    With workers <= 1 everything runs in-process.
+
+    Yields:
+        (document, chunks, error) tuples in the same order as paths
+    """
+    paths = [Path(p) for p in paths]
+    chunker = chunker or ChunkingEngine()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(paths) <= 1:
+        yield from _with_chunks(_parse_and_span(org_file, chunker) for org_file in paths)
+        return
+
+    if batch_size is None:
+        # A few batches per worker balances load without tiny messages
+        batch_size = max(1, min(256, len(paths) // (workers * 4)))
+    batches = [(paths[i:i + batch_size], chunker) for i in range(0, len(paths), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_parse_and_span_batch, batches):
+            yield from _with_chunks(results)
+
+
+def sync_parsed_file(chroma, collection_name, org_file, document, chunks, source_path,
+                     embeddings=None, spans=None):
+    """
+    Write an already parsed file's chunks, diffing against stored chunks.
+
+    Returns:
+        Tuple of (added, kept, deleted) chunk counts
+    """
+    if chunks:
+        chroma.store_document(collection_name, source_path, document.body)
+    else:
+        chroma.remove_document(collection_name, source_path)
+    return chroma.sync_file_chunks(
+        collection_name,
+        chunks,
+        Path(org_file).stem,  # filename without extension
+        document.headers,
+        source_path,
+        embeddings=embeddings,
+        spans=spans
+    )
+
+
+def index_org_file(chroma, chunker, collection_name, org_file, source_path):
+    """
+    Parse, chunk and store a single org file.
+
+    Returns:
+        Tuple of (added, kept, deleted) chunk counts
+    """
+    document = OrgParser(org_file).parse()
+    spans = list(chunker.iter_spans(document.body)) if document.body.strip() else []
+    chunks = [document.body[start:end] for start, end in spans]
+    return sync_parsed_file(chroma, collection_name, org_file, document, chunks, source_path,
+                            spans=spans)
+
+
+def apply_path_changes(chroma, chunker, manifest, root_directory, collection_name, paths,
+                       remove=False, background_compile=False):
+    """
+    Bring the index up to date for specific paths.
+
+    Existing org files are re-indexed if their content changed. Paths that
+    no longer exist have their chunks removed, along with those of any
+    indexed files below them (for directories that were moved away). With
+    remove=True every path is treated that way, whether or not it still
+    exists. The lexical index is compiled and the manifest saved afterwards;
+    with background_compile=True the compile runs in a background thread,
+    and lexical searches see the changes once it is done.
+
+    Returns:
+        List of (key, action, counts, error) tuples for the files touched,
+        in path order: action is 'updated' or 'removed', counts the
+        (added, kept, deleted) chunk counts of an update and error None
+        unless the file failed
+    """
+    root_directory = Path(root_directory)
+    changes = []
+
+    # Revisions are bumped once for the whole batch
+    with chroma.deferred_revisions():
+        for path in sorted(Path(p) for p in paths):
+            key = IndexManifest.relative_key(root_directory, path)
+
+            if remove or not path.exists():
+                # The root itself ('.') covers every indexed file
+                prefix = key + '/' if key != '.' else ''
+                for indexed_key in [k for k in manifest.entries if k == key or k.startswith(prefix)]:
+                    try:
+                        chroma.delete_file_chunks(collection_name, indexed_key)
+                        manifest.remove(indexed_key)
+                        changes.append((indexed_key, 'removed', None, None))
+                    except Exception as e:
+                        changes.append((indexed_key, 'removed', None, str(e)))
+                continue
+
+            if not path.is_file():
+                continue
+
+            try:
+                entry = manifest.check_file(root_directory, path)
+                if entry is None:
+                    continue
+
+                counts = index_org_file(chroma, chunker, collection_name, path, key)
+                manifest.update(key, entry)
+                changes.append((key, 'updated', counts, None))
+            except Exception as e:
+                changes.append((key, 'updated', None, str(e)))
+
+    chroma.compile_lexical(collection_name, background=background_compile)
+    manifest.save()
+    return changes
+
+
+def update_paths(chroma, chunker, manifest, root_directory, collection_name, paths):
+    """
+    Bring the index up to date for specific paths (see apply_path_changes).
+
+    Meant for the watcher: the lexical index is compiled in the background,
+    so one batch of changes doesn't hold up the next.
+
+    Returns:
+        List of progress messages
+    """
+    messages = []
+    for key, action, counts, error in apply_path_changes(chroma, chunker, manifest, root_directory,
+                                                          collection_name, paths,
+                                                          background_compile=True):
+        if action == 'removed':
+            if error is None:
+                messages.append(f"Removed chunks for deleted file {key}")
+            else:
+                messages.append(f"  Error removing chunks for {key}: {error}")
+        elif error is None:
+            added, kept, deleted = counts
+            messages.append(f"Updated {key}: {added} chunks added, {kept} unchanged, {deleted} removed")
+        else:
+            messages.append(f"  Error processing {key}: {error}")
+    return messages
+
+
+class IndexJob:
+    """State of one file moving through the indexing pipeline."""
+
+    __slots__ = ('path', 'key', 'entry', 'document', 'spans', 'chunks', 'embeddings',
+                 'stored', 'kept', 'deleted', 'error', 'timings')
+
+    def __init__(self, path, key):
+        """Initialize job for a file and its manifest key."""
+        self.path = path
+        self.key = key
+        self.entry = None
+        self.document = None
+        # Chunk (start, end) offsets into the body, None until chunked
+        self.spans = None
+        self.chunks = []
+        self.embeddings = None
+        self.stored = 0
+        self.kept = 0
+        self.deleted = 0
+        self.error = None
+        # Seconds spent in each pipeline stage
+        self.timings = {}
+
+
+def iter_index_jobs(org_files, root_directory, seen_keys):
+    """Wrap discovered files in IndexJobs, recording every manifest key seen."""
+    for org_file in org_files:
+        key = IndexManifest.relative_key(root_directory, org_file)
+        seen_keys.add(key)
+        yield IndexJob(org_file, key)
+
+
+def create_index_pipeline(chroma, chunker, manifest, root_directory, writer,
+                          incremental=True, parse_executor=None, parse_workers=1,
+                          parse_batch_size=32, embed_workers=1, embed_batch_size=32,
+                          queue_size=64):
+    """
+    Build the parse -> chunk -> embed -> store pipeline for indexing.
+
+    Unchanged files are dropped at the parse stage. When parse_executor (a
+    ProcessPoolExecutor) is given, the parse stage ships up to
+    parse_batch_size queued files at a time to it, as parse_and_chunk_many
+    does; the worker processes also find the chunk spans, and
+    parse_workers threads each keep one batch in flight. Otherwise files
+    are parsed here and the chunk stage finds their spans. The embed
+    stage copies out the text of up to embed_batch_size queued files and
+    embeds it in one call, and the store stage hands the chunks
+    to writer (a BulkWriter), which the caller must flush at the end. A
+    file's body (in the document store) and manifest entry are only
+    updated once its chunks are written.
+
+    Chunk offsets are absolute positions in the body, so with incremental
+    an edit also rewrites every later chunk of the file, whose offsets
+    shifted: write volume follows the distance from the first edit to the
+    end of the file, not the size of the edit. Those rows go through the
+    writer with their (cached) embeddings, so they change together with
+    the body. job.stored counts every row written, job.kept the chunks left
+    as they were.
+    """
+    root_directory = Path(root_directory)
+
+    def parse(jobs):
+        # Errors are recorded per file, so one bad file doesn't fail its batch
+        changed = []
+        for job in jobs:
+            try:
+                job.entry = manifest.check_file(root_directory, job.path)
+            except Exception as e:
+                job.error = str(e)
+            if job.entry is not None or job.error is not None:
+                changed.append(job)
+        pending = [job for job in changed if job.error is None]
+        if parse_executor is not None and pending:
+            results = parse_executor.submit(_parse_and_span_batch,
+                                            ([job.path for job in pending], chunker)).result()
+            for job, (document, spans, error) in zip(pending, results):
+                job.document, job.spans, job.error = document, spans, error
+        else:
+            for job in pending:
+                try:
+                    job.document = OrgParser(job.path).parse()
+                except Exception as e:
+                    job.error = str(e)
+        return changed
+
+    def chunk(job):
+        if job.spans is None:
+            job.spans = list(chunker.iter_spans(job.document.body)) if job.document.body.strip() else []
+        return job
+
+    def embed(jobs):
+        # Chunk text is only materialized here, as the batch is embedded
+        for job in jobs:
+            body = job.document.body
+            job.chunks = [body[start:end] for start, end in job.spans]
+        texts = [text for job in jobs for text in job.chunks]
+        if texts:
+            embeddings = chroma.embed(texts)
+            offset = 0
+            for job in jobs:
+                job.embeddings = embeddings[offset:offset + len(job.chunks)]
+                offset += len(job.chunks)
+        return jobs
+
+    def store(job):
+        key, entry = job.key, job.entry
+        body = job.document.body if job.chunks else None
+        ids, metadatas = chroma.chunk_records(job.chunks, job.path.stem, job.document.headers, key,
+                                              job.spans)
+        positions = range(len(ids))
+        if incremental:
+            # Only chunks with new content are written; vanished ones are deleted. Moved
+            # chunks are rewritten too, as their offsets only fit the new body
+            positions, _, job.deleted = chroma.apply_file_diff(
+                writer.collection_name, key, ids, metadatas, defer_updates=True)
+
+        def written():
+            # The body changes together with the chunks pointing into it
+            if body is None:
+                chroma.remove_document(writer.collection_name, key)
+            else:
+                chroma.store_document(writer.collection_name, key, body)
+            manifest.update(key, entry)
+
+        if positions:
+            embeddings = job.embeddings
+            writer.add_records(
+                [ids[i] for i in positions],
+                [job.chunks[i] for i in positions],
+                [metadatas[i] for i in positions],
+                [embeddings[i] for i in positions] if embeddings is not None else None,
+                on_flushed=written)
+        else:
+            written()
+        job.stored = len(positions)
+        job.kept = len(ids) - job.stored
+        return job
+
+    return Pipeline([
+        Stage("parse", parse, workers=parse_workers, batch_size=parse_batch_size),
+        Stage("chunk", chunk),
+        Stage("embed", embed, workers=embed_workers, batch_size=embed_batch_size),
+        Stage("store", store),
+    ], queue_size=queue_size)
@@ -0,0 +1,499 @@
+import contextlib
+import fcntl
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from .tags import tag_keys
+
+
+LEXICAL_DIRNAME = "lexical"
+
+_TERM_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase terms for lexical matching."""
+    return _TERM_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over stored chunks, one per physical collection.
+
+    Writes go to a SQLite staging table holding each chunk's term IDs and
+    frequencies as packed arrays. compile() turns a collection's rows into
+    flat numpy arrays on disk: postings (document numbers and precomputed
+    BM25 weights) grouped by term, with an offsets array indexed by term ID.
+    Queries memory-map the latest compiled version, so a search only
+    touches the postings of its own terms, and terms too common to change
+    the top results are only looked up for the documents already in the
+    running (MaxScore pruning). A search of a collection with staged
+    changes compiles it first, unless background_compile is set (for
+    long-lived servers): then the previous version keeps serving while a
+    background thread compiles.
+
+    Chunk tags (see tags.tag_keys) get postings of their own, so a search
+    restricted to tags only scores chunks that carry all of them.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, index_dir, background_compile=False):
+        """Open (or create) the index in index_dir."""
+        self.index_dir = Path(index_dir)
+        self.background_compile = background_compile
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Loaded compiled versions by collection: (version, arrays)
+        self._loaded = {}
+        # Background compile threads by collection
+        self._compiling = {}
+
+        self._db = sqlite3.connect(str(self.index_dir / "staging.sqlite"),
+                                   check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                id INTEGER NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                source_path TEXT,
+                length INTEGER NOT NULL,
+                term_ids BLOB NOT NULL,
+                tfs BLOB NOT NULL,
+                tags TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (collection, id)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (collection, source_path);
+            CREATE TABLE IF NOT EXISTS state (
+                collection TEXT PRIMARY KEY,
+                changes INTEGER NOT NULL,
+                compiled_changes INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            );
+        """)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(chunks)")]
+        if "tags" not in columns:
+            self._db.execute("ALTER TABLE chunks ADD COLUMN tags TEXT NOT NULL DEFAULT ''")
+            # Recompile so every collection gets (empty) tag postings
+            self._db.execute("UPDATE state SET changes = changes + 1")
+        self._db.commit()
+
+    def _term_ids(self, terms, create):
+        """
+        Map terms to IDs, assigning new IDs if create.
+
+        The caller holds the lock and, if create, a write transaction, so
+        other processes can't allocate the same IDs.
+        """
+        terms = list(terms)
+        if create:
+            next_id = self._db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM terms").fetchone()[0]
+            known = set(self._term_ids(terms, create=False))
+            new_terms = [term for term in terms if term not in known]
+            self._db.executemany("INSERT INTO terms (term, id) VALUES (?, ?)",
+                                 [(term, next_id + i) for i, term in enumerate(new_terms)])
+        ids = {}
+        for start in range(0, len(terms), 500):
+            batch = terms[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            ids.update(self._db.execute(f"SELECT term, id FROM terms WHERE term IN ({placeholders})", batch))
+        return ids
+
+    def _mark_dirty(self, collection_name):
+        self._db.execute(
+            "INSERT INTO state (collection, changes, compiled_changes, version) VALUES (?, 1, 0, 0) "
+            "ON CONFLICT(collection) DO UPDATE SET changes = changes + 1", (collection_name,))
+
+    def add(self, collection_name, ids, documents, metadatas=None):
+        """Stage chunks for indexing, replacing chunks with the same IDs."""
+        counts = [Counter(tokenize(document or '')) for document in documents]
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            # Take the write lock before reading the next free term ID
+            self._db.execute("BEGIN IMMEDIATE")
+            term_ids = self._term_ids({term for count in counts for term in count}, create=True)
+            rows = []
+            for chunk_id, count, metadata in zip(ids, counts, metadatas):
+                row_terms = np.array([term_ids[term] for term in count], dtype=np.uint32)
+                row_tfs = np.array([min(tf, 65535) for tf in count.values()], dtype=np.uint16)
+                metadata = metadata or {}
+                rows.append((collection_name, chunk_id, metadata.get("source_path"),
+                             sum(count.values()), row_terms.tobytes(), row_tfs.tobytes(),
+                             '\n'.join(tag_keys(metadata))))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, id, source_path, length, term_ids, tfs, tags) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._mark_dirty(collection_name)
+            self._db.commit()
+
+    def update_tags(self, collection_name, ids, metadatas):
+        """Restage the tags of chunks whose metadata changed but whose text did not."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE chunks SET tags = ? WHERE collection = ? AND id = ?",
+                [('\n'.join(tag_keys(metadata or {})), collection_name, chunk_id)
+                 for chunk_id, metadata in zip(ids, metadatas)])
+            self._mark_dirty(collection_name)
+            self._db.commit()
+
+    def remove(self, collection_name, ids=None, source_path=None):
+        """Unstage chunks by ID, or every chunk of a source path."""
+        with self._lock:
+            if ids is not None:
+                self._db.executemany("DELETE FROM chunks WHERE collection = ? AND id = ?",
+                                     [(collection_name, chunk_id) for chunk_id in ids])
+            if source_path is not None:
+                self._db.execute("DELETE FROM chunks WHERE collection = ? AND source_path = ?",
+                                 (collection_name, source_path))
+            self._mark_dirty(collection_name)
+            self._db.commit()
+
+    def drop(self, collection_name):
+        """Forget a collection entirely, after any compile of it in progress."""
+        with self._compile_lock():
+            with self._lock:
+                self._db.execute("DELETE FROM chunks WHERE collection = ?", (collection_name,))
+                self._db.execute("DELETE FROM state WHERE collection = ?", (collection_name,))
+                self._db.commit()
+                self._loaded.pop(collection_name, None)
+            shutil.rmtree(self._collection_dir(collection_name), ignore_errors=True)
+
+    def _collection_dir(self, collection_name):
+        return self.index_dir / collection_name
+
+    def _state(self, collection_name):
+        """Return (changes, compiled_changes, version) for a collection."""
+        row = self._db.execute("SELECT changes, compiled_changes, version FROM state WHERE collection = ?",
+                               (collection_name,)).fetchone()
+        return row if row else (0, 0, 0)
+
+    def is_dirty(self, collection_name):
+        """Whether staged changes have not been compiled yet."""
+        with self._lock:
+            changes, compiled_changes, _ = self._state(collection_name)
+            return changes != compiled_changes
+
+    def version(self, collection_name):
+        """Return the compiled version searches currently use (0 if none)."""
+        with self._lock:
+            return self._state(collection_name)[2]
+
+    @contextlib.contextmanager
+    def _compile_lock(self):
+        """Hold the lock that serializes compiles across threads and processes."""
+        with open(self.index_dir / "compile.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def compile(self, collection_name):
+        """
+        Rebuild a collection's compiled postings from the staging table.
+
+        The new version is written to a fresh temporary directory, renamed
+        into place and then published by updating the state table, so
+        readers switch atomically and files they have mapped are never
+        rewritten.
+
+        Returns:
+            Number of chunks indexed
+        """
+        with self._compile_lock():
+            return self._compile(collection_name)
+
+    def compile_if_dirty(self, collection_name):
+        """
+        Compile a collection if it has staged changes.
+
+        Waits for a compile already running in another thread or process,
+        and skips the work if that one left nothing staged.
+
+        Returns:
+            Number of chunks indexed, or None if nothing was staged
+        """
+        with self._compile_lock():
+            if not self.is_dirty(collection_name):
+                return None
+            return self._compile(collection_name)
+
+    def compile_in_background(self, collection_name):
+        """
+        Compile a collection in a daemon thread until it is no longer dirty.
+
+        Does nothing but return the running thread if one is already
+        compiling the collection.
+
+        Returns:
+            The compiling thread
+        """
+        with self._lock:
+            thread = self._compiling.get(collection_name)
+            if thread is None:
+                thread = threading.Thread(target=self._compile_while_dirty, args=(collection_name,),
+                                          name=f"lexical-compile-{collection_name}", daemon=True)
+                self._compiling[collection_name] = thread
+                thread.start()
+            return thread
+
+    def _compile_while_dirty(self, collection_name):
+        """Background thread body: compile until no staged changes are left."""
+        try:
+            while True:
+                with self._compile_lock():
+                    with self._lock:
+                        # Another process may have compiled while this one waited
+                        changes, compiled_changes, _ = self._state(collection_name)
+                        if changes == compiled_changes:
+                            del self._compiling[collection_name]
+                            return
+                    self._compile(collection_name)
+        except BaseException:
+            with self._lock:
+                self._compiling.pop(collection_name, None)
+            raise
+
+    def _compile(self, collection_name):
+        """Compile a collection (caller holds the compile lock)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, length, term_ids, tfs, tags FROM chunks WHERE collection = ? ORDER BY id",
+                (collection_name,)).fetchall()
+            # Changes staged while compiling keep the index dirty
+            changes, _, version = self._state(collection_name)
+            version += 1
+
+        ids = [row[0] for row in rows]
+        lengths = np.array([row[1] for row in rows], dtype=np.float32)
+        term_arrays = [np.frombuffer(row[2], dtype=np.uint32) for row in rows]
+        tf_arrays = [np.frombuffer(row[3], dtype=np.uint16) for row in rows]
+        tag_docs = {}
+        for doc, row in enumerate(rows):
+            if row[4]:
+                for tag in row[4].split('\n'):
+                    tag_docs.setdefault(tag, []).append(doc)
+        del rows
+        if ids:
+            terms = np.concatenate(term_arrays)
+            tfs = np.concatenate(tf_arrays).astype(np.float32)
+            docs = np.repeat(np.arange(len(ids), dtype=np.uint32),
+                             [len(array) for array in term_arrays])
+        else:
+            terms = np.zeros(0, dtype=np.uint32)
+            tfs = np.zeros(0, dtype=np.float32)
+            docs = np.zeros(0, dtype=np.uint32)
+        del term_arrays, tf_arrays
+
+        # Group postings by term; a stable sort keeps documents ascending
+        order = np.argsort(terms, kind='stable')
+        vocabulary_size = int(terms.max()) + 1 if len(terms) else 0
+        document_frequencies = np.bincount(terms, minlength=vocabulary_size)
+        offsets = np.zeros(vocabulary_size + 1, dtype=np.int64)
+        np.cumsum(document_frequencies, out=offsets[1:])
+
+        # Precompute each posting's BM25 weight, so queries only add them up
+        average_length = float(lengths.mean()) if ids else 1.0
+        idf = np.log1p((len(ids) - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        norms = self.K1 * (1 - self.B + self.B * lengths[docs] / (average_length or 1.0))
+        weights = (idf[terms] * tfs * (self.K1 + 1) / (tfs + norms)).astype(np.float32)
+        del terms, tfs, norms
+        docs = docs[order]
+        weights = weights[order]
+        max_weights = np.zeros(vocabulary_size, dtype=np.float32)
+        if len(weights):
+            nonempty = document_frequencies > 0
+            max_weights[nonempty] = np.maximum.reduceat(weights, offsets[:-1][nonempty])
+
+        encoded_ids = [chunk_id.encode('utf-8') for chunk_id in ids]
+        id_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(chunk_id) for chunk_id in encoded_ids], out=id_offsets[1:])
+
+        collection_dir = self._collection_dir(collection_name)
+        collection_dir.mkdir(parents=True, exist_ok=True)
+        # Leftovers of compiles that died before renaming their directory
+        for leftover in collection_dir.glob(".v*"):
+            shutil.rmtree(leftover, ignore_errors=True)
+        target = Path(tempfile.mkdtemp(prefix=f".v{version}-", dir=collection_dir))
+        np.save(target / "docs.npy", docs)
+        np.save(target / "weights.npy", weights.astype(np.float16))
+        np.save(target / "offsets.npy", offsets)
+        np.save(target / "max_weights.npy", max_weights)
+        np.save(target / "id_offsets.npy", id_offsets)
+        tag_names = sorted(tag_docs)
+        tag_offsets = np.zeros(len(tag_names) + 1, dtype=np.int64)
+        np.cumsum([len(tag_docs[tag]) for tag in tag_names], out=tag_offsets[1:])
+        np.save(target / "tag_docs.npy", np.array([doc for tag in tag_names for doc in tag_docs[tag]],
+                                                   dtype=np.uint32))
+        np.save(target / "tag_offsets.npy", tag_offsets)
+        with open(target / "ids.bin", 'wb') as f:
+            f.write(b''.join(encoded_ids))
+        with open(target / "meta.json", 'w') as f:
+            json.dump({'documents': len(ids), 'average_length': average_length,
+                       'tags': tag_names}, f)
+        published = collection_dir / f"v{version}"
+        # Only a compile that died before publishing can have left this behind
+        shutil.rmtree(published, ignore_errors=True)
+        os.rename(target, published)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO state (collection, changes, compiled_changes, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(collection) DO UPDATE SET compiled_changes = excluded.compiled_changes, "
+                "version = MAX(version, excluded.version)",
+                (collection_name, changes, changes, version))
+            self._db.commit()
+
+        # Older versions can go; open memory maps keep their files alive
+        for old in collection_dir.glob("v*"):
+            if old.name[1:].isdigit() and int(old.name[1:]) < version:
+                shutil.rmtree(old, ignore_errors=True)
+        return len(ids)
+
+    def _arrays(self, collection_name):
+        """Return the memory-mapped arrays of the current compiled version."""
+        with self._lock:
+            version = self._state(collection_name)[2]
+            loaded = self._loaded.get(collection_name)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]
+
+        directory = self._collection_dir(collection_name) / f"v{version}"
+        if not version or not directory.exists():
+            return None
+        with open(directory / "meta.json") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode='r')
+                  for name in ("docs", "weights", "offsets", "max_weights", "id_offsets",
+                               "tag_docs", "tag_offsets")}
+        ids_path = directory / "ids.bin"
+        arrays["ids"] = np.memmap(ids_path, dtype=np.uint8, mode='r') if ids_path.stat().st_size else b''
+        arrays.update(meta)
+        arrays["tag_positions"] = {tag: i for i, tag in enumerate(meta["tags"])}
+        with self._lock:
+            self._loaded[collection_name] = (version, arrays)
+        return arrays
+
+    def _tag_mask(self, arrays, tags):
+        """Return a boolean array of the documents carrying every tag."""
+        mask = None
+        for tag in tags:
+            position = arrays["tag_positions"].get(tag)
+            if position is None:
+                return np.zeros(arrays["documents"], dtype=bool)
+            docs = arrays["tag_docs"][arrays["tag_offsets"][position]:arrays["tag_offsets"][position + 1]]
+            tag_mask = np.zeros(arrays["documents"], dtype=bool)
+            tag_mask[docs] = True
+            mask = tag_mask if mask is None else mask & tag_mask
+        return mask
+
+    def search(self, collection_name, query_text, n_results=5, tags=None):
+        """
+        Rank chunks by BM25 score for query_text.
+
+        Staged changes are compiled first. With background_compile, results
+        come from the last compiled version instead and a background
+        compile is started for later searches; only a collection never
+        compiled before is then compiled in-line. tags are
+        normalized tag filters (see tags.normalize_tag); only chunks
+        carrying all of them are ranked.
+
+        Returns:
+            List of (chunk_id, score) pairs, best first
+        """
+        if n_results < 1:
+            return []
+        if self.is_dirty(collection_name):
+            if self.background_compile and self.version(collection_name):
+                self.compile_in_background(collection_name)
+            else:
+                # A thread started here could die with a short-lived process
+                self.compile_if_dirty(collection_name)
+        try:
+            arrays = self._arrays(collection_name)
+        except FileNotFoundError:
+            # Another process published a newer version and removed this one
+            arrays = self._arrays(collection_name)
+        if arrays is None or not arrays["documents"]:
+            return []
+
+        query_terms = Counter(tokenize(query_text))
+        with self._lock:
+            term_ids = self._term_ids(query_terms, create=False)
+
+        offsets = arrays["offsets"]
+        max_weights = arrays["max_weights"]
+        terms = []
+        for term, term_id in term_ids.items():
+            if term_id < len(max_weights) and offsets[term_id] < offsets[term_id + 1]:
+                terms.append((query_terms[term] * float(max_weights[term_id]), term_id, query_terms[term]))
+        if not terms:
+            return []
+        allowed = self._tag_mask(arrays, tags) if tags else None
+        if allowed is not None and not allowed.any():
+            return []
+
+        # Highest-impact (rarest) terms first; once the k-th best score beats
+        # everything the remaining terms could add, unseen documents can't
+        # make the top k and later terms only score existing candidates
+        terms.sort(reverse=True)
+        remaining = sum(bound for bound, _, _ in terms)
+        scores = np.zeros(arrays["documents"], dtype=np.float32)
+        touched = np.zeros(arrays["documents"], dtype=bool)
+        candidates = None
+        for bound, term_id, count in terms:
+            if candidates is None and touched.any():
+                seen = np.flatnonzero(touched)
+                if len(seen) >= n_results:
+                    threshold = np.partition(scores[seen], len(seen) - n_results)[-n_results]
+                    if threshold >= remaining:
+                        candidates = seen[scores[seen] + remaining >= threshold]
+            remaining -= bound
+
+            start, end = int(offsets[term_id]), int(offsets[term_id + 1])
+            docs = arrays["docs"][start:end]
+            weights = arrays["weights"][start:end]
+            if candidates is not None:
+                # Postings are sorted by document, so look candidates up directly
+                positions = np.searchsorted(docs, candidates)
+                positions[positions == len(docs)] = 0
+                found = docs[positions] == candidates
+                scores[candidates[found]] += count * weights[positions[found]].astype(np.float32)
+            else:
+                if allowed is not None:
+                    keep = allowed[docs]
+                    docs = docs[keep]
+                    weights = weights[keep]
+                # Each document appears once per term, so fancy-index addition is safe
+                scores[docs] += count * weights.astype(np.float32)
+                touched[docs] = True
+
+        if candidates is None:
+            candidates = np.flatnonzero(touched)
+        if len(candidates) > n_results:
+            candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        id_offsets = arrays["id_offsets"]
+        return [(bytes(arrays["ids"][id_offsets[doc]:id_offsets[doc + 1]]).decode('utf-8'), float(scores[doc]))
+                for doc in candidates if scores[doc] > 0]
+
+    def close(self):
+        """Wait for background compiles, then close the staging database."""
+        with self._lock:
+            threads = list(self._compiling.values())
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+MANIFEST_FILENAME = "daimon_manifest.json"
+
+
+class IndexManifest:
+    """Persistent record of the org files that have been indexed.
+
+    Each entry is keyed by the file path relative to the knowledge base root
+    and stores the size, mtime and content hash seen at indexing time.
+    """
+
+    def __init__(self, manifest_path):
+        """Load manifest from disk, starting empty if it doesn't exist."""
+        self.manifest_path = Path(manifest_path)
+        self.entries = {}
+
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (json.JSONDecodeError, OSError):
+                # A corrupt manifest just means everything gets re-indexed
+                self.entries = {}
+
+    @staticmethod
+    def file_hash(file_path):
+        """Return the SHA-256 hex digest of a file's contents."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def relative_key(root_directory, file_path):
+        """Return the manifest key for a file under the knowledge base root."""
+        return Path(file_path).relative_to(root_directory).as_posix()
+
+    def check_file(self, root_directory, org_file):
+        """
+        Check a single file against its manifest entry.
+
+        A file whose size and mtime match its entry is treated as unchanged
+        without reading it. Otherwise the content hash decides, so a file
+        that was merely touched is not re-indexed.
+
+        Returns:
+            New entry dict if the file is new or modified, None if unchanged
+        """
+        key = self.relative_key(root_directory, org_file)
+        stat = os.stat(org_file)
+        old_entry = self.entries.get(key)
+
+        if (old_entry is not None and
+                old_entry['size'] == stat.st_size and
+                old_entry['mtime'] == stat.st_mtime_ns):
+            return None
+
+        entry = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': self.file_hash(org_file)
+        }
+
+        if old_entry is not None and old_entry['hash'] == entry['hash']:
+            # Touched but not edited - refresh stat info only
+            self.entries[key] = dict(old_entry, size=entry['size'], mtime=entry['mtime'])
+            return None
+
+        return entry
+
+    def update(self, key, entry):
+        """Record an indexed file."""
+        self.entries[key] = entry
+
+    def remove(self, key):
+        """Forget a file that is no longer indexed."""
+        self.entries.pop(key, None)
+
+    def clear(self):
+        """Drop all entries, e.g. before a full rebuild."""
+        self.entries = {}
+
+    def save(self):
+        """Write the manifest to disk atomically."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'files': self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
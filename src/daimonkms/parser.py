@@ -1,80 +1,110 @@
+from array import array
 from pathlib import Path
 
 
+class ParsedDocument:
+    """
+    Compact result of a single parsing pass over an org file.
+
+    line_offsets holds, for each line of body, the 0-based line number it
+    came from in the source file, so chunks can be mapped back to the file.
+    """
+
+    __slots__ = ('title', 'filetags', 'id', 'body', 'line_offsets')
+
+    def __init__(self, title=None, filetags=None, id=None, body='', line_offsets=None):
+        """Initialize document fields."""
+        self.title = title
+        self.filetags = filetags if filetags is not None else []
+        self.id = id
+        self.body = body
+        self.line_offsets = line_offsets if line_offsets is not None else array('I')
+
+    @property
+    def headers(self):
+        """Headers as the dictionary returned by OrgParser.parse_headers."""
+        return {'title': self.title, 'filetags': self.filetags, 'id': self.id}
+
+    def source_line(self, offset):
+        """Return the 0-based source file line containing a body offset."""
+        if not self.line_offsets:
+            return 0
+        line = self.body.count('\n', 0, offset)
+        return self.line_offsets[min(line, len(self.line_offsets) - 1)]
+
+
 class OrgParser:
     """Parser for org-mode files."""
-    
+
     def __init__(self, file_path):
         """Initialize parser with path to org file."""
         self.file_path = Path(file_path)
-    
-    def parse_headers(self):
-        """Parse org file headers and return as dictionary."""
-        headers = {}
+        self._document = None
+
+    def parse(self):
+        """
+        Parse headers and content in one pass over the file.
+
+        The result is cached, so parse_headers and parse_content don't read
+        the file again.
+        """
+        if self._document is not None:
+            return self._document
+
+        document = ParsedDocument()
+        content_lines = []
+        source_lines = array('I')
         in_properties = False
-        
+
         with open(self.file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                
+            for line_number, line in enumerate(f):
+                stripped_line = line.strip()
+
                 # Check for PROPERTIES drawer
-                if line == ':PROPERTIES:':
+                if stripped_line == ':PROPERTIES:':
                     in_properties = True
                     continue
-                elif line == ':END:':
+                elif stripped_line == ':END:':
                     in_properties = False
                     continue
-                elif in_properties and line.startswith(':ID:'):
+                elif in_properties and stripped_line.startswith(':ID:'):
                     # Extract ID after the colon and strip whitespace
-                    id_value = line[4:].strip()
-                    headers['id'] = id_value
-                elif line.startswith('#+TITLE:'):
+                    document.id = stripped_line[4:].strip()
+                    continue
+                elif stripped_line.startswith('#+TITLE:'):
                     # Extract title after the colon and strip whitespace
-                    title = line[8:].strip()
-                    headers['title'] = title
-                elif line.startswith('#+filetags:'):
-                    # Extract filetags after the colon and parse tags
-                    filetags_str = line[11:].strip()
-                    # Split on colons and filter out empty strings
-                    tags = [tag for tag in filetags_str.split(':') if tag]
-                    headers['filetags'] = tags
-        
-        # Set defaults if not found
-        if 'title' not in headers:
-            headers['title'] = None
-        if 'filetags' not in headers:
-            headers['filetags'] = []
-        if 'id' not in headers:
-            headers['id'] = None
-            
-        return headers
-    
-    def parse_content(self):
-        """Parse org file content, excluding headers and properties."""
-        content_lines = []
-        in_properties = False
-        
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                stripped_line = line.strip()
-                
-                # Skip PROPERTIES drawer
-                if stripped_line == ':PROPERTIES:':
-                    in_properties = True
+                    document.title = stripped_line[8:].strip()
                     continue
-                elif stripped_line == ':END:':
-                    in_properties = False
+                elif stripped_line.startswith('#+filetags:'):
+                    # Split on colons and filter out empty strings
+                    filetags_str = stripped_line[11:].strip()
+                    document.filetags = [tag for tag in filetags_str.split(':') if tag]
                     continue
                 elif in_properties:
+                    # Skip the rest of the PROPERTIES drawer
                     continue
-                
-                # Skip header lines
-                if (stripped_line.startswith('#+TITLE:') or 
-                    stripped_line.startswith('#+filetags:')):
-                    continue
-                
+
                 # Keep everything else as content
                 content_lines.append(line.rstrip())
-        
-        # Join lines and strip leading/trailing whitespace
-        return '\n'.join(content_lines).strip()
+                source_lines.append(line_number)
+
+        # Drop leading/trailing blank lines, then strip the remaining edges
+        first = 0
+        last = len(content_lines)
+        while first < last and not content_lines[first].strip():
+            first += 1
+        while last > first and not content_lines[last - 1].strip():
+            last -= 1
+        document.body = '\n'.join(content_lines[first:last]).strip()
+        document.line_offsets = source_lines[first:last]
+
+        self._document = document
+        return document
+
+    def parse_headers(self):
+        """Parse org file headers and return as dictionary."""
+        return self.parse().headers
+
+    def parse_content(self):
+        """Parse org file content, excluding headers and properties."""
+        return self.parse().body
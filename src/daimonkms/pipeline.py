@@ -0,0 +1,252 @@
+import queue
+import threading
+import time
+
+
+class Stage:
+    """One step of a Pipeline, run by one or more worker threads."""
+
+    def __init__(self, name, func, workers=1, batch_size=None):
+        """
+        Initialize stage.
+
+        func takes an item and returns the item to pass on, or None to drop
+        it. Items whose error attribute is set skip func entirely. Items with
+        a `timings` dict get the seconds spent on them recorded under the
+        stage name (for batches, an even share of the batch).
+
+        With batch_size set, func instead takes a list of up to batch_size
+        items (whatever is already queued, without waiting for more) and
+        returns the list of items to pass on.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+
+        self.items = 0
+        self.dropped = 0
+        self.active = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, queue_depth):
+        """Record one processed item and the input queue depth seen for it."""
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += seconds
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self._depth_total += queue_depth
+            self._depth_samples += 1
+
+    @property
+    def mean_queue_depth(self):
+        """Average input queue depth observed by this stage."""
+        if not self._depth_samples:
+            return 0.0
+        return self._depth_total / self._depth_samples
+
+    @property
+    def throughput(self):
+        """Items per busy second, per worker."""
+        if not self.busy_seconds:
+            return 0.0
+        return self.items / self.busy_seconds
+
+
+class Pipeline:
+    """
+    Run items through stages connected by bounded queues.
+
+    A source thread feeds the first queue and each stage has its own worker
+    threads, so stages overlap: while one batch is being embedded the next
+    files can already be read and parsed. Bounded queues provide
+    backpressure so a fast stage cannot run far ahead of a slow one.
+
+    Items must have an `error` attribute. If a stage raises, the message is
+    stored there and the item flows on to the output so callers can report
+    it; later stages skip it.
+    """
+
+    _DONE = object()
+
+    def __init__(self, stages, queue_size=64):
+        """Initialize pipeline with stages in processing order."""
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.source_items = 0
+        self.source_done = False
+        self.output_items = 0
+        self.source_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.source_error = None
+        self._stop = threading.Event()
+
+    def _put(self, target, item):
+        """Put with backpressure, giving up if the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_source(self, source, output):
+        """Feed source items into the first queue."""
+        start = time.perf_counter()
+        try:
+            for item in source:
+                self.source_items += 1
+                if not self._put(output, item):
+                    return
+        except Exception as e:
+            # A failing source ends the run; run() re-raises it at the end
+            self.source_error = e
+        finally:
+            self.source_seconds = time.perf_counter() - start
+            self.source_done = True
+            for _ in range(self.stages[0].workers if self.stages else 1):
+                self._put(output, self._DONE)
+
+    def _process(self, stage, items):
+        """Apply a stage to items, returning the items to pass on."""
+        pending = [item for item in items if item.error is None]
+        results = [item for item in items if item.error is not None]
+        if not pending:
+            return results
+
+        try:
+            if stage.batch_size:
+                passed = list(stage.func(pending))
+                with stage._lock:
+                    stage.dropped += len(pending) - len(passed)
+                results.extend(passed)
+            else:
+                result = stage.func(pending[0])
+                if result is None:
+                    with stage._lock:
+                        stage.dropped += 1
+                else:
+                    results.append(result)
+        except Exception as e:
+            for item in pending:
+                item.error = str(e)
+            results.extend(pending)
+        return results
+
+    def _run_worker(self, stage, inbox, outbox, remaining, next_workers):
+        """Process items for one stage until the upstream is exhausted."""
+        done = False
+        while not done and not self._stop.is_set():
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if item is self._DONE:
+                break
+
+            # Batching stages take whatever else is queued, up to batch_size
+            items = [item]
+            while stage.batch_size and len(items) < stage.batch_size:
+                try:
+                    item = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._DONE:
+                    done = True
+                    break
+                items.append(item)
+
+            depth = inbox.qsize()
+            with stage._lock:
+                stage.active += 1
+            start = time.perf_counter()
+            try:
+                results = self._process(stage, items)
+            finally:
+                with stage._lock:
+                    stage.active -= 1
+            elapsed = time.perf_counter() - start
+            for item in items:
+                stage.record(elapsed / len(items), depth)
+                timings = getattr(item, 'timings', None)
+                if timings is not None:
+                    timings[stage.name] = elapsed / len(items)
+
+            for item in results:
+                if not self._put(outbox, item):
+                    return
+
+        # The last worker of a stage tells every worker downstream to finish
+        with remaining['lock']:
+            remaining['count'] -= 1
+            last = remaining['count'] == 0
+        if last:
+            for _ in range(next_workers):
+                self._put(outbox, self._DONE)
+
+    def run(self, source):
+        """
+        Run source items through every stage.
+
+        Yields:
+            Items that made it through the last stage, plus errored items
+
+        Raises:
+            Exception: Whatever the source raised, once the stages drained
+        """
+        start = time.perf_counter()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_source, args=(source, queues[0]), daemon=True)]
+
+        for index, stage in enumerate(self.stages):
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            remaining = {'count': stage.workers, 'lock': threading.Lock()}
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._run_worker,
+                    args=(stage, queues[index], queues[index + 1], remaining, next_workers),
+                    daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is self._DONE:
+                    break
+                self.output_items += 1
+                yield item
+        finally:
+            # Unblock workers if the caller stopped early
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall_seconds = time.perf_counter() - start
+
+        if self.source_error is not None:
+            raise self.source_error
+
+    @property
+    def finished_items(self):
+        """Source items that left the pipeline, whether dropped or output."""
+        return self.output_items + sum(stage.dropped for stage in self.stages)
+
+    def report(self):
+        """Return lines summarizing stage throughput and queue depths."""
+        lines = [f"Pipeline stages ({self.wall_seconds:.2f}s wall time):"]
+        lines.append(f"  scan: {self.source_items} items in {self.source_seconds:.2f}s")
+        for stage in self.stages:
+            lines.append(
+                f"  {stage.name}: {stage.items} items, {stage.busy_seconds:.2f}s busy, "
+                f"{stage.throughput:.1f} items/s per worker x{stage.workers}, "
+                f"queue depth mean {stage.mean_queue_depth:.1f} / max {stage.max_queue_depth}"
+                f" (limit {self.queue_size})")
+        return lines
+
@@ -0,0 +1,151 @@
+import json
+import sys
+import threading
+import time
+
+
+# Seconds between redraws of the live progress line
+PROGRESS_INTERVAL = 0.5
+
+
+def format_duration(seconds):
+    """Format seconds as e.g. '45s', '3m05s' or '1h02m'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class ProgressLine:
+    """
+    Live one-line summary of a running Pipeline, redrawn in place.
+
+    Shows files finished (out of those found so far), files/s, chunks/s,
+    an ETA once the scan has found every file, and the stages currently
+    at work. A background thread redraws it every interval seconds while
+    started; output printed in between should go through clear() first so
+    the line doesn't get mixed into it.
+    """
+
+    def __init__(self, pipeline, stream=None, interval=PROGRESS_INTERVAL):
+        """Initialize progress line for pipeline, written to stream (default: stderr)."""
+        self.pipeline = pipeline
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.chunks = 0
+        self.lock = threading.Lock()
+        self._start = None
+        self._width = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_chunks(self, count):
+        """Count chunks written."""
+        self.chunks += count
+
+    def render(self):
+        """Return the current progress text."""
+        elapsed = max(time.perf_counter() - self._start, 1e-9) if self._start else 1e-9
+        done = self.pipeline.finished_items
+        found = self.pipeline.source_items
+        files_rate = done / elapsed
+        parts = [f"{done}/{found}{'' if self.pipeline.source_done else '+'} files",
+                 f"{files_rate:.1f} files/s", f"{self.chunks / elapsed:.1f} chunks/s"]
+        if self.pipeline.source_done and files_rate > 0:
+            parts.append(f"ETA {format_duration((found - done) / files_rate)}")
+        active = [stage.name for stage in self.pipeline.stages if stage.active]
+        if active:
+            parts.append(f"stage: {'+'.join(active)}")
+        return "Indexing: " + ", ".join(parts)
+
+    def draw(self):
+        """Redraw the progress line."""
+        with self.lock:
+            text = self.render()
+            self.stream.write("\r" + text.ljust(self._width))
+            self.stream.flush()
+            self._width = len(text)
+
+    def clear(self):
+        """Erase the progress line; call with lock held."""
+        if self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self.stream.flush()
+            self._width = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.draw()
+
+    def start(self):
+        """Start redrawing in the background."""
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop redrawing and erase the line."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        with self.lock:
+            self.clear()
+
+
+class IndexOutput:
+    """
+    Print index output as it is produced.
+
+    In text mode messages are printed as lines; in JSON Lines mode every
+    message and event is printed as one JSON object with an "event" field.
+    Only messages and events marked keep are retained, for the transcript
+    returned at the end, so per-file output doesn't accumulate in memory.
+    """
+
+    def __init__(self, jsonl=False, stream=None):
+        """Initialize output writing to stream (default: stdout)."""
+        self.jsonl = jsonl
+        self.stream = stream
+        self.progress = None
+        self._kept = []
+
+    def _write(self, line):
+        stream = self.stream or sys.stdout
+        if self.progress is None:
+            print(line, file=stream, flush=True)
+            return
+        with self.progress.lock:
+            self.progress.clear()
+            print(line, file=stream, flush=True)
+
+    def message(self, text, keep=True):
+        """Output a line of text (an event of type "message" in JSON Lines mode)."""
+        self.event("message", text, keep=keep)
+
+    def event(self, name, text=None, keep=False, **fields):
+        """
+        Output an event.
+
+        text is what text mode prints (nothing if None); JSON Lines mode
+        prints {"event": name, "text": text, **fields}.
+        """
+        if self.jsonl:
+            record = {"event": name}
+            if text is not None:
+                record["text"] = text.strip()
+            record.update(fields)
+            line = json.dumps(record)
+        elif text is None:
+            return
+        else:
+            line = text
+        self._write(line)
+        if keep:
+            self._kept.append(line)
+
+    def transcript(self):
+        """Return the retained output."""
+        return "\n".join(self._kept)
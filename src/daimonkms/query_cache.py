@@ -0,0 +1,169 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Result fields worth caching; embeddings and other includes are left out
+CACHED_FIELDS = ("ids", "documents", "metadatas", "distances", "scores")
+
+
+def normalize_query(query_text):
+    """Normalize query text so trivially different queries share an entry."""
+    return ' '.join(query_text.casefold().split())
+
+
+class QueryCache:
+    """
+    LRU cache of query results, in memory and optionally on disk.
+
+    Keys combine the database, collection generation and write revision
+    with the normalized query, n_results and filters. Any write to a collection
+    bumps its revision and a rebuild switches its generation, so stale
+    results are never served; they simply age out of the LRU.
+
+    The on-disk cache is shared by every process using the same cache_dir,
+    which also keeps hit and miss counters across processes. Lookups don't
+    write: counters and recency are kept in memory and written in batches,
+    with every put and on close.
+    """
+
+    # Lookups between writes of pending counters and recency
+    FLUSH_INTERVAL = 100
+
+    def __init__(self, max_entries=256, cache_dir=None, max_disk_entries=10000):
+        """Initialize cache, persisting to cache_dir if given."""
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        # Counters and last-used times not yet written to the on-disk cache
+        self._pending_counts = {'hits': 0, 'misses': 0}
+        self._pending_used = {}
+
+        if cache_dir is not None:
+            cache_dir = Path(cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(cache_dir / "queries.sqlite"),
+                                       check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    last_used INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+                CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """)
+            self._db.commit()
+
+    @staticmethod
+    def key(physical_collection, revision, query_text, n_results, where=None, mode='vector',
+            database=None):
+        """
+        Return the cache key of a query against a collection revision.
+
+        database identifies the database holding the collection (its
+        resolved path), since generation names and revisions repeat across
+        databases sharing one cache_dir.
+        """
+        parts = [database, physical_collection, revision, normalize_query(query_text), n_results,
+                 where, mode]
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _flush(self):
+        """Write pending counters and recency to the on-disk cache (caller holds the lock)."""
+        self._db.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, count) for name, count in self._pending_counts.items() if count])
+        self._db.executemany("UPDATE results SET last_used = ? WHERE key = ?",
+                             [(last_used, key) for key, last_used in self._pending_used.items()])
+        self._pending_counts = {'hits': 0, 'misses': 0}
+        self._pending_used = {}
+
+    def get(self, key):
+        """Return a copy of the cached results for key, or None."""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    results = json.loads(row[0])
+                    self._remember(key, results)
+
+            if results is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if self._db is not None:
+                self._pending_counts['hits' if results is not None else 'misses'] += 1
+                if results is not None:
+                    self._pending_used[key] = time.time_ns()
+                if sum(self._pending_counts.values()) >= self.FLUSH_INTERVAL:
+                    self._flush()
+                    self._db.commit()
+
+        return copy.deepcopy(results)
+
+    def _remember(self, key, results):
+        """Add results to the in-memory LRU (caller holds the lock)."""
+        self._entries[key] = results
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key, results):
+        """Cache query results under key."""
+        results = {field: copy.deepcopy(results.get(field)) for field in CACHED_FIELDS}
+        with self._lock:
+            self._remember(key, results)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                    (key, json.dumps(results), time.time_ns()))
+                # Eviction must see the recency of recent hits
+                self._flush()
+                count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if count > self.max_disk_entries:
+                    self._db.execute(
+                        "DELETE FROM results WHERE key IN "
+                        "(SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                        (count - self.max_disk_entries,))
+                self._db.commit()
+
+    def stats(self):
+        """
+        Return cache statistics.
+
+        Returns:
+            Dict with entries, hits and misses; on-disk totals when persisted,
+            otherwise those of this process
+        """
+        with self._lock:
+            if self._db is None:
+                return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+            counters = dict(self._db.execute("SELECT name, value FROM counters"))
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {'entries': entries,
+                    'hits': counters.get('hits', 0) + self._pending_counts['hits'],
+                    'misses': counters.get('misses', 0) + self._pending_counts['misses']}
+
+    def close(self):
+        """Write pending counters and recency and close the on-disk cache."""
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.commit()
+                self._db.close()
+                self._db = None
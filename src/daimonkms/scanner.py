@@ -1,24 +1,176 @@
+import fnmatch
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 
+IGNORE_FILENAME = ".daimonignore"
+DEFAULT_IGNORE_PATTERNS = [".git", "archive/"]
+SNAPSHOT_FILENAME = "scan_snapshot.json"
+
+
 class KnowledgeBaseScanner:
     """Scanner for finding and processing org-mode files in a knowledge base."""
-    
-    def __init__(self, root_directory):
-        """Initialize scanner with root directory path."""
+
+    def __init__(self, root_directory, ignore_patterns=None, max_workers=8, snapshot_path=None):
+        """
+        Initialize scanner with root directory path.
+
+        ignore_patterns are fnmatch-style patterns matched against entry
+        names and root-relative paths; a trailing slash restricts a pattern
+        to directories. Patterns from a .daimonignore file in the root are
+        added to them.
+
+        If snapshot_path is given, directory mtimes and listings are cached
+        there so later scans can skip listing unchanged directories.
+        """
         self.root_directory = Path(root_directory)
-    
+        self.max_workers = max_workers
+        if ignore_patterns is None:
+            ignore_patterns = DEFAULT_IGNORE_PATTERNS
+        self.ignore_patterns = list(ignore_patterns) + self._read_ignore_file()
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._snapshot = self._load_snapshot()
+        self.last_scan_stats = {'listed': 0, 'reused': 0}
+
+    def _load_snapshot(self):
+        """Load cached directory listings, discarding stale or foreign ones."""
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return {}
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+        # Listings depend on the root and on what was ignored
+        if (snapshot.get('root') != str(self.root_directory) or
+                snapshot.get('ignore_patterns') != self.ignore_patterns):
+            return {}
+        return snapshot.get('directories', {})
+
+    def _save_snapshot(self, directories):
+        """Write directory listings to the snapshot file atomically."""
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': 1,
+                'root': str(self.root_directory),
+                'ignore_patterns': self.ignore_patterns,
+                'directories': directories
+            }, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _read_ignore_file(self):
+        """Read extra ignore patterns from the root .daimonignore file."""
+        ignore_file = self.root_directory / IGNORE_FILENAME
+        try:
+            with open(ignore_file, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+        except OSError:
+            return []
+        # Skip blank lines and comments
+        return [line for line in lines if line and not line.startswith('#')]
+
+    def is_ignored(self, relative_path, is_dir):
+        """Check whether a root-relative path matches an ignore pattern."""
+        name = relative_path.rsplit('/', 1)[-1]
+        for pattern in self.ignore_patterns:
+            if pattern.endswith('/'):
+                if not is_dir:
+                    continue
+                pattern = pattern.rstrip('/')
+            if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern):
+                return True
+        return False
+
+    def _scan_directory(self, directory, relative_dir, new_snapshot):
+        """
+        List one directory.
+
+        Returns an (org_files, subdirectories, reused) tuple. Entry types
+        come from the dirent, so no extra stat is needed for most filesystems.
+        When the directory's mtime matches the snapshot, the cached listing
+        is reused instead of reading the directory.
+        """
+        org_files = []
+        subdirectories = []
+        reused = False
+
+        try:
+            # Stat before listing so a concurrent change forces a rescan next time
+            mtime = os.stat(directory).st_mtime_ns
+            cached = self._snapshot.get(relative_dir)
+            if cached is not None and cached['mtime'] == mtime:
+                new_snapshot[relative_dir] = cached
+                prefix = f"{relative_dir}/" if relative_dir else ""
+                org_files = [Path(directory, name) for name in cached['files']]
+                subdirectories = [(os.path.join(directory, name), prefix + name)
+                                  for name in cached['dirs']]
+                return org_files, subdirectories, True
+
+            entries = os.scandir(directory)
+        except OSError:
+            # Unreadable or vanished directory
+            return org_files, subdirectories, reused
+
+        with entries:
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.is_ignored(relative_path, True):
+                            subdirectories.append((entry.path, relative_path))
+                    elif entry.name.endswith('.org') and entry.is_file():
+                        if not self.is_ignored(relative_path, False):
+                            org_files.append(Path(entry.path))
+                except OSError:
+                    continue
+
+        new_snapshot[relative_dir] = {
+            'mtime': mtime,
+            'files': [path.name for path in org_files],
+            'dirs': [relative_path.rsplit('/', 1)[-1] for _, relative_path in subdirectories]
+        }
+        return org_files, subdirectories, reused
+
+    def iter_org_files(self):
+        """
+        Yield org file paths as they are discovered.
+
+        Subdirectories are listed concurrently on a thread pool and each
+        directory's files are yielded as soon as its listing completes, so
+        callers can start work before the walk has finished.
+
+        Subdirectories of an unchanged directory are still visited, since a
+        directory's mtime only reflects its own entries, but only their mtime
+        is read unless they changed too.
+        """
+        self.last_scan_stats = {'listed': 0, 'reused': 0}
+        if not self.root_directory.is_dir():
+            return
+
+        new_snapshot = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._scan_directory, str(self.root_directory), "", new_snapshot)}
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    org_files, subdirectories, reused = future.result()
+                    self.last_scan_stats['reused' if reused else 'listed'] += 1
+                    for directory, relative_dir in subdirectories:
+                        pending.add(executor.submit(self._scan_directory, directory,
+                                                    relative_dir, new_snapshot))
+                    yield from org_files
+
+        # Only a completed walk describes the whole tree
+        self._snapshot = new_snapshot
+        if self.snapshot_path is not None:
+            self._save_snapshot(new_snapshot)
+
     def scan_org_files(self):
         """Scan for org files in the knowledge base and return list of paths."""
-        org_files = []
-        
-        # Handle case where directory doesn't exist
-        if not self.root_directory.exists():
-            return org_files
-        
-        # Walk through directory tree looking for .org files
-        for file_path in self.root_directory.rglob("*.org"):
-            if file_path.is_file():
-                org_files.append(file_path)
-        
-        return org_files
+        # Sort so results don't depend on thread scheduling
+        return sorted(self.iter_org_files())
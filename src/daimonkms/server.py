@@ -0,0 +1,297 @@
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+
+from .config_loader import check_private_dir, default_runtime_dir
+from .query_cache import CACHED_FIELDS
+
+
+# ChromaManager methods the daemon answers
+SERVED_METHODS = ('query_collection', 'query_collection_many')
+
+# Every request names a collection; this one when it doesn't
+DEFAULT_COLLECTION = "knowledge_base"
+
+
+class DaemonError(Exception):
+    """The daemon could not answer a request."""
+
+
+def socket_path(db_path):
+    """Return the Unix socket path of the daemon serving db_path."""
+    resolved = str(Path(db_path).expanduser().resolve())
+    digest = hashlib.sha256(resolved.encode('utf-8')).hexdigest()[:16]
+    return default_runtime_dir() / f"{digest}.sock"
+
+
+def _plain_results(results):
+    """Keep the JSON-serializable result fields of a query."""
+    return {field: results.get(field) for field in CACHED_FIELDS if results.get(field) is not None}
+
+
+def result_matches(results):
+    """
+    Flatten a single-query result into one dict per match.
+
+    Returns:
+        List of dicts with id, document, metadata, distance and score
+        (None where the search mode doesn't produce one)
+    """
+    if not results.get("ids"):
+        return []
+    ids = results["ids"][0]
+    columns = {field: (results.get(field) or [[None] * len(ids)])[0]
+               for field in ("documents", "metadatas", "distances", "scores")}
+    return [{"id": chunk_id, "document": columns["documents"][i], "metadata": columns["metadatas"][i],
+             "distance": columns["distances"][i], "score": columns["scores"][i]}
+            for i, chunk_id in enumerate(ids)]
+
+
+class ReadWriteLock:
+    """
+    Lock shared by many readers or held by one writer.
+
+    Waiting writers go first, so a steady stream of readers can't starve
+    them.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        """Hold the lock shared for the duration of the block."""
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the block."""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class SearchService:
+    """
+    Answer search requests from one warm ChromaManager.
+
+    Requests may run concurrently. Before each one the collection's write
+    revision is checked; if another process wrote to it since it was last
+    served, the client is reopened (once in-flight requests finish) so new
+    vectors are visible.
+    """
+
+    def __init__(self, chroma):
+        """Initialize service around a ChromaManager."""
+        self.chroma = chroma
+        self._lock = ReadWriteLock()
+        self._revisions_lock = threading.Lock()
+        # Revision each physical collection had when last served
+        self._revisions = {}
+
+    def _refresh(self, collection_name):
+        """Reopen the database if the collection changed since it was last served."""
+        physical_name = self.chroma.aliases.resolve(collection_name)
+        revision = self.chroma.aliases.revision(physical_name)
+        with self._revisions_lock:
+            if self._revisions.setdefault(physical_name, revision) == revision:
+                return
+        with self._lock.write():
+            with self._revisions_lock:
+                if self._revisions.get(physical_name, revision) != revision:
+                    self.chroma.reopen()
+                    self._revisions.clear()
+                self._revisions[physical_name] = revision
+
+    def status(self):
+        """
+        Describe the served database.
+
+        Returns:
+            Dict with db_path, collections (name, the alias serving it if
+            any, and chunk count) and query cache statistics
+        """
+        with self._lock.read():
+            served_by = {physical: alias for alias, physical in self.chroma.aliases.items()}
+            collections = [{"name": collection.name, "alias": served_by.get(collection.name),
+                            "count": collection.count()}
+                           for collection in self.chroma.client.list_collections()]
+        return {
+            "db_path": str(self.chroma.db_path),
+            "collections": collections,
+            "query_cache": self.chroma.query_cache.stats() if self.chroma.query_cache else None,
+        }
+
+    def handle(self, request):
+        """
+        Answer one request.
+
+        A request is {"method": name, "params": {...}} calling one of
+        SERVED_METHODS, or {"method": "ping"} or {"method": "status"}.
+
+        Returns:
+            {"result": ...} or {"error": message}
+        """
+        method = request.get("method")
+        params = request.get("params") or {}
+        if method == "ping":
+            return {"result": {"db_path": str(self.chroma.db_path), "pid": os.getpid()}}
+        if method == "status":
+            return {"result": self.status()}
+        if method not in SERVED_METHODS:
+            return {"error": f"Unknown method '{method}'"}
+
+        self._refresh(params.get("collection_name", DEFAULT_COLLECTION))
+        with self._lock.read():
+            result = getattr(self.chroma, method)(**params)
+        if method == 'query_collection_many':
+            return {"result": [_plain_results(results) for results in result]}
+        return {"result": _plain_results(result)}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Read JSON requests, one per line, and write one JSON response line each."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.service.handle(json.loads(line))
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class SearchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server for a SearchService, readable only by its user."""
+
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        """
+        Bind the socket at path.
+
+        Raises:
+            RuntimeError: If another daemon is already listening on path
+            PermissionError: If the socket's directory isn't private to
+                this user (see check_private_dir)
+        """
+        self.path = Path(path)
+        self.service = service
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        check_private_dir(self.path.parent)
+        if self.path.exists():
+            client = DaemonClient.connect_path(self.path)
+            if client is not None:
+                client.close()
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+            # Left behind by a daemon that didn't shut down cleanly
+            self.path.unlink()
+        super().__init__(str(self.path), _RequestHandler)
+        os.chmod(self.path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class DaemonClient:
+    """Client for a running `daimon serve`."""
+
+    def __init__(self, sock):
+        """Initialize client on a connected socket."""
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    @classmethod
+    def connect_path(cls, path, timeout=30.0):
+        """
+        Connect to the daemon listening on path.
+
+        Returns:
+            A DaemonClient, or None if no daemon is listening
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    @classmethod
+    def connect(cls, db_path, timeout=30.0):
+        """
+        Connect to the daemon serving db_path.
+
+        Returns:
+            A DaemonClient, or None if there is none or its socket isn't in
+            a directory private to this user
+        """
+        path = socket_path(db_path)
+        try:
+            check_private_dir(path.parent)
+        except OSError:
+            return None
+        return cls.connect_path(path, timeout)
+
+    def call(self, method, **params):
+        """
+        Call a method on the daemon.
+
+        Raises:
+            DaemonError: If the daemon reports an error or hangs up
+            OSError: If the connection fails
+        """
+        self._file.write(json.dumps({"method": method, "params": params}).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("Daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def close(self):
+        """Close the connection."""
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
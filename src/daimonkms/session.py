@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .config import Config
+from .config_loader import find_config_file
+from .factory import create_chroma_manager, create_chunker
+from .manifest import IndexManifest, MANIFEST_FILENAME
+from .scanner import KnowledgeBaseScanner, SNAPSHOT_FILENAME
+from .server import DEFAULT_COLLECTION, result_matches
+from .tags import normalize_tag
+
+
+@dataclass
+class SearchResult:
+    """One matching chunk."""
+
+    id: str
+    document: str
+    metadata: dict = field(default_factory=dict)
+    # Vector and hybrid searches report distance, lexical and hybrid score
+    distance: Optional[float] = None
+    score: Optional[float] = None
+
+    @property
+    def source_path(self):
+        """Path of the chunk's file relative to the knowledge base root."""
+        return self.metadata.get('source_path', self.metadata.get('source_file'))
+
+
+@dataclass
+class FileChange:
+    """What indexing or deleting did to one file."""
+
+    path: str
+    action: str
+    added: int = 0
+    kept: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+
+
+class Session:
+    """
+    Search and update a knowledge base from Python without per-call setup.
+
+    The database client, embedding function, collection handles and chunker
+    are created once and reused by every call; results come back as
+    SearchResult and FileChange objects instead of formatted text. Writes by
+    other processes (`daimon index`, `daimon watch`) are picked up on the
+    next search. A session is meant for one thread at a time; use
+    `daimon api` to serve many concurrent callers.
+    """
+
+    def __init__(self, config, db_path=None, collection=DEFAULT_COLLECTION):
+        """Initialize session from a Config, optionally overriding its database path."""
+        self.config = config
+        self.db_path = Path(db_path or config.chroma_db_path)
+        self.collection = collection
+        self.root = Path(config.knowledge_base_root)
+        self.chroma = create_chroma_manager(config, self.db_path)
+        self.chunker = create_chunker(config)
+        # Write revision of the collection as this session last saw it
+        self._revision = None
+
+    def _refresh(self):
+        """Reopen the database if another process wrote to the collection."""
+        revision = self.chroma.aliases.revision(self.chroma.aliases.resolve(self.collection))
+        if self._revision is not None and revision != self._revision:
+            self.chroma.reopen()
+        self._revision = revision
+
+    def _mark_current(self):
+        """Record the session's own writes as seen."""
+        self._revision = self.chroma.aliases.revision(self.chroma.aliases.resolve(self.collection))
+
+    def search(self, query, n_results=5, mode='vector', tags=None, where=None):
+        """
+        Search the collection.
+
+        mode and where are as in ChromaManager.query_collection; tags are
+        filters such as 'domain:mathematics' or a bare tag.
+
+        Returns:
+            List of SearchResult, best first
+
+        Raises:
+            ValueError: If mode or a tag filter is invalid
+        """
+        tags = [normalize_tag(tag) for tag in tags or []]
+        self._refresh()
+        results = self.chroma.query_collection(self.collection, query, n_results=n_results,
+                                               where=where, mode=mode, tags=tags)
+        return [SearchResult(**match) for match in result_matches(results)]
+
+    def search_many(self, queries, n_results=5, mode='vector', tags=None, where=None):
+        """
+        Search the collection for many queries.
+
+        Vector searches are embedded and run as one batch.
+
+        Returns:
+            List with a list of SearchResult per query, in query order
+
+        Raises:
+            ValueError: If mode or a tag filter is invalid
+        """
+        tags = [normalize_tag(tag) for tag in tags or []]
+        queries = list(queries)
+        self._refresh()
+        batch = self.chroma.query_collection_many(self.collection, queries, n_results=n_results,
+                                                  where=where, tags=tags, mode=mode)
+        return [[SearchResult(**match) for match in result_matches(results)] for results in batch]
+
+    def _resolve(self, paths):
+        """
+        Make paths absolute, relative ones being taken from the knowledge base root.
+
+        Raises:
+            ValueError: If a path is outside the knowledge base
+        """
+        resolved = []
+        for path in paths:
+            path = Path(path).expanduser()
+            path = (path if path.is_absolute() else self.root / path).resolve()
+            if path != self.root and self.root not in path.parents:
+                raise ValueError(f"{path} is not inside the knowledge base {self.root}")
+            resolved.append(path)
+        return resolved
+
+    def _apply(self, paths, remove):
+        """Index or remove paths, returning a FileChange per file touched."""
+        from .indexer import apply_path_changes
+
+        # Re-read the manifest, which `daimon index` may have rewritten
+        manifest = IndexManifest(self.db_path / MANIFEST_FILENAME)
+        changes = apply_path_changes(self.chroma, self.chunker, manifest, self.root,
+                                     self.collection, paths, remove=remove)
+        self._mark_current()
+        return [FileChange(key, action, *(counts or ()), error=error)
+                for key, action, counts, error in changes]
+
+    def index_paths(self, paths):
+        """
+        Index org files, or all org files below directories.
+
+        Paths may be absolute or relative to the knowledge base root. Files
+        whose content is unchanged since they were last indexed are skipped;
+        paths that no longer exist are removed from the index.
+
+        Returns:
+            List of FileChange for the files updated or removed
+
+        Raises:
+            ValueError: If a path is outside the knowledge base
+        """
+        files = []
+        directories = []
+        for path in self._resolve(paths):
+            (directories if path.is_dir() else files).append(path)
+        if directories:
+            scanner = KnowledgeBaseScanner(self.root,
+                                           snapshot_path=self.db_path / SNAPSHOT_FILENAME)
+            files.extend(org_file for org_file in scanner.iter_org_files()
+                         if any(directory == self.root or directory in org_file.parents
+                                for directory in directories))
+        return self._apply(files, remove=False)
+
+    def delete_paths(self, paths):
+        """
+        Remove files, or all indexed files below directories, from the index.
+
+        The files themselves are left alone; the next full `daimon index`
+        adds back any that still exist.
+
+        Returns:
+            List of FileChange for the files removed
+
+        Raises:
+            ValueError: If a path is outside the knowledge base
+        """
+        return self._apply(self._resolve(paths), remove=True)
+
+
+def open_session(config_path=None, db_path=None, collection=DEFAULT_COLLECTION):
+    """
+    Open a Session on a knowledge base.
+
+    config_path defaults to the discovered config file (see
+    find_config_file) and db_path to the config's chroma_db_path.
+
+    Raises:
+        FileNotFoundError: If no config file is given or found
+    """
+    config_path = config_path or find_config_file()
+    if config_path is None:
+        raise FileNotFoundError("No configuration file found; pass config_path")
+    return Session(Config(str(config_path)), db_path=db_path, collection=collection)
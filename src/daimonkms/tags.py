@@ -0,0 +1,71 @@
+# Filetags follow the convention #+filetags: :domain:form:granularity:, so
+# the first three tags of a file are also stored under these axis keys
+TAG_AXES = ('domain', 'form', 'granularity')
+
+# Every tag is also stored as a boolean metadata key with this prefix
+TAG_PREFIX = "tag:"
+
+
+def tag_metadata(filetags):
+    """Return the metadata keys stored for a file's tags."""
+    metadata = {TAG_PREFIX + tag: True for tag in filetags}
+    for axis, tag in zip(TAG_AXES, filetags):
+        metadata[axis] = tag
+    return metadata
+
+
+def tag_keys(metadata):
+    """
+    Return the normalized tag filters a chunk's metadata matches.
+
+    Returns:
+        List of 'tag:<name>' and '<axis>:<value>' strings
+    """
+    keys = [key for key, value in metadata.items() if key.startswith(TAG_PREFIX) and value is True]
+    keys.extend(f"{axis}:{metadata[axis]}" for axis in TAG_AXES if metadata.get(axis))
+    return keys
+
+
+def normalize_tag(spec):
+    """
+    Normalize a tag filter to 'tag:<name>' or '<axis>:<value>'.
+
+    'domain:mathematics' matches a tag in that position, a bare tag such as
+    'journal' (or '#journal') matches it in any position.
+
+    Raises:
+        ValueError: If the filter is empty or names an unknown axis
+    """
+    spec = spec.strip().lstrip('#')
+    axis, separator, value = spec.partition(':')
+    if not separator:
+        axis, value = TAG_PREFIX[:-1], axis
+    if not value:
+        raise ValueError(f"Empty tag filter '{spec}'")
+    if axis != TAG_PREFIX[:-1] and axis not in TAG_AXES:
+        raise ValueError(f"Unknown tag axis '{axis}', expected one of {TAG_AXES}")
+    return f"{axis}:{value}"
+
+
+def tag_where(tags):
+    """
+    Build a ChromaDB where filter matching every normalized tag filter.
+
+    Returns:
+        The filter, or None if tags is empty
+    """
+    clauses = []
+    for tag in tags:
+        axis, _, value = tag.partition(':')
+        clauses.append({tag: True} if axis == TAG_PREFIX[:-1] else {axis: value})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def combine_where(*filters):
+    """Combine ChromaDB where filters with $and, skipping None."""
+    filters = [where for where in filters if where]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {"$and": filters}
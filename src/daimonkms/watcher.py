@@ -0,0 +1,216 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from .scanner import KnowledgeBaseScanner
+
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher:
+    """Portable watcher that rescans the knowledge base at a fixed interval."""
+
+    def __init__(self, root_directory, interval=1.0, scanner=None):
+        """Initialize watcher and record the current state of the tree."""
+        self.root_directory = Path(root_directory)
+        self.interval = interval
+        # The scanner keeps its directory snapshot in memory between polls
+        self.scanner = scanner or KnowledgeBaseScanner(self.root_directory)
+        self._state = self._stat_files()
+        self._next_scan = time.monotonic() + interval
+
+    def _stat_files(self):
+        """Map every org file to its (size, mtime) pair."""
+        state = {}
+        for org_file in self.scanner.iter_org_files():
+            try:
+                stat = os.stat(org_file)
+            except OSError:
+                continue
+            state[org_file] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds and return the set of changed paths."""
+        wait = max(0.0, self._next_scan - time.monotonic())
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(wait)
+        self._next_scan = time.monotonic() + self.interval
+
+        new_state = self._stat_files()
+        changed = {path for path, info in new_state.items() if self._state.get(path) != info}
+        changed.update(path for path in self._state if path not in new_state)
+        self._state = new_state
+        return changed
+
+    def close(self):
+        """Release resources (nothing to do for polling)."""
+        pass
+
+
+class InotifyWatcher:
+    """Linux watcher built on inotify, watching every directory in the tree."""
+
+    def __init__(self, root_directory, scanner=None):
+        """
+        Initialize inotify and add a watch for each directory.
+
+        Raises:
+            OSError: If inotify is not available on this platform
+        """
+        self.root_directory = Path(root_directory)
+        self.scanner = scanner or KnowledgeBaseScanner(self.root_directory)
+
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._watches = {}
+        self._add_tree(self.root_directory)
+
+    def _relative(self, path):
+        """Return a path relative to the root as a posix string."""
+        return Path(path).relative_to(self.root_directory).as_posix()
+
+    def _add_watch(self, directory):
+        """Watch a single directory."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = Path(directory)
+
+    def _add_tree(self, directory):
+        """
+        Watch a directory and all of its non-ignored subdirectories.
+
+        Returns the org files already present, since they may have been
+        created before the watch was in place.
+        """
+        org_files = set()
+        for dirpath, dirnames, filenames in os.walk(directory):
+            if dirpath != str(self.root_directory):
+                if self.scanner.is_ignored(self._relative(dirpath), True):
+                    dirnames[:] = []
+                    continue
+            self._add_watch(dirpath)
+            for filename in filenames:
+                if filename.endswith('.org'):
+                    org_files.add(Path(dirpath, filename))
+        return org_files
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds and return the set of changed paths."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost - the root signals a full rescan
+                changed.add(self.root_directory)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            is_dir = bool(mask & IN_ISDIR)
+
+            if self.scanner.is_ignored(self._relative(path), is_dir):
+                continue
+
+            if is_dir:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._add_tree(path))
+                elif mask & (IN_MOVED_FROM | IN_DELETE):
+                    # Files inside a moved-away directory get no events of their own
+                    changed.add(path)
+            elif path.suffix == '.org':
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        """Close the inotify file descriptor."""
+        os.close(self._fd)
+
+
+def create_watcher(root_directory, interval=1.0, force_polling=False, scanner=None):
+    """Return an inotify watcher where available, otherwise a polling one."""
+    if not force_polling:
+        try:
+            return InotifyWatcher(root_directory, scanner=scanner)
+        except OSError:
+            pass
+    return PollingWatcher(root_directory, interval=interval, scanner=scanner)
+
+
+def debounced_batches(watcher, debounce=0.5, max_delay=5.0, should_stop=None):
+    """
+    Yield sets of changed paths once changes have settled.
+
+    A batch is emitted when no new change arrived for debounce seconds, or
+    after max_delay seconds of continuous changes, so a burst of editor saves
+    is handled once.
+    """
+    pending = set()
+    first_change = last_change = None
+
+    while should_stop is None or not should_stop():
+        paths = watcher.poll(debounce if pending else 1.0)
+        now = time.monotonic()
+
+        if paths:
+            if not pending:
+                first_change = now
+            pending.update(paths)
+            last_change = now
+
+        if pending and (now - last_change >= debounce or now - first_change >= max_delay):
+            yield pending
+            pending = set()
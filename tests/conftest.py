@@ -1,8 +1,11 @@
 import pytest
 import tempfile
 import os
+import hashlib
 from pathlib import Path
 
+from chromadb import EmbeddingFunction
+
 
 @pytest.fixture
 def temp_dir():
@@ -28,3 +31,67 @@ Some more content here.
 def sample_org_file():
     """Path to sample org file for testing."""
     return Path(__file__).parent / "fixtures" / "sample.org"
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Deterministic, offline embedding function for tests."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            digest = hashlib.sha256(text.encode('utf-8')).digest()
+            embeddings.append([byte / 255.0 for byte in digest[:16]])
+        return embeddings
+
+    @staticmethod
+    def name():
+        return "test-hash"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return HashEmbeddingFunction()
+
+
+@pytest.fixture
+def hash_embedding_function():
+    """Embedding function that needs no model download."""
+    return HashEmbeddingFunction()
+
+
+@pytest.fixture
+def kb_config(tmp_path, monkeypatch, hash_embedding_function):
+    """Config file pointing at a small temporary knowledge base."""
+    import json
+    kb_root = tmp_path / "kb"
+    (kb_root / "notes").mkdir(parents=True)
+    (kb_root / "alpha.org").write_text(
+        "#+TITLE: Alpha\n#+filetags: :mathematics:reference:sets:\n\n* Sets\nA set is a collection.\n")
+    (kb_root / "notes" / "beta.org").write_text(
+        "#+TITLE: Beta\n#+filetags: :cooking:journal:bread:\n\n* Bread\nKnead the dough.\n")
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({
+        "knowledge_base_root": str(kb_root),
+        "chroma_db_path": str(tmp_path / "db"),
+        "chunk_size": 1000,
+        "chunk_overlap": 200
+    }))
+
+    # Keep the embedding cache inside the test directory
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    # Keep every ChromaManager created by the CLI offline
+    import daimonkms.chroma_manager as chroma_manager
+    original_init = chroma_manager.ChromaManager.__init__
+
+    def offline_init(self, db_path, embedding_function=None, **kwargs):
+        original_init(self, db_path, embedding_function or hash_embedding_function, **kwargs)
+
+    monkeypatch.setattr(chroma_manager.ChromaManager, "__init__", offline_init)
+    return config_path
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from daimonkms import bench, cli
+from daimonkms.parser import OrgParser
+
+
+def test_generated_notes_are_deterministic_org(tmp_path):
+    """Test that generated notes parse with IDs, titles and axis filetags, and are reused."""
+    assert bench.generate_note(7, seed=1) == bench.generate_note(7, seed=1)
+    assert bench.generate_note(7, seed=1) != bench.generate_note(7, seed=2)
+
+    root = tmp_path / "kb"
+    assert bench.generate_kb(root, 250) is True
+    assert bench.generate_kb(root, 250) is False
+    paths = sorted(root.rglob("*.org"))
+    assert len(paths) == 250 and paths[-1] == root / "0000" / "02" / "note-0000249.org"
+
+    documents = [OrgParser(path).parse() for path in paths]
+    assert all(len(document.id) == 32 and document.title for document in documents)
+    assert {document.filetags[2] for document in documents} == set(bench.GRANULARITIES)
+    assert any(":PROPERTIES:" in path.read_text().split("* ", 1)[-1] for path in paths)
+    assert not any(":PROPERTIES:" in document.body for document in documents)
+    with pytest.raises(ValueError):
+        bench.generate_kb(root, 0)
+
+
+def test_deterministic_embedder_is_normalized():
+    """Test that the stand-in embedder is repeatable and puts shared words close."""
+    embed = bench.DeterministicEmbeddingFunction(dimensions=64)
+    dough, bread, sets = embed(["knead the dough", "knead the bread dough", "a set of sets"])
+    assert len(dough) == 64 and abs(float(dough @ dough) - 1.0) < 1e-6
+    assert (embed(["knead the dough"])[0] == dough).all()
+    assert float(dough @ bread) > float(dough @ sets)
+
+
+def test_bench_command_times_every_stage(tmp_path):
+    """Test that bench writes per-stage results as JSON."""
+    output_path = tmp_path / "results.json"
+    result = cli.bench_command([20, 40], output_path, work_dir=tmp_path / "work")
+    assert "40 files: generated" in result
+
+    results = json.loads(output_path.read_text())
+    assert results["environment"]["daimonkms"] and results["settings"]["seed"] == 0
+    assert [run["files"] for run in results["runs"]] == [20, 40]
+    for run in results["runs"]:
+        assert list(run["stages"]) == list(bench.STAGES)
+        assert run["stages"]["embed"]["items"] == run["stages"]["store"]["items"] == run["chunks"] > 0
+    assert not (tmp_path / "work" / "db-20").exists()
+
+    result = cli.bench_command([20], output_path, work_dir=tmp_path / "work")
+    assert "20 files: reused" in result
@@ -0,0 +1,107 @@
+import pytest
+
+from daimonkms.chunking import ChunkingEngine
+
+
+STRUCTURED_TEXT = (
+    "* Overview\n\n"
+    "First paragraph about the topic. It has two sentences.\n\n"
+    "Second paragraph with more detail on the same topic.\n\n"
+    "** Details\n"
+    "*** Part one\n"
+    "Text that belongs to part one. More text follows here.\n\n"
+    "*** Part two\n"
+    "Text that belongs to part two."
+)
+
+
+def test_structured_chunks_snap_to_boundaries():
+    """Test that structured chunks fit the size and start at headings or paragraphs."""
+    chunker = ChunkingEngine(chunk_size=120, chunk_overlap=20, mode='structured')
+    chunks = chunker.chunk_content(STRUCTURED_TEXT)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    for chunk in chunks:
+        assert chunk[0] == '*' or chunk[0].isupper(), f"Chunk starts mid-sentence: {chunk!r}"
+        assert chunk[-1] in '.!?', f"Chunk ends mid-sentence: {chunk!r}"
+    # A heading is never left dangling at the end of a chunk
+    for chunk in chunks:
+        assert not chunk.splitlines()[-1].startswith('*'), f"Chunk ends with a heading: {chunk!r}"
+
+
+def test_structured_chunks_do_not_overlap_whole_units():
+    """Test that packing whole units stores no duplicated text."""
+    chunker = ChunkingEngine(chunk_size=120, chunk_overlap=20, mode='structured')
+    chunks = chunker.chunk_content(STRUCTURED_TEXT)
+    assert sum(len(chunk) for chunk in chunks) <= len(STRUCTURED_TEXT)
+
+
+def test_structured_splits_oversized_unit_with_overlap():
+    """Test that a unit longer than chunk_size is split between words with overlap."""
+    words = ' '.join(f"word{i}" for i in range(100))
+    chunker = ChunkingEngine(chunk_size=100, chunk_overlap=20, mode='structured')
+    chunks = chunker.chunk_content(words)
+
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.split()[0] in words.split() for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) > len(words)
+    assert ' '.join(chunks).split()[-1] == "word99"
+
+
+def test_unknown_chunking_mode_raises():
+    """Test that an unknown mode is rejected."""
+    with pytest.raises(ValueError):
+        ChunkingEngine(mode='semantic')
+
+
+@pytest.mark.parametrize("mode", ["fixed", "structured"])
+def test_iter_spans_matches_chunk_content(mode):
+    """Test that spans are lazy offsets reproducing chunk_content."""
+    chunker = ChunkingEngine(chunk_size=60, chunk_overlap=10, mode=mode)
+    spans = chunker.iter_spans(STRUCTURED_TEXT)
+    assert not isinstance(spans, list)
+    assert [STRUCTURED_TEXT[start:end] for start, end in spans] == chunker.chunk_content(STRUCTURED_TEXT)
+
+
+def test_token_chunks_fill_budget_with_fallback_tokenizer():
+    """Test that token chunks hold exactly chunk_size tokens, except the last."""
+    text = ' '.join(f"word{i}." for i in range(50))
+    chunker = ChunkingEngine(chunk_size=10, chunk_overlap=2, mode='tokens')
+    chunker._tokenizer = False  # force the pure-Python approximation
+    chunks = chunker.chunk_content(text)
+
+    counts = [chunker.count_tokens(chunk) for chunk in chunks]
+    assert all(count == 10 for count in counts[:-1])
+    assert 0 < counts[-1] <= 10
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word49.")
+    assert chunker.token_offsets(text) is chunker.token_offsets(text), "Offsets should be cached"
+
+
+def test_token_chunks_use_tokenizer_file(tmp_path):
+    """Test that a tokenizer.json is used when available."""
+    tokenizers = pytest.importorskip("tokenizers")
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    tokenizer = tokenizers.Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer_path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(tokenizer_path))
+
+    chunker = ChunkingEngine(chunk_size=4, chunk_overlap=0, mode='tokens',
+                             tokenizer_path=tokenizer_path)
+    assert chunker.tokenizer is not False
+    # Whitespace pre-tokenization keeps "extraordinarily" whole, unlike the fallback
+    assert chunker.chunk_content("a b c d extraordinarily long words here") == \
+        ["a b c d", "extraordinarily long words here"]
+
+    # Room is left for the special tokens added around each chunk when embedding
+    from tokenizers.processors import TemplateProcessing
+    tokenizer.post_processor = TemplateProcessing(single="[CLS] $A [SEP]",
+                                                  special_tokens=[("[CLS]", 0), ("[SEP]", 0)])
+    tokenizer.save(str(tokenizer_path))
+    chunker = ChunkingEngine(chunk_size=4, chunk_overlap=0, mode='tokens',
+                             tokenizer_path=tokenizer_path)
+    assert chunker.token_budget == 2
+    assert chunker.chunk_content("a b c d e") == ["a b", "c d", "e"]
@@ -0,0 +1,83 @@
+import json
+
+from daimonkms import cli
+from daimonkms.chroma_manager import ChromaManager
+from daimonkms.docstore import DocumentStore, DOCSTORE_FILENAME
+
+
+def test_document_store_dedupes_and_collects_garbage(tmp_path):
+    """Test that bodies are stored once per content and dropped when unused."""
+    store = DocumentStore(tmp_path / DOCSTORE_FILENAME)
+    store.put("kb", "a.org", "same body")
+    store.put("kb", "b.org", "same body")
+    assert store._db.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 1
+
+    store.put("kb", "a.org", "new body")
+    store.remove("kb", "b.org")
+    assert store.get("kb", "a.org") == "new body"
+    assert store.get("kb", "b.org") is None
+    assert store._db.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 1
+
+    metadata = {"source_path": "a.org", "chunk_start": 4, "chunk_end": 8}
+    assert store.chunk_text("kb", metadata) == "body"
+    assert store.chunk_text("kb", {"source_path": "a.org"}) is None
+
+    # A body shared with another collection outlives this one's copy
+    store.put("other", "a.org", "new body")
+    store.clear("kb")
+    assert store.get("other", "a.org") == "new body"
+    store.remove("other", "a.org")
+    store.remove("other", "a.org")
+    assert store._db.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 0
+
+
+def test_search_rebuilds_text_from_document_store(kb_config):
+    """Test that chunks are stored without text and rebuilt for search."""
+    config = json.loads(kb_config.read_text())
+    config.update({"document_store": True, "chunk_size": 20, "chunk_overlap": 10})
+    kb_config.write_text(json.dumps(config))
+    cli.index_command(str(kb_config))
+
+    chroma = ChromaManager(config["chroma_db_path"])
+    stored = chroma.create_collection("knowledge_base").get()
+    assert stored["ids"] and all(document is None for document in stored["documents"])
+
+    result = cli.search_command("dough", str(kb_config), results=10)
+    assert "Knead the do" in result and "ead the dough." in result
+
+
+def test_bodies_change_with_their_chunks(kb_config):
+    """Test that a file's body is replaced when its chunks are written, and dropped with them."""
+    from pathlib import Path
+    from daimonkms.config import Config
+    from daimonkms.indexer import create_index_pipeline, iter_index_jobs
+    from daimonkms.manifest import IndexManifest, MANIFEST_FILENAME
+
+    config = json.loads(kb_config.read_text())
+    config.update({"document_store": True, "chunk_size": 20, "chunk_overlap": 10})
+    kb_config.write_text(json.dumps(config))
+    cli.index_command(str(kb_config))
+
+    kb_root = Path(config["knowledge_base_root"])
+    db_path = Path(config["chroma_db_path"])
+    chroma = cli.create_chroma_manager(Config(str(kb_config)), db_path)
+    manifest = IndexManifest(db_path / MANIFEST_FILENAME)
+    old_body = chroma.document_store.get(chroma.aliases.resolve("knowledge_base"), "alpha.org")
+    alpha = kb_root / "alpha.org"
+    alpha.write_text("#+TITLE: Alpha\n\n* Intro\nFirst.\n* Sets\nA set is a collection.\n")
+
+    writer = chroma.bulk_writer("knowledge_base", batch_size=1000)
+    pipeline = create_index_pipeline(chroma, cli.create_chunker(Config(str(kb_config))), manifest,
+                                     kb_root, writer)
+    assert len(list(pipeline.run(iter_index_jobs([alpha], kb_root, set())))) == 1
+    physical_name = chroma.aliases.resolve("knowledge_base")
+    assert chroma.document_store.get(physical_name, "alpha.org") == old_body
+    writer.flush()
+    assert chroma.document_store.get(physical_name, "alpha.org").startswith("* Intro")
+    manifest.save()
+    result = cli.search_command("collection", str(kb_config), results=10)
+    assert "A set is a collect" in result and "First." in result
+
+    alpha.write_text("#+TITLE: Alpha\n")
+    cli.index_command(str(kb_config))
+    assert chroma.document_store.get(physical_name, "alpha.org") is None
@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+
+from daimonkms.chroma_manager import ChromaManager
+from daimonkms.embedding_cache import EmbeddingCache
+
+
+def test_cache_round_trip_and_persistence(tmp_path):
+    """Test that cached embeddings survive reopening the cache."""
+    cache = EmbeddingCache(tmp_path, "model-a")
+    cache.put_many(["alpha", "beta"], [[1.0, 2.0], [3.0, 4.0]])
+    cache.close()
+
+    cache = EmbeddingCache(tmp_path, "model-a")
+    hits = cache.get_many(["beta", "gamma", "alpha"])
+    assert hits[0].tolist() == [3.0, 4.0]
+    assert hits[1] is None
+    assert hits[2].tolist() == [1.0, 2.0]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Different models never share entries
+    assert EmbeddingCache(tmp_path, "model-b").get_many(["alpha"]) == [None]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the size cap evicts the oldest entries and reuses their rows."""
+    cache = EmbeddingCache(tmp_path, "model", max_entries=2)
+    cache.put_many(["one"], [[1.0]])
+    cache.put_many(["two"], [[2.0]])
+    cache.get_many(["one"])
+    cache.put_many(["three"], [[3.0]])
+
+    assert len(cache) == 2
+    assert cache.get_many(["two"]) == [None]
+    assert [v.tolist() for v in cache.get_many(["one", "three"])] == [[1.0], [3.0]]
+    # Rows hold the 32-byte key and the vector
+    assert (tmp_path / "model" / "entries.bin").stat().st_size == EmbeddingCache.INITIAL_CAPACITY * 36
+
+
+def test_cache_lookups_do_not_write(tmp_path):
+    """Test that hits record recency in memory and write it in batches."""
+    cache = EmbeddingCache(tmp_path, "model")
+    cache.put_many(["one"], [[1.0]])
+    changes = cache._db.total_changes
+    for _ in range(10):
+        assert cache.get_many(["one"])[0].tolist() == [1.0]
+    assert cache._db.total_changes == changes
+
+    cache.RECENCY_BATCH = 1
+    cache.get_many(["one"])
+    assert cache._db.total_changes > changes
+
+
+def test_reused_slot_reads_as_miss(tmp_path):
+    """Test that a row reused by another process isn't returned for the old key."""
+    cache = EmbeddingCache(tmp_path, "model", max_entries=1)
+    other = EmbeddingCache(tmp_path, "model", max_entries=1)
+    cache.put_many(["one"], [[1.0]])
+    slot = cache._db.execute("SELECT slot FROM entries").fetchone()[0]
+
+    # The other process evicts "one" and writes "two" into its row
+    other.put_many(["two"], [[2.0]])
+    other.put_many(["three"], [[3.0]])
+    assert other._db.execute("SELECT slot FROM entries").fetchone()[0] == slot
+    matrix = cache._open_matrix(slot + 1)
+    assert cache._read(matrix, slot, cache._key("one")) is None
+    assert cache._read(matrix, slot, cache._key("three")).tolist() == [3.0]
+
+
+def test_chroma_manager_embeds_only_cache_misses(tmp_path, hash_embedding_function):
+    """Test that ChromaManager.embed skips texts already in the cache."""
+    calls = []
+
+    def counting_embedding_function(texts):
+        calls.append(list(texts))
+        return hash_embedding_function(texts)
+
+    chroma = ChromaManager(tmp_path / "db", embedding_function=counting_embedding_function,
+                           embedding_cache_dir=tmp_path / "cache")
+    first = chroma.embed(["a", "b"])
+    second = ChromaManager(tmp_path / "other-db", embedding_function=counting_embedding_function,
+                           embedding_cache_dir=tmp_path / "cache").embed(["b", "c", "a"])
+
+    assert calls == [["a", "b"], ["c"]]
+    assert np.allclose(second[0], first[1]) and np.allclose(second[2], first[0])
+
+    # Queries are embedded without touching the chunk cache
+    chroma.embed_queries(["d"])
+    assert calls[-1] == ["d"] and len(chroma.embedding_cache) == 3
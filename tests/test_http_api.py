@@ -0,0 +1,158 @@
+import asyncio
+import http.client
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from daimonkms import cli
+from daimonkms.config import Config
+from daimonkms.http_api import SearchAPI, load_test
+from daimonkms.server import SearchService
+
+
+@pytest.fixture
+def api(kb_config):
+    """An API serving the indexed test knowledge base on a free port."""
+    cli.index_command(str(kb_config))
+    config = Config(str(kb_config))
+    service = SearchService(cli.create_chroma_manager(config, config.chroma_db_path))
+    api = SearchAPI(service, reindex_args=[sys.executable, "-c", "print('Indexing complete!')"],
+                    max_workers=4)
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(api.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    api.port = server.sockets[0].getsockname()[1]
+    api.loop = loop
+    yield api
+
+    async def shutdown():
+        # Let handlers of connections the tests closed see EOF and finish
+        server.close()
+        await server.wait_closed()
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    api.close()
+
+
+def request(api, method, path, payload=None, headers=None):
+    """Send one request and return (status, decoded JSON)."""
+    connection = http.client.HTTPConnection("127.0.0.1", api.port, timeout=30)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body=body,
+                           headers=headers if headers is not None else {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_search_endpoints_return_structured_results(api):
+    """Test search, batch search and validation errors."""
+    status, body = request(api, "POST", "/search", {"query": "the dough", "mode": "hybrid",
+                                                    "tags": ["form:journal"]})
+    assert status == 200
+    assert [match["metadata"]["source_path"] for match in body["results"]] == ["notes/beta.org"]
+    assert body["results"][0]["document"] == "* Bread\nKnead the dough."
+
+    status, body = request(api, "POST", "/search/batch", {"queries": ["dough", "sets"], "n_results": 1})
+    assert status == 200 and [item["query"] for item in body["results"]] == ["dough", "sets"]
+    status, body = request(api, "POST", "/search/batch", {"queries": ["dough"], "mode": "lexical"})
+    assert body["results"][0]["results"][0]["metadata"]["source_path"] == "notes/beta.org"
+
+    assert request(api, "POST", "/search", {"query": ""})[0] == 400
+    assert request(api, "POST", "/search", {"query": "x", "tags": ["topic:x"]})[0] == 400
+    assert request(api, "GET", "/search")[0] == 405
+    assert request(api, "GET", "/nowhere")[0] == 404
+
+
+def test_browser_style_requests_are_refused(api):
+    """Test that foreign Host or Origin headers and non-JSON POST bodies are rejected."""
+    json_type = {"Content-Type": "application/json"}
+    assert request(api, "GET", "/status", headers={"Host": "attacker.example"})[0] == 403
+    rebound = {"Host": "attacker.example:8765", **json_type}
+    assert request(api, "POST", "/index", {}, headers=rebound)[0] == 403
+    cross_site = {"Origin": "http://attacker.example", **json_type}
+    assert request(api, "POST", "/index", {}, headers=cross_site)[0] == 403
+    assert request(api, "POST", "/index", {}, headers={"Content-Type": "text/plain"})[0] == 415
+    assert request(api, "POST", "/search", {"query": "dough"}, headers={})[0] == 415
+    assert api.index_state["started"] is None
+
+    for host in (f"localhost:{api.port}", "[::1]", "127.0.0.1"):
+        assert request(api, "GET", "/status", headers={"Host": host})[0] == 200
+    status, _ = request(api, "POST", "/search", {"query": "dough"},
+                        headers={"Origin": f"http://localhost:{api.port}",
+                                 "Content-Type": "application/json; charset=utf-8"})
+    assert status == 200
+
+
+def test_handler_failures_return_500(api):
+    """Test that an unexpected error answers 500 with JSON and keeps the API serving."""
+    handle = api.service.handle
+
+    def failing_handle(request):
+        raise RuntimeError("collection vanished")
+
+    api.service.handle = failing_handle
+    status, body = request(api, "POST", "/search", {"query": "dough"})
+    assert status == 500 and body == {"error": "RuntimeError: collection vanished"}
+
+    api.service.handle = handle
+    assert request(api, "POST", "/search", {"query": "dough"})[0] == 200
+
+
+def test_status_and_reindex(api):
+    """Test that /index runs one reindex at a time and /status reports it."""
+    status, body = request(api, "POST", "/index", {"full": True})
+    assert status == 202 and body["full"] is True
+
+    deadline = time.time() + 30
+    while True:
+        status, body = request(api, "GET", "/status")
+        if not body["index"]["running"] or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert status == 200
+    assert body["index"]["returncode"] == 0
+    assert body["index"]["output"] == ["Indexing complete!"]
+    assert [collection["alias"] for collection in body["collections"]] == ["knowledge_base"]
+
+
+def test_identical_concurrent_calls_are_coalesced(api):
+    """Test that concurrent identical searches share one service call."""
+    calls = []
+    handle = api.service.handle
+
+    def slow_handle(request):
+        calls.append(request)
+        time.sleep(0.2)
+        return handle(request)
+
+    api.service.handle = slow_handle
+
+    async def search_many():
+        return await asyncio.gather(*(api.call("query_collection", collection_name="knowledge_base",
+                                               query_text="dough") for _ in range(10)))
+
+    results = asyncio.run_coroutine_threadsafe(search_many(), api.loop).result(timeout=30)
+    assert len(calls) == 1 and len(results) == 10
+    assert api.counters["coalesced"] == 9
+
+
+def test_load_test_with_concurrent_clients(api):
+    """Test that 50 concurrent keep-alive clients are all served."""
+    stats = asyncio.run(load_test("127.0.0.1", api.port, ["dough", "sets", "bread"], clients=50,
+                                  duration=0.5))
+    assert stats["errors"] == 0 and stats["requests"] >= 50
+    assert stats["requests_per_second"] > 0 and stats["p95_ms"] is not None
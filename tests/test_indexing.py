@@ -0,0 +1,296 @@
+import pytest
+from pathlib import Path
+
+from daimonkms import cli
+from daimonkms.chroma_manager import ChromaManager
+from daimonkms.manifest import IndexManifest, MANIFEST_FILENAME
+
+
+def _collection_paths(config_path):
+    """Return the source paths currently stored in the knowledge_base collection."""
+    import json
+    db_path = json.loads(Path(config_path).read_text())["chroma_db_path"]
+    collection = ChromaManager(db_path).create_collection("knowledge_base")
+    return sorted(m["source_path"] for m in collection.get()["metadatas"])
+
+
+def test_manifest_check_file_skips_unchanged_and_touched_files(tmp_path):
+    """Test that IndexManifest.check_file only reports files whose content changed."""
+    import os
+    root = tmp_path / "kb"
+    root.mkdir()
+    a = root / "a.org"
+    a.write_text("first")
+
+    manifest = IndexManifest(tmp_path / MANIFEST_FILENAME)
+    entry = manifest.check_file(root, a)
+    assert entry is not None
+    manifest.update("a.org", entry)
+    assert manifest.check_file(root, a) is None
+
+    os.utime(a, (1, 1))
+    assert manifest.check_file(root, a) is None
+    a.write_text("first, edited")
+    assert manifest.check_file(root, a) is not None
+
+
+def test_index_is_incremental(kb_config):
+    """Test that a second index run only touches changed and removed files."""
+    result = cli.index_command(str(kb_config))
+    assert "Creating/clearing collection: knowledge_base" in result
+    assert _collection_paths(kb_config) == ["alpha.org", "notes/beta.org"]
+
+    result = cli.index_command(str(kb_config))
+    assert "0 new or changed, 0 removed, 2 unchanged" in result
+
+    kb_root = kb_config.parent / "kb"
+    (kb_root / "notes" / "beta.org").unlink()
+    (kb_root / "gamma.org").write_text("#+TITLE: Gamma\n\nNew note.\n")
+    result = cli.index_command(str(kb_config))
+    assert "1 new or changed, 1 removed, 1 unchanged" in result
+    assert _collection_paths(kb_config) == ["alpha.org", "gamma.org"]
+
+
+def test_index_full_rebuilds(kb_config):
+    """Test that --full clears the collection even when a manifest exists."""
+    cli.index_command(str(kb_config))
+    result = cli.index_command(str(kb_config), full=True)
+    assert "Creating/clearing collection: knowledge_base" in result
+    assert _collection_paths(kb_config) == ["alpha.org", "notes/beta.org"]
+
+
+def test_update_paths_reindexes_only_given_paths(kb_config):
+    """Test that update_paths handles edits and moved-away directories."""
+    import json
+    from daimonkms.chunking import ChunkingEngine
+    from daimonkms.indexer import update_paths
+
+    cli.index_command(str(kb_config))
+    settings = json.loads(kb_config.read_text())
+    kb_root = Path(settings["knowledge_base_root"])
+    chroma = ChromaManager(settings["chroma_db_path"])
+    manifest = IndexManifest(Path(settings["chroma_db_path"]) / MANIFEST_FILENAME)
+
+    (kb_root / "alpha.org").write_text("#+TITLE: Alpha\n\nRewritten.\n")
+    (kb_root / "notes").rename(kb_root.parent / "moved-away")
+    messages = update_paths(chroma, ChunkingEngine(), manifest, kb_root, "knowledge_base",
+                            [kb_root / "alpha.org", kb_root / "notes"])
+
+    assert messages == ["Updated alpha.org: 1 chunks added, 0 unchanged, 1 removed",
+                        "Removed chunks for deleted file notes/beta.org"]
+    assert _collection_paths(kb_config) == ["alpha.org"]
+
+
+def test_parse_and_chunk_many_matches_sequential(tmp_path):
+    """Test that process-pool parsing returns the same results in order."""
+    from daimonkms.chunking import ChunkingEngine
+    from daimonkms.indexer import parse_and_chunk_many
+
+    paths = []
+    for i in range(12):
+        path = tmp_path / f"note{i}.org"
+        path.write_text(f"#+TITLE: Note {i}\n\n" + f"Paragraph {i}. " * (i * 20))
+        paths.append(path)
+    paths.append(tmp_path / "missing.org")
+
+    chunker = ChunkingEngine(chunk_size=100, chunk_overlap=20)
+    sequential = list(parse_and_chunk_many(paths, chunker, workers=1))
+    parallel = list(parse_and_chunk_many(paths, chunker, workers=2, batch_size=3))
+
+    assert [d.title for d, _, _ in parallel[:-1]] == [f"Note {i}" for i in range(12)]
+    assert [c for _, c, _ in parallel] == [c for _, c, _ in sequential]
+    assert parallel[0][1] == [], "Empty body should produce no chunks"
+    assert parallel[-1][2] is not None, "Errors should be reported, not raised"
+
+
+def test_index_parses_batches_in_worker_processes(kb_config):
+    """Test that indexing with parse workers gives the same index as in-process parsing."""
+    result = cli.index_command(str(kb_config), workers=2, progress=False)
+    assert "Stored 2 total chunks" in result and "parse: 2 items" in result
+    assert _collection_paths(kb_config) == ["alpha.org", "notes/beta.org"]
+
+    (kb_config.parent / "kb" / "alpha.org").write_text("#+TITLE: Alpha\n\nRewritten.\n")
+    result = cli.index_command(str(kb_config), workers=2, progress=False)
+    assert "Changes: 1 new or changed, 0 removed, 1 unchanged" in result
+    assert "Rewritten." in cli.search_command("rewritten", str(kb_config), results=1, mode="lexical")
+
+
+def test_index_leaves_collection_alone_when_kb_is_empty(kb_config):
+    """Test that an empty knowledge base without a manifest doesn't rebuild the collection."""
+    import json
+    import shutil
+    cli.index_command(str(kb_config))
+    db_path = Path(json.loads(kb_config.read_text())["chroma_db_path"])
+    (db_path / MANIFEST_FILENAME).unlink()
+    shutil.rmtree(kb_config.parent / "kb")
+    (kb_config.parent / "kb").mkdir()
+
+    result = cli.index_command(str(kb_config))
+    assert "No org files found" in result and "Creating/clearing" not in result
+    assert ChromaManager(db_path).aliases.resolve("knowledge_base") == "knowledge_base__g1"
+
+
+def test_bulk_writer_batches_across_files(tmp_path, hash_embedding_function):
+    """Test that BulkWriter buffers chunks from several files into few writes."""
+    chroma = ChromaManager(tmp_path / "db", embedding_function=hash_embedding_function)
+    flushed = []
+    with chroma.bulk_writer("bulk_test", batch_size=5) as writer:
+        for i in range(4):
+            writer.add([f"chunk {i}-a", f"chunk {i}-b"], f"file{i}", {"filetags": []},
+                       source_path=f"file{i}.org", on_flushed=lambda i=i: flushed.append(i))
+        assert writer.flush_count == 1, "Should have flushed once the batch filled up"
+        assert flushed == [0, 1, 2]
+
+    assert writer.flush_count == 2
+    assert flushed == [0, 1, 2, 3]
+    assert chroma.get_collection("bulk_test").count() == 8
+
+
+def test_reindex_writes_only_changed_chunks(tmp_path, hash_embedding_function):
+    """Test that chunk IDs are stable and re-indexing diffs at chunk level."""
+    chroma = ChromaManager(tmp_path / "db", embedding_function=hash_embedding_function)
+    headers = {"title": "Notes", "filetags": []}
+
+    added = chroma.sync_file_chunks("diff_test", ["one", "two", "three"], "notes", headers, "a/notes.org")
+    chroma.sync_file_chunks("diff_test", ["one"], "notes", headers, "b/notes.org")
+    assert added == (3, 0, 0)
+
+    # Insert a chunk at the front and drop one at the end
+    result = chroma.sync_file_chunks("diff_test", ["zero", "one", "two"], "notes", headers, "a/notes.org")
+    assert result == (1, 2, 1)
+
+    collection = chroma.get_collection("diff_test")
+    stored = collection.get(where={"source_path": "a/notes.org"})
+    by_index = sorted(zip((m["chunk_index"] for m in stored["metadatas"]), stored["documents"]))
+    assert by_index == [(0, "zero"), (1, "one"), (2, "two")]
+    assert collection.count() == 4, "Same-named files in other directories must not collide"
+    assert ChromaManager.chunk_id("a/notes.org", "one") in stored["ids"]
+
+
+def test_index_stores_chunk_offsets(kb_config):
+    """Test that chunk metadata maps each chunk back to its body offsets."""
+    from daimonkms.parser import OrgParser
+    cli.index_command(str(kb_config))
+
+    import json
+    db_path = json.loads(Path(kb_config).read_text())["chroma_db_path"]
+    stored = ChromaManager(db_path).create_collection("knowledge_base").get()
+    body = OrgParser(kb_config.parent / "kb" / "alpha.org").parse().body
+    for document, metadata in zip(stored["documents"], stored["metadatas"]):
+        if metadata["source_path"] == "alpha.org":
+            assert body[metadata["chunk_start"]:metadata["chunk_end"]] == document
+
+
+def test_full_rebuild_swaps_generations(kb_config):
+    """Test that a rebuild fills a shadow generation, then switches and drops the old one."""
+    import json
+    db_path = json.loads(Path(kb_config).read_text())["chroma_db_path"]
+    cli.index_command(str(kb_config))
+    chroma = ChromaManager(db_path)
+    first = chroma.aliases.resolve("knowledge_base")
+    assert first == "knowledge_base__g1"
+
+    # Readers keep seeing the live generation while the shadow is built
+    shadow = chroma.begin_rebuild("knowledge_base")
+    assert shadow == "knowledge_base__g2"
+    assert chroma.get_collection("knowledge_base").count() > 0
+    chroma.abort_rebuild(shadow)
+
+    result = cli.index_command(str(kb_config), full=True)
+    assert "Switched knowledge_base to knowledge_base__g2 (removed knowledge_base__g1)" in result
+    names = sorted(collection.name for collection in chroma.client.list_collections())
+    assert names == ["knowledge_base__g2"]
+    assert _collection_paths(kb_config) == ["alpha.org", "notes/beta.org"]
+    assert "knowledge_base -> knowledge_base__g2" in cli.status_command(str(kb_config))
+    assert chroma.aliases.revision("knowledge_base__g1") == 0
+
+
+def test_revisions_bumped_once_per_run_without_lost_updates(kb_config, tmp_path):
+    """Test that an index run bumps the revision once and concurrent writers don't collide."""
+    import json
+    import threading
+    from daimonkms.aliases import CollectionAliases
+
+    db_path = json.loads(Path(kb_config).read_text())["chroma_db_path"]
+    cli.index_command(str(kb_config))
+    chroma = ChromaManager(db_path)
+    live = chroma.aliases.resolve("knowledge_base")
+    before = chroma.aliases.revision(live)
+    (kb_config.parent / "kb" / "alpha.org").write_text("#+TITLE: Alpha\n\nRewritten.\n")
+    (kb_config.parent / "kb" / "notes" / "beta.org").unlink()
+    cli.index_command(str(kb_config))
+    assert chroma.aliases.revision(live) == before + 1
+
+    path = tmp_path / "aliases.json"
+
+    def bump():
+        aliases = CollectionAliases(path)
+        for _ in range(20):
+            aliases.bump_revision("kb")
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert CollectionAliases(path).revision("kb") == 80
+
+
+def test_failed_rebuild_keeps_live_generation(kb_config, monkeypatch):
+    """Test that an interrupted rebuild leaves the previous index in place."""
+    cli.index_command(str(kb_config))
+
+    def fail(self, *args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("daimonkms.pipeline.Pipeline.run", fail)
+    with pytest.raises(KeyboardInterrupt):
+        cli.index_command(str(kb_config), full=True)
+    assert _collection_paths(kb_config) == ["alpha.org", "notes/beta.org"]
+
+
+def test_index_jsonl_streams_file_events(kb_config, capsys):
+    """Test that --jsonl prints a timed event per file and only summaries are kept."""
+    import json
+    result = cli.index_command(str(kb_config), jsonl=True, progress=False)
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    files = [event for event in events if event["event"] == "file"]
+    assert sorted(event["path"] for event in files) == ["alpha.org", "notes/beta.org"]
+    assert all(event["status"] == "indexed" and event["chunks"] == 1 for event in files)
+    assert all({"parse", "chunk", "embed", "store"} <= set(event["timings_ms"]) for event in files)
+    assert events[-1]["event"] == "done" and events[-1]["chunks"] == 2
+
+    # The returned summary leaves out per-file events
+    assert '"event": "file"' not in result and '"event": "done"' in result
+    (kb_config.parent / "kb" / "alpha.org").write_text("#+TITLE: Alpha\n\nRewritten.\n")
+    result = cli.index_command(str(kb_config), progress=False)
+    assert "Processing 1: alpha.org" in capsys.readouterr().out
+    assert "Processing" not in result and "1 new or changed" in result
+
+
+def test_incremental_index_counts_shifted_chunks_as_stored(kb_config, capsys):
+    """Test that chunks rewritten because their offsets moved are reported as stored."""
+    import json
+    config = json.loads(kb_config.read_text())
+    config.update(chunking_mode="structured", chunk_size=60, chunk_overlap=0)
+    kb_config.write_text(json.dumps(config))
+    alpha = kb_config.parent / "kb" / "alpha.org"
+    sections = "".join(f"* Section {i}\nBody of section number {i} here.\n" for i in range(4))
+    alpha.write_text("#+TITLE: Alpha\n\n" + sections)
+    cli.index_command(str(kb_config), progress=False)
+
+    def file_event(text):
+        alpha.write_text("#+TITLE: Alpha\n\n" + text)
+        capsys.readouterr()
+        cli.index_command(str(kb_config), jsonl=True, progress=False)
+        events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        return next(event for event in events if event["event"] == "file")
+
+    # Appending leaves earlier offsets alone
+    event = file_event(sections + "* Outro\nA new last section.\n")
+    assert (event["chunks"], event["kept"]) == (1, 4)
+
+    # Inserting at the top shifts every later chunk, so all of them are rewritten
+    event = file_event("* Intro\nA new first section.\n" + sections + "* Outro\nA new last section.\n")
+    assert (event["chunks"], event["kept"]) == (6, 0)
@@ -0,0 +1,108 @@
+
+from daimonkms import cli
+from daimonkms.lexical import LexicalIndex, tokenize
+
+
+def test_bm25_ranks_rare_terms_and_tracks_removals(tmp_path):
+    """Test BM25 ranking, staging and recompilation after removals."""
+    index = LexicalIndex(tmp_path / "lexical")
+    index.add("notes", ["a", "b", "c"], [
+        "the parser handles org headings",
+        "the ChunkingEngine splits text; the engine is fast",
+        "the the the",
+    ], [{"source_path": "x.org"}, {"source_path": "y.org"}, {"source_path": "y.org"}])
+
+    assert tokenize("ChunkingEngine, splits!") == ["chunkingengine", "splits"]
+    assert index.is_dirty("notes")
+    assert [chunk_id for chunk_id, _ in index.search("notes", "chunkingengine")] == ["b"]
+    assert not index.is_dirty("notes")
+    assert index.search("notes", "unknownterm") == []
+    ranked = index.search("notes", "the parser", n_results=3)
+    assert ranked[0][0] == "a" and len(ranked) == 3
+
+    # A server's index keeps serving the last version while it compiles in the background
+    served = LexicalIndex(tmp_path / "lexical", background_compile=True)
+    index.remove("notes", source_path="y.org")
+    assert len(served.search("notes", "the", n_results=5)) == 3
+    served.compile_in_background("notes").join()
+    assert not index.is_dirty("notes")
+    assert [chunk_id for chunk_id, _ in served.search("notes", "the", n_results=5)] == ["a"]
+
+    # Anywhere else a search compiles staged changes first
+    index.add("notes", ["d"], ["a fresh parser"], [{"source_path": "z.org"}])
+    assert [chunk_id for chunk_id, _ in index.search("notes", "fresh")] == ["d"]
+    index.drop("notes")
+    assert index.search("notes", "parser") == []
+
+
+def test_concurrent_writers_and_compiles(tmp_path):
+    """Test that indexes sharing a directory allocate distinct term IDs and compile safely."""
+    import threading
+
+    indexes = [LexicalIndex(tmp_path / "lexical") for _ in range(3)]
+
+    def write(number, index):
+        for round_number in range(5):
+            index.add("notes", [f"{number}-{round_number}"],
+                      [f"word{number}x{round_number} shared"])
+            index.compile("notes")
+
+    threads = [threading.Thread(target=write, args=(number, index))
+               for number, index in enumerate(indexes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    index = indexes[0]
+    assert not index.is_dirty("notes") and index.version("notes") == 15
+    assert [chunk_id for chunk_id, _ in index.search("notes", "word2x4")] == ["2-4"]
+    assert len(index.search("notes", "shared", n_results=20)) == 15
+    assert [path.name for path in (tmp_path / "lexical" / "notes").iterdir()] == ["v15"]
+
+
+def test_hybrid_search_finds_exact_terms(kb_config):
+    """Test that lexical and hybrid modes surface chunks with exact terms."""
+    kb_root = kb_config.parent / "kb"
+    (kb_root / "gamma.org").write_text("#+TITLE: Gamma\n\n* Tools\nUse frobnicate_v2 for cleanup.\n")
+    cli.index_command(str(kb_config))
+
+    result = cli.search_command("frobnicate_v2", str(kb_config), results=1, mode="lexical")
+    assert "Source: gamma.org" in result and "Score:" in result
+    result = cli.search_command("frobnicate_v2", str(kb_config), results=1, mode="hybrid")
+    assert "Source: gamma.org" in result
+
+    # Incremental updates keep the lexical index in step with the collection
+    (kb_root / "gamma.org").unlink()
+    cli.index_command(str(kb_config))
+    result = cli.search_command("frobnicate_v2", str(kb_config), results=1, mode="lexical")
+    assert "No results found." in result
+
+
+
+def test_search_after_watch_batch_sees_changes(kb_config, monkeypatch):
+    """Test that a search process sees a watch batch whose background compile never ran."""
+    import json
+    from pathlib import Path
+    from daimonkms.config import Config
+    from daimonkms.indexer import update_paths
+    from daimonkms.lexical import LexicalIndex
+    from daimonkms.manifest import IndexManifest, MANIFEST_FILENAME
+
+    cli.index_command(str(kb_config))
+    config = Config(str(kb_config))
+    db_path = Path(json.loads(kb_config.read_text())["chroma_db_path"])
+    kb_root = kb_config.parent / "kb"
+    (kb_root / "alpha.org").write_text("#+TITLE: Alpha\n\nA zeppelin drifts.\n")
+
+    # As if the watcher exited before its compile thread got anywhere
+    with monkeypatch.context() as patch:
+        patch.setattr(LexicalIndex, "compile_in_background", lambda self, name: None)
+        update_paths(cli.create_chroma_manager(config, db_path), cli.create_chunker(config),
+                     IndexManifest(db_path / MANIFEST_FILENAME), kb_root, "knowledge_base",
+                     [kb_root / "alpha.org"])
+
+    for _ in range(2):
+        result = cli.search_command("zeppelin", str(kb_config), results=1, mode="lexical",
+                                    use_daemon=False)
+        assert "A zeppelin drifts." in result
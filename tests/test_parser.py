@@ -0,0 +1,43 @@
+import pytest
+from pathlib import Path
+
+from daimonkms.parser import OrgParser, ParsedDocument
+
+
+def test_parse_returns_compact_document(sample_org_file):
+    """Test that parse() extracts headers and body in one pass."""
+    document = OrgParser(sample_org_file).parse()
+    assert isinstance(document, ParsedDocument)
+    assert not hasattr(document, '__dict__'), "ParsedDocument should use __slots__"
+    assert document.title == "Sample Test Note"
+    assert document.filetags == ["test", "reference", "sample"]
+    assert document.id == "12345678-1234-5678-9abc-123456789012"
+    assert "Main Topic" in document.body
+    assert ":PROPERTIES:" not in document.body
+
+
+def test_parse_matches_legacy_methods(sample_org_file):
+    """Test that parse_headers/parse_content agree with parse()."""
+    parser = OrgParser(sample_org_file)
+    document = parser.parse()
+    assert parser.parse_headers() == document.headers
+    assert parser.parse_content() == document.body
+    assert parser.parse() is document, "Parsing should be cached"
+
+
+def test_parse_line_offsets_map_to_source(tmp_path):
+    """Test that line_offsets point at each body line's source line."""
+    org_file = tmp_path / "note.org"
+    org_file.write_text(":PROPERTIES:\n:ID: abc\n:END:\n#+TITLE: T\n\n* Heading\nText\n\n")
+    document = OrgParser(org_file).parse()
+    assert document.body == "* Heading\nText"
+    assert list(document.line_offsets) == [5, 6]
+
+
+def test_source_line_maps_body_offsets(tmp_path):
+    """Test that body offsets map back to source file lines."""
+    org_file = tmp_path / "note.org"
+    org_file.write_text("#+TITLE: Note\n\n* Heading\nFirst line.\nSecond line.\n")
+    document = OrgParser(org_file).parse()
+    assert document.source_line(0) == 2
+    assert document.source_line(document.body.index("Second")) == 4
@@ -0,0 +1,90 @@
+import pytest
+import threading
+
+from daimonkms.pipeline import Pipeline, Stage
+
+
+class Item:
+    def __init__(self, value):
+        self.value = value
+        self.error = None
+
+
+def test_pipeline_runs_items_through_all_stages():
+    """Test that items pass every stage, can be dropped and carry errors."""
+    def double(item):
+        item.value *= 2
+        return item
+
+    def drop_odd_inputs(item):
+        return item if item.value % 4 == 0 else None
+
+    def fail_on_eight(item):
+        if item.value == 8:
+            raise ValueError("eight")
+        return item
+
+    pipeline = Pipeline([
+        Stage("double", double, workers=3),
+        Stage("filter", drop_odd_inputs),
+        Stage("check", fail_on_eight, workers=2),
+    ], queue_size=2)
+    results = list(pipeline.run(Item(i) for i in range(10)))
+
+    assert sorted(item.value for item in results) == [0, 4, 8, 12, 16]
+    assert [item.error for item in results if item.error] == ["eight"]
+    assert [stage.items for stage in pipeline.stages] == [10, 10, 5]
+    assert all(stage.max_queue_depth <= 2 for stage in pipeline.stages)
+    assert pipeline.report()[1] == "  scan: 10 items in %.2fs" % pipeline.source_seconds
+
+
+def test_pipeline_stops_when_caller_stops_early():
+    """Test that abandoning the output does not leave workers blocked."""
+    pipeline = Pipeline([Stage("identity", lambda item: item)], queue_size=1)
+    results = pipeline.run(Item(i) for i in range(1000))
+    next(results)
+    results.close()
+    assert threading.active_count() < 5
+
+
+def test_batching_stage_receives_lists():
+    """Test that a batching stage gets lists no longer than batch_size."""
+    batch_sizes = []
+
+    def record_batch(items):
+        batch_sizes.append(len(items))
+        return items
+
+    pipeline = Pipeline([Stage("batch", record_batch, batch_size=4)])
+    results = list(pipeline.run(Item(i) for i in range(10)))
+
+    assert sorted(item.value for item in results) == list(range(10))
+    assert sum(batch_sizes) == 10
+    assert max(batch_sizes) <= 4
+
+
+def test_progress_line_counts_finished_items():
+    """Test that dropped and output items count as finished, with per-item timings."""
+    import io
+    from daimonkms.progress import ProgressLine
+
+    class TimedItem(Item):
+        def __init__(self, value):
+            super().__init__(value)
+            self.timings = {}
+
+    pipeline = Pipeline([Stage("even", lambda item: item if item.value % 2 == 0 else None),
+                         Stage("batch", lambda items: items, batch_size=3)])
+    stream = io.StringIO()
+    progress = ProgressLine(pipeline, stream=stream, interval=0.01)
+    progress.start()
+    results = list(pipeline.run(TimedItem(i) for i in range(10)))
+    progress.add_chunks(7)
+    progress.draw()
+    text = progress.render()
+    progress.stop()
+
+    assert pipeline.finished_items == 10 and pipeline.stages[0].dropped == 5
+    assert text.startswith("Indexing: 10/10 files, ") and "chunks/s, ETA 0s" in text
+    assert all(set(item.timings) == {"even", "batch"} for item in results)
+    assert stream.getvalue().endswith("\r")
@@ -0,0 +1,120 @@
+from daimonkms import cli
+from daimonkms.chroma_manager import ChromaManager
+from daimonkms.query_cache import QueryCache
+
+
+def test_query_cache_normalizes_and_evicts(tmp_path):
+    """Test that equivalent queries share a key and the LRU stays bounded."""
+    assert QueryCache.key("kb", 1, "  Bread  Dough", 5) == QueryCache.key("kb", 1, "bread dough", 5)
+    assert QueryCache.key("kb", 1, "bread", 5) != QueryCache.key("kb", 2, "bread", 5)
+    assert QueryCache.key("kb", 1, "bread", 5) != QueryCache.key("kb", 1, "bread", 5, {"tag": "x"})
+
+    cache = QueryCache(max_entries=2, cache_dir=tmp_path)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"ids": [[name]]})
+    assert "a" not in cache._entries
+    assert cache.get("a")["ids"] == [["a"]]
+    cache.close()
+
+    reopened = QueryCache(cache_dir=tmp_path)
+    assert reopened.get("c")["ids"] == [["c"]]
+    assert reopened.get("missing") is None
+    assert reopened.stats() == {"entries": 3, "hits": 2, "misses": 1}
+
+
+def test_query_cache_lookups_do_not_write(tmp_path):
+    """Test that lookups batch their counters and recency instead of committing."""
+    cache = QueryCache(cache_dir=tmp_path)
+    cache.put("a", {"ids": [["a"]]})
+    changes = cache._db.total_changes
+    for _ in range(10):
+        cache.get("a")
+        cache.get("missing")
+    assert cache._db.total_changes == changes
+    assert cache.stats()["hits"] == 10 and cache.stats()["misses"] == 10
+
+    cache.FLUSH_INTERVAL = 1
+    cache.get("a")
+    assert cache._db.total_changes > changes
+    assert QueryCache(cache_dir=tmp_path).stats()["hits"] == 11
+
+
+def test_query_results_invalidated_by_writes(tmp_path, hash_embedding_function):
+    """Test that cached results are reused until the collection changes."""
+    chroma = ChromaManager(tmp_path / "db", embedding_function=hash_embedding_function,
+                           query_cache=QueryCache())
+    headers = {"title": "Notes", "filetags": []}
+    chroma.sync_file_chunks("cache_test", ["one", "two"], "notes", headers, "notes.org")
+
+    first = chroma.query_collection("cache_test", "one", n_results=5)
+    cached = chroma.query_collection("cache_test", "One ", n_results=5)
+    assert cached["ids"] == first["ids"] and cached["distances"] == first["distances"]
+    assert chroma.query_cache.hits == 1
+
+    chroma.sync_file_chunks("cache_test", ["one", "two", "three"], "notes", headers, "notes.org")
+    updated = chroma.query_collection("cache_test", "one", n_results=5)
+    assert len(updated["ids"][0]) == 3
+    assert chroma.query_cache.hits == 1
+
+
+def test_query_cache_shared_between_databases(tmp_path, hash_embedding_function):
+    """Test that databases sharing a cache directory don't answer each other's queries."""
+    headers = {"title": "Notes", "filetags": []}
+    answers = []
+    for name, chunks in (("first", ["one"]), ("second", ["one", "two"])):
+        chroma = ChromaManager(tmp_path / name, embedding_function=hash_embedding_function,
+                               query_cache=QueryCache(cache_dir=tmp_path / "queries"))
+        chroma.sync_file_chunks("shared", chunks, "notes", headers, "notes.org")
+        answers.append(chroma.query_collection("shared", "one", n_results=5))
+        assert chroma.query_cache.hits == 0
+    assert [len(answer["ids"][0]) for answer in answers] == [1, 2]
+
+
+def test_status_reports_query_cache(kb_config):
+    """Test that status shows persistent query cache counters."""
+    cli.index_command(str(kb_config))
+    cli.search_command("bread", str(kb_config))
+    cli.search_command("bread", str(kb_config))
+    assert "Query cache: 1 entries, 1 hits, 1 misses" in cli.status_command(str(kb_config))
+
+
+def test_query_collection_many_embeds_once(tmp_path, hash_embedding_function):
+    """Test that batched queries match single queries with one embedding call."""
+    chroma = ChromaManager(tmp_path / "db", embedding_function=hash_embedding_function)
+    headers = {"title": "Notes", "filetags": []}
+    chroma.sync_file_chunks("batch_test", ["one", "two", "three"], "notes", headers, "notes.org")
+
+    calls = []
+    original_embed = chroma.embed_queries
+    chroma.embed_queries = lambda texts: calls.append(list(texts)) or original_embed(texts)
+    batch = chroma.query_collection_many("batch_test", ["one", "three", " One"], n_results=2)
+
+    assert calls == [["one", "three"]]
+    assert [result["ids"] for result in batch] == \
+        [chroma.query_collection("batch_test", query, n_results=2)["ids"]
+         for query in ["one", "three", "one"]]
+    batch[0]["ids"][0].clear()
+    assert batch[2]["ids"][0]
+
+
+def test_search_batch_writes_json_lines(kb_config, tmp_path, capsys):
+    """Test that search --batch prints one JSON object per query."""
+    import json
+    cli.index_command(str(kb_config))
+    queries = tmp_path / "queries.txt"
+    queries.write_text("bread\n\nsets\n")
+    capsys.readouterr()
+
+    cli.search_batch_command(str(queries), str(kb_config), results=1)
+    lines = capsys.readouterr().out.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["query"] for record in records] == ["bread", "sets"]
+    assert all(len(record["results"]) == 1 for record in records)
+    assert records[0]["results"][0]["metadata"]["source_path"] in ("alpha.org", "notes/beta.org")
+
+    # Lexical batches rank by BM25, like single lexical searches
+    cli.search_batch_command(str(queries), str(kb_config), results=1, mode="lexical")
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["results"][0]["metadata"]["source_path"] for record in records] == \
+        ["notes/beta.org", "alpha.org"]
+    assert all(record["results"][0]["score"] is not None for record in records)
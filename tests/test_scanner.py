@@ -0,0 +1,63 @@
+import pytest
+from pathlib import Path
+
+from daimonkms.scanner import KnowledgeBaseScanner
+
+
+@pytest.fixture
+def nested_kb(tmp_path):
+    """Knowledge base tree with nested, ignored and non-org entries."""
+    for relative in ["top.org", "a/one.org", "a/b/two.org", "a/b/c/three.org",
+                     "a/readme.txt", ".git/stray.org", "archive/old.org",
+                     "drafts/wip.org"]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("* Heading\n")
+    return tmp_path
+
+
+def _relative(root, paths):
+    return sorted(Path(p).relative_to(root).as_posix() for p in paths)
+
+
+def test_scanner_walks_nested_directories(nested_kb):
+    """Test that the scandir walker finds org files at every depth."""
+    scanner = KnowledgeBaseScanner(nested_kb)
+    assert _relative(nested_kb, scanner.scan_org_files()) == [
+        "a/b/c/three.org", "a/b/two.org", "a/one.org", "drafts/wip.org", "top.org"]
+
+
+def test_scanner_applies_daimonignore(nested_kb):
+    """Test that .daimonignore patterns are added to the defaults."""
+    (nested_kb / ".daimonignore").write_text("# scratch space\ndrafts/\na/b/c/*.org\n")
+    scanner = KnowledgeBaseScanner(nested_kb)
+    assert _relative(nested_kb, scanner.iter_org_files()) == [
+        "a/b/two.org", "a/one.org", "top.org"]
+
+
+def test_scanner_missing_root_yields_nothing(tmp_path):
+    """Test that a missing root directory produces no files."""
+    scanner = KnowledgeBaseScanner(tmp_path / "missing")
+    assert list(scanner.iter_org_files()) == []
+    assert scanner.scan_org_files() == []
+
+
+def test_scanner_reuses_unchanged_directory_listings(nested_kb, tmp_path_factory):
+    """Test that a snapshot lets later scans skip listing unchanged directories."""
+    import os
+    snapshot_path = tmp_path_factory.mktemp("state") / "scan_snapshot.json"
+    first = KnowledgeBaseScanner(nested_kb, snapshot_path=snapshot_path).scan_org_files()
+    assert snapshot_path.exists()
+
+    scanner = KnowledgeBaseScanner(nested_kb, snapshot_path=snapshot_path)
+    assert scanner.scan_org_files() == first
+    assert scanner.last_scan_stats['listed'] == 0
+
+    # Adding a file bumps only its directory's mtime
+    new_file = nested_kb / "a" / "b" / "new.org"
+    new_file.write_text("* New\n")
+    stat = os.stat(new_file.parent)
+    os.utime(new_file.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    scanner = KnowledgeBaseScanner(nested_kb, snapshot_path=snapshot_path)
+    assert new_file in scanner.scan_org_files()
+    assert scanner.last_scan_stats['listed'] == 1
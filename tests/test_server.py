@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from daimonkms import cli
+from daimonkms.config import Config
+from daimonkms.server import DaemonClient, DaemonError, SearchServer, SearchService, socket_path
+
+
+@pytest.fixture
+def daemon(kb_config, tmp_path, monkeypatch):
+    """A search daemon serving the indexed test knowledge base."""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    cli.index_command(str(kb_config))
+    config = Config(str(kb_config))
+    chroma = cli.create_chroma_manager(config, config.chroma_db_path)
+    server = SearchServer(socket_path(config.chroma_db_path), SearchService(chroma))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_search_uses_running_daemon(kb_config, daemon, monkeypatch):
+    """Test that searches go through the daemon and fall back without it."""
+    def unavailable(config, db_path):
+        raise RuntimeError("database opened in-process")
+
+    monkeypatch.setattr(cli, "create_chroma_manager", unavailable)
+
+    result = cli.search_command("the dough", str(kb_config), results=5, mode="hybrid",
+                                tags=["form:journal"])
+    assert "Knead the dough." in result and "A set is a collection." not in result
+
+    batch_file = kb_config.parent / "queries.txt"
+    batch_file.write_text("dough\nsets\n")
+    result = cli.search_batch_command(str(batch_file), str(kb_config), results=1)
+    assert result.count('"query"') == 2
+    result = cli.search_batch_command(str(batch_file), str(kb_config), results=1, mode="lexical")
+    assert result.count('"score": null') == 0 and "Knead the dough." in result
+
+    result = cli.search_command("the dough", str(kb_config), use_daemon=False)
+    assert "database opened in-process" in result
+
+    with DaemonClient.connect_path(daemon.path) as client:
+        assert client.call("ping")["db_path"]
+        with pytest.raises(DaemonError):
+            client.call("clear_and_create_collection", collection_name="knowledge_base")
+
+
+def test_server_refuses_second_daemon(daemon):
+    """Test that a socket in use isn't taken over, but a stale one is."""
+    with pytest.raises(RuntimeError):
+        SearchServer(daemon.path, daemon.service)
+
+    stale = daemon.path.with_name("stale.sock")
+    stale.touch()
+    server = SearchServer(stale, daemon.service)
+    server.server_close()
+    assert not stale.exists()
+
+
+def test_runtime_dir_must_be_private(kb_config, tmp_path, monkeypatch):
+    """Test that sockets are refused in a runtime directory others could control."""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    config = Config(str(kb_config))
+    path = socket_path(config.chroma_db_path)
+    path.parent.mkdir(parents=True)
+    path.parent.chmod(0o755)
+    with pytest.raises(PermissionError):
+        SearchServer(path, None)
+    assert DaemonClient.connect(config.chroma_db_path) is None
+
+    # A symlink to a private directory is refused too
+    target = tmp_path / "elsewhere"
+    target.mkdir(mode=0o700)
+    path.parent.rmdir()
+    path.parent.symlink_to(target)
+    with pytest.raises(PermissionError):
+        SearchServer(path, None)
@@ -0,0 +1,47 @@
+import pytest
+
+import daimonkms
+from daimonkms import cli
+from daimonkms.session import FileChange, SearchResult
+
+
+def test_session_searches_with_typed_results(kb_config):
+    """Test search and search_many across modes and tag filters."""
+    cli.index_command(str(kb_config))
+    assert daimonkms.open is daimonkms.open_session
+    session = daimonkms.open_session(kb_config)
+
+    results = session.search("the dough", mode="hybrid", tags=["form:journal"])
+    assert [result.source_path for result in results] == ["notes/beta.org"]
+    assert isinstance(results[0], SearchResult) and results[0].score is not None
+    assert results[0].document == "* Bread\nKnead the dough."
+
+    batches = session.search_many(["dough", "sets"], n_results=1)
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert session.search_many(["dough"], mode="lexical")[0][0].source_path == "notes/beta.org"
+
+    with pytest.raises(ValueError):
+        session.search("dough", tags=["topic:x"])
+
+
+def test_session_indexes_and_deletes_paths(kb_config):
+    """Test index_paths and delete_paths, and that other writers are seen."""
+    cli.index_command(str(kb_config))
+    session = daimonkms.open(kb_config)
+    kb_root = session.root
+    assert session.search("gamma", mode="lexical") == []
+
+    (kb_root / "gamma.org").write_text("#+TITLE: Gamma\n\n* Gamma\nA gamma ray.\n")
+    changes = session.index_paths(["gamma.org", kb_root / "alpha.org"])
+    assert changes == [FileChange("gamma.org", "updated", added=1)]
+    assert session.search("gamma", mode="lexical")[0].source_path == "gamma.org"
+
+    assert session.delete_paths(["notes"]) == [FileChange("notes/beta.org", "removed")]
+    assert session.search("dough", mode="lexical") == []
+    with pytest.raises(ValueError):
+        session.index_paths([kb_root.parent])
+
+    # A full rebuild by another process is visible to the open session
+    cli.index_command(str(kb_config), full=True)
+    assert session.search("dough", mode="lexical")[0].source_path == "notes/beta.org"
+    assert session.index_paths(["."]) == []
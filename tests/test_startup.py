@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+# Cold-start import budget for commands that don't touch the database
+STARTUP_BUDGET_US = 100_000
+
+
+def import_times(code):
+    """
+    Run code in a fresh interpreter under -X importtime.
+
+    Returns:
+        Tuple of (times, total): a dict of module name to cumulative import
+        time in microseconds, and the total of top-level imports, both
+        counting only what code itself imported (not interpreter startup)
+    """
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, check=True)
+    times = {}
+    total = 0
+    started = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if started:
+            times[name.strip()] = int(cumulative)
+            # Nested imports are indented further than the single space
+            if not name.startswith("  "):
+                total += int(cumulative)
+        # Interpreter startup ends by importing site
+        elif name.strip() == "site":
+            started = True
+    return times, total
+
+
+@pytest.mark.parametrize("command", [["config"], ["--help"]])
+def test_light_commands_start_quickly(kb_config, command):
+    """Test that commands without database access skip chromadb and numpy."""
+    code = ("import sys\n"
+            "from daimonkms.cli import main\n"
+            f"sys.argv = ['daimon', '--config', {str(kb_config)!r}, *{command!r}]\n"
+            "try:\n"
+            "    main()\n"
+            "except SystemExit:\n"
+            "    pass\n")
+    # Warm the bytecode cache so compilation isn't measured
+    import_times(code)
+    times, total = import_times(code)
+
+    assert "daimonkms.cli" in times
+    assert "chromadb" not in times and "numpy" not in times
+    assert total < STARTUP_BUDGET_US, sorted(times.items(), key=lambda item: -item[1])[:10]
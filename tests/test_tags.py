@@ -0,0 +1,69 @@
+import pytest
+
+from daimonkms import cli
+from daimonkms.tags import normalize_tag, tag_keys, tag_metadata, tag_where
+
+
+def test_tag_metadata_and_filters():
+    """Test tag metadata keys and the filters that select on them."""
+    metadata = tag_metadata(["mathematics", "reference", "set-theory", "logic"])
+    assert metadata == {"tag:mathematics": True, "tag:reference": True, "tag:set-theory": True,
+                        "tag:logic": True, "domain": "mathematics", "form": "reference",
+                        "granularity": "set-theory"}
+    assert sorted(tag_keys(metadata)) == ["domain:mathematics", "form:reference",
+                                          "granularity:set-theory", "tag:logic",
+                                          "tag:mathematics", "tag:reference", "tag:set-theory"]
+
+    assert normalize_tag("#journal") == "tag:journal"
+    assert normalize_tag("domain:mathematics") == "domain:mathematics"
+    assert tag_where(["domain:mathematics"]) == {"domain": "mathematics"}
+    assert tag_where(["domain:mathematics", "tag:logic"]) == {
+        "$and": [{"domain": "mathematics"}, {"tag:logic": True}]}
+    assert tag_where([]) is None
+    with pytest.raises(ValueError):
+        normalize_tag("topic:mathematics")
+    with pytest.raises(ValueError):
+        normalize_tag("form:")
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_search_restricted_to_tags(kb_config, mode):
+    """Test that --tag filters are applied in every search mode."""
+    cli.index_command(str(kb_config))
+
+    result = cli.search_command("the dough", str(kb_config), results=5, mode=mode,
+                                tags=["form:journal"])
+    assert "Tags: form:journal" in result
+    assert "Knead the dough." in result and "A set is a collection." not in result
+
+    result = cli.search_command("the dough", str(kb_config), results=5, mode=mode,
+                                tags=["domain:mathematics", "sets"])
+    assert "Knead the dough." not in result
+
+    result = cli.search_command("the dough", str(kb_config), results=5, mode=mode,
+                                tags=["domain:mathematics", "journal"])
+    assert "No results found." in result
+
+    result = cli.search_command("dough", str(kb_config), tags=["topic:x"])
+    assert "Unknown tag axis" in result
+
+
+@pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+def test_filetag_edit_restages_lexical_tags(kb_config, mode):
+    """Test that a filetag-only edit moves unchanged chunks to their new tags."""
+    import daimonkms
+
+    cli.index_command(str(kb_config))
+    alpha = kb_config.parent / "kb" / "alpha.org"
+    alpha.write_text(
+        "#+TITLE: Alpha\n#+filetags: :cooking:reference:sets:\n\n* Sets\nA set is a collection.\n")
+    changes = daimonkms.open(kb_config).index_paths([alpha])
+    assert [change.action for change in changes] == ["updated"]
+
+    result = cli.search_command("a set is a collection", str(kb_config), results=5, mode=mode,
+                                tags=["domain:cooking", "form:reference"], use_daemon=False)
+    assert "A set is a collection." in result
+
+    result = cli.search_command("a set is a collection", str(kb_config), results=5, mode=mode,
+                                tags=["domain:mathematics"], use_daemon=False)
+    assert "No results found." in result
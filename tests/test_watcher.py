@@ -0,0 +1,67 @@
+import pytest
+import time
+from pathlib import Path
+
+from daimonkms.watcher import PollingWatcher, InotifyWatcher, debounced_batches
+
+
+def _wait_for_changes(watcher, timeout=3.0):
+    """Poll until the watcher reports something or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    changed = set()
+    while not changed and time.monotonic() < deadline:
+        changed = watcher.poll(0.1)
+    return changed
+
+
+def test_polling_watcher_reports_changes(tmp_path):
+    """Test that PollingWatcher detects created, modified and deleted files."""
+    note = tmp_path / "note.org"
+    note.write_text("* Old\n")
+    watcher = PollingWatcher(tmp_path, interval=0.05)
+
+    note.write_text("* New and longer\n")
+    added = tmp_path / "sub" / "added.org"
+    added.parent.mkdir()
+    added.write_text("* Added\n")
+    assert _wait_for_changes(watcher) == {note, added}
+
+    note.unlink()
+    assert _wait_for_changes(watcher) == {note}
+
+
+def test_inotify_watcher_reports_changes(tmp_path):
+    """Test that InotifyWatcher sees files in new subdirectories."""
+    try:
+        watcher = InotifyWatcher(tmp_path)
+    except OSError:
+        pytest.skip("inotify not available")
+    try:
+        added = tmp_path / "sub" / "added.org"
+        added.parent.mkdir()
+        added.write_text("* Added\n")
+        (tmp_path / "ignored.txt").write_text("not org")
+
+        changed = set()
+        deadline = time.monotonic() + 3.0
+        while added not in changed and time.monotonic() < deadline:
+            changed |= watcher.poll(0.1)
+        assert changed == {added}
+    finally:
+        watcher.close()
+
+
+def test_debounced_batches_coalesce_bursts():
+    """Test that a burst of changes is delivered as one batch."""
+    class FakeWatcher:
+        def __init__(self):
+            self.events = [{Path("a.org")}, {Path("b.org")}, {Path("a.org")}]
+
+        def poll(self, timeout):
+            if self.events:
+                return self.events.pop(0)
+            time.sleep(timeout)
+            return set()
+
+    batches = debounced_batches(FakeWatcher(), debounce=0.05)
+    assert next(batches) == {Path("a.org"), Path("b.org")}